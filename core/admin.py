@@ -1,42 +1,160 @@
 from django.contrib import admin
-from .models import Trip, TripSegment, DailyLog, LogEntry
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from .models import Location, Trip, TripSegment, TripStop, DailyLog, LogEntry, DutyInterval
+from .services.trip_cache import invalidate_trip
+
+
+def estimated_row_count(model, using="default"):
+    """
+    Rows in `model`'s table from cheap metadata, or None where the database
+    has none: the planner's statistics on PostgreSQL, the id range on SQLite.
+    """
+    connection = connections[using]
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+        elif connection.vendor == "sqlite":
+            pk = connection.ops.quote_name(model._meta.pk.column)
+            cursor.execute(f"SELECT MAX({pk}) - MIN({pk}) + 1 FROM {table}")
+        else:
+            return None
+        row = cursor.fetchone()
+    # reltuples is -1 before the table's first ANALYZE
+    return row[0] if row and row[0] is not None and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that never runs COUNT(*) over a whole large table. An
+    unfiltered list is counted from `estimated_row_count` once that is over
+    EXACT_BELOW. A filtered or searched list is counted exactly up to
+    MAX_COUNT rows, so its last pages past that aren't linked.
+    """
+    EXACT_BELOW = 10000
+    MAX_COUNT = 100000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= self.EXACT_BELOW:
+                return estimate
+        return queryset[:self.MAX_COUNT].count()
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # The "N total" link next to filtered results would count the whole table
+    show_full_result_count = False
+    # Searches are case-sensitive prefix matches on indexed columns
+    search_help_text = "Starts with (case-sensitive)"
+
+
+class TripChildAdmin(LargeTableAdmin):
+    """Admin for rows that are part of a trip's response; edits drop the cached response."""
+    # Lookup from the row to its trip's id
+    trip_lookup = "trip"
+
+    def _invalidate(self, queryset):
+        for trip_id in set(queryset.values_list(self.trip_lookup, flat=True)):
+            invalidate_trip(trip_id, queryset.db)
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        self._invalidate(type(obj).objects.filter(pk=obj.pk))
+
+    def delete_model(self, request, obj):
+        self._invalidate(type(obj).objects.filter(pk=obj.pk))
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        self._invalidate(queryset)
+        super().delete_queryset(request, queryset)
+
+
+@admin.register(Location)
+class LocationAdmin(LargeTableAdmin):
+    list_display = ("id", "name", "longitude", "latitude")
+    search_fields = ("name__startswith",)
+
+
+# Trip.__str__ shows the pickup and dropoff names
+TRIP_NAMES = ("trip__pickup_location", "trip__dropoff_location")
 
 
 @admin.register(Trip)
-class TripAdmin(admin.ModelAdmin):
+class TripAdmin(LargeTableAdmin):
     list_display = (
         "id", "user", "pickup_location", "dropoff_location",
-        "current_cycle_used", "total_distance", "created_at"
+        "current_cycle_used", "home_terminal_time_zone", "total_distance", "created_at"
+    )
+    list_select_related = ("user", "pickup_location", "dropoff_location")
+    list_filter = ("created_at",)
+    search_fields = (
+        "pickup_location__name__startswith", "dropoff_location__name__startswith", "user__username__startswith"
     )
-    # list_filter = ("created_at")
-    search_fields = ("pickup_location", "dropoff_location", "user__username")
+    raw_id_fields = ("user", "current_location", "pickup_location", "dropoff_location")
 
 
 @admin.register(TripSegment)
-class TripSegmentAdmin(admin.ModelAdmin):
+class TripSegmentAdmin(TripChildAdmin):
     list_display = (
         "id", "trip", "segment_type", "sequence_number", "start_time", "end_time",
         "duration_hours", "distance_miles"
     )
-    # list_filter = ("segment_type",)
-    search_fields = ("trip__pickup_location", "trip__dropoff_location")
+    list_select_related = TRIP_NAMES
+    list_filter = ("segment_type",)
+    search_fields = ("trip__pickup_location__name__startswith", "trip__dropoff_location__name__startswith")
+    raw_id_fields = ("trip", "location")
+
+
+@admin.register(TripStop)
+class TripStopAdmin(TripChildAdmin):
+    list_display = (
+        "id", "trip", "sequence_number", "stop_type", "name",
+        "window_start", "window_end", "planned_arrival", "time_zone"
+    )
+    list_select_related = TRIP_NAMES
+    search_fields = (
+        "name__startswith", "trip__pickup_location__name__startswith", "trip__dropoff_location__name__startswith"
+    )
+    raw_id_fields = ("trip",)
 
 
 @admin.register(DailyLog)
-class DailyLogAdmin(admin.ModelAdmin):
+class DailyLogAdmin(TripChildAdmin):
     list_display = (
         "id", "trip", "log_date", "day_number",
          "total_miles", "driving_hours", "off_duty_hours"
     )
-    # list_filter = ("log_date")
-    search_fields = ("trip__pickup_location", "trip__dropoff_location")
+    list_select_related = TRIP_NAMES
+    list_filter = ("log_date",)
+    search_fields = ("trip__pickup_location__name__startswith", "trip__dropoff_location__name__startswith")
+    raw_id_fields = ("trip",)
 
 
 @admin.register(LogEntry)
-class LogEntryAdmin(admin.ModelAdmin):
+class LogEntryAdmin(TripChildAdmin):
+    trip_lookup = "daily_log__trip"
     list_display = (
         "id", "daily_log", "duty_status",
         "start_hour", "end_hour", "location"
     )
-    # list_filter = ("duty_status",)
-    search_fields = ("location", "daily_log__trip__pickup_location")
+    list_select_related = ("daily_log", "location")
+    list_filter = ("duty_status",)
+    search_fields = ("daily_log__trip__pickup_location__name__startswith",)
+    raw_id_fields = ("daily_log", "location")
+
+
+@admin.register(DutyInterval)
+class DutyIntervalAdmin(LargeTableAdmin):
+    list_display = (
+        "id", "driver", "trip", "duty_status", "start", "end", "location"
+    )
+    list_select_related = ("driver", "location") + TRIP_NAMES
+    search_fields = ("driver__username__startswith",)
+    raw_id_fields = ("driver", "trip", "location")
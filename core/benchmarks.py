@@ -0,0 +1,610 @@
+"""
+Benchmark suite for the HOS planner, serializers and API endpoints.
+
+Benchmarks are registered with the `benchmark` decorator and run through
+`python manage.py benchmark`, which stores results as JSON baselines and
+compares later runs against them.
+"""
+import contextlib
+import io
+import itertools
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional
+from unittest import mock
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from .models import FleetRollup, Trip, TripProgress
+from .services import hos_monitor, locations
+from .services.distance_calculator import DistanceCalculation
+from .services.distance_matrix import estimated_miles
+from .services.hos_calculator import HOSCalculator
+from .services.hos_rules import RULE_SETS, compile_rule_set
+from .services.stop_optimizer import optimize_stop_order
+from .services.positions import pack_pings
+from .services.timezones import load_index, timezone_at
+from .services.trip_import import import_chunk
+
+
+BENCHMARKS: Dict[str, Dict[str, Any]] = {}
+
+# Fixed start so every run plans the same days
+START_TIME = datetime(2025, 1, 6, 8, 0, tzinfo=dt_timezone.utc)
+
+TRIP_LENGTHS = {"short": 250.0, "medium": 1500.0, "long": 3000.0, "multiweek": 9000.0}
+CYCLE_STATES = {"fresh": 0.0, "half": 35.0, "near_limit": 65.0}
+
+
+def benchmark(name: str, setup: Optional[Callable[[], tuple]] = None, count_queries: bool = False):
+    """Register a benchmark. `setup` runs untimed before each round and returns the call args."""
+    def decorator(func):
+        BENCHMARKS[name] = {"func": func, "setup": setup, "count_queries": count_queries}
+        return func
+    return decorator
+
+
+def trip_data(miles: float, cycle_used: float = 0.0) -> Dict[str, Any]:
+    return {
+        "start_time": START_TIME,
+        "trip_miles": miles,
+        "current_cycle_used": cycle_used,
+        "current_location": "Chicago, IL",
+        "pickup_location": "Gary, IN",
+        "dropoff_location": "Los Angeles, CA",
+    }
+
+
+def trip_location_ids() -> Dict[str, int]:
+    """Trip(...) keyword arguments for the benchmark trip's interned locations."""
+    data = trip_data(0)
+    fields = ("current_location", "pickup_location", "dropoff_location")
+    ids = locations.intern(data[field] for field in fields)
+    return {f"{field}_id": ids[data[field]] for field in fields}
+
+
+def plan_trip(miles: float, cycle_used: float = 0.0) -> Dict[str, Any]:
+    with contextlib.redirect_stdout(io.StringIO()):
+        return HOSCalculator(trip_data(miles, cycle_used)).calculate()
+
+
+def create_planned_trip(miles: float, cycle_used: float = 0.0, user=None) -> Trip:
+    from .services.trip_persistence import save_trip_results
+
+    trip = Trip.objects.create(
+        user=user,
+        **trip_location_ids(),
+        current_cycle_used=cycle_used,
+        total_distance=miles,
+    )
+    save_trip_results(trip, plan_trip(miles, cycle_used))
+    return trip
+
+
+def trip_payload(cycle_used: float = 0.0) -> Dict[str, Any]:
+    return {
+        "current_location": {"name": "Chicago, IL", "coords": [-87.6298, 41.8781]},
+        "pickup_location": {"name": "Gary, IN", "coords": [-87.3464, 41.5934]},
+        "dropoff_location": {"name": "Los Angeles, CA", "coords": [-118.2437, 34.0522]},
+        "current_cycle_used": cycle_used,
+    }
+
+
+def stub_openroute(miles: float):
+    """Patch OpenRouteService so endpoint benchmarks never touch the network."""
+    return mock.patch.object(DistanceCalculation, "calculate_openroute_distance", return_value=miles)
+
+
+def _estimated_matrix(coordinates, sources=None, destinations=None, priority=None):
+    sources = range(len(coordinates)) if sources is None else sources
+    destinations = range(len(coordinates)) if destinations is None else destinations
+    return [[estimated_miles(coordinates[i], coordinates[j]) for j in destinations] for i in sources]
+
+
+def stub_openroute_matrix():
+    """Patch OpenRouteService matrix requests to answer with local great-circle estimates."""
+    return mock.patch.object(DistanceCalculation, "calculate_openroute_matrix", side_effect=_estimated_matrix)
+
+
+def lane_locations(count: int) -> List[Dict[str, Any]]:
+    # A deterministic spread of points over the continental US
+    return [
+        {"name": f"City {i}", "coords": [-122.0 + (i * 7.3) % 50, 30.0 + (i * 3.7) % 17]}
+        for i in range(count)
+    ]
+
+
+# HOS planner
+
+def _setup_calculate(miles: float, cycle_used: float):
+    def setup():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return (HOSCalculator(trip_data(miles, cycle_used)),)
+    return setup
+
+
+def _setup_daily_logs(miles: float):
+    cache = {}
+
+    def setup():
+        if "result" not in cache:
+            with contextlib.redirect_stdout(io.StringIO()):
+                calculator = HOSCalculator(trip_data(miles))
+            cache["result"] = (calculator, calculator.calculate()["segments"])
+        return cache["result"]
+    return setup
+
+
+for _name, _miles in TRIP_LENGTHS.items():
+    for _cycle_name, _cycle_used in CYCLE_STATES.items():
+        @benchmark(f"hos_calculate[{_name}-{_cycle_name}]", setup=_setup_calculate(_miles, _cycle_used))
+        def _bench_hos_calculate(calculator):
+            return calculator.calculate()
+
+    @benchmark(f"generate_daily_logs[{_name}]", setup=_setup_daily_logs(_miles))
+    def _bench_generate_daily_logs(calculator, segments):
+        return calculator._generate_daily_logs(segments)
+
+
+def _setup_rule_set(rule_set: str):
+    def setup():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return (HOSCalculator({**trip_data(TRIP_LENGTHS["long"]), "rule_set": rule_set}),)
+    return setup
+
+
+for _rule_set in RULE_SETS:
+    @benchmark(f"hos_calculate_rule_set[{_rule_set}]", setup=_setup_rule_set(_rule_set))
+    def _bench_hos_rule_set(calculator):
+        return calculator.calculate()
+
+
+def _setup_stop_order(count: int):
+    def setup():
+        # Deterministic scatter of stops around the origin
+        points = [(0.0, 0.0)] + [((i * 37) % 101, (i * 61) % 89) for i in range(1, count + 1)]
+        matrix = [[round(((ax - bx) ** 2 + (ay - by) ** 2) ** 0.5 * 3, 1) for bx, by in points] for ax, ay in points]
+        return matrix, [{} for _ in range(count)], START_TIME
+    return setup
+
+
+for _count in (10, 25):
+    @benchmark(f"optimize_stop_order[{_count}]", setup=_setup_stop_order(_count))
+    def _bench_optimize_stop_order(matrix, stops, start_time):
+        return optimize_stop_order(matrix, stops, start_time)
+
+
+def _setup_timezone_lookup():
+    load_index.cache_clear()
+    timezone_at(-87.6298, 41.8781)
+    # Deterministic scatter over the lower 48
+    points = [(-124.0 + (i * 37) % 570 / 10, 25.5 + (i * 61) % 230 / 10) for i in range(1000)]
+    return (points,)
+
+
+@benchmark("timezone_lookup[1000]", setup=_setup_timezone_lookup)
+def _bench_timezone_lookup(points):
+    return [timezone_at(lon, lat) for lon, lat in points]
+
+
+# Persistence and serialization
+
+def _setup_save_trip_results(miles: float):
+    def setup():
+        trip = Trip.objects.create(
+            **trip_location_ids(),
+            total_distance=miles,
+        )
+        return trip, plan_trip(miles)
+    return setup
+
+
+for _name, _miles in TRIP_LENGTHS.items():
+    @benchmark(f"save_trip_results[{_name}]", setup=_setup_save_trip_results(_miles), count_queries=True)
+    def _bench_save_trip_results(trip, result):
+        from .services.trip_persistence import save_trip_results
+        with transaction.atomic():
+            save_trip_results(trip, result)
+
+
+def _setup_serializer(miles: float):
+    cache = {}
+
+    def setup():
+        if "trip" not in cache:
+            cache["trip"] = create_planned_trip(miles)
+        return (Trip.objects.get(pk=cache["trip"].pk),)
+    return setup
+
+
+for _name, _miles in TRIP_LENGTHS.items():
+    @benchmark(f"trip_response_serializer[{_name}]", setup=_setup_serializer(_miles), count_queries=True)
+    def _bench_trip_response_serializer(trip):
+        from .serializers import TripResponseSerializer
+        return TripResponseSerializer(trip).data
+
+
+for _name, _miles in TRIP_LENGTHS.items():
+    @benchmark(f"trip_response_fast[{_name}]", setup=_setup_serializer(_miles), count_queries=True)
+    def _bench_trip_response_fast(trip):
+        from .serializers import fast_trip_response_data, render_trip_json
+        return render_trip_json(fast_trip_response_data(Trip.objects.filter(pk=trip.pk)))
+
+
+def _setup_eld_sheets(miles: float):
+    cache = {}
+
+    def setup():
+        from django.core.cache import cache as sheet_cache
+        from .services.eld_renderer import load_daily_logs
+
+        if "days" not in cache:
+            cache["days"] = load_daily_logs(create_planned_trip(miles).pk)
+        sheet_cache.clear()
+        return (cache["days"],)
+    return setup
+
+
+@benchmark("eld_sheets_uncached[month]", setup=_setup_eld_sheets(20000.0))
+def _bench_eld_sheets(days):
+    from .services.eld_renderer import render_sheet_svg
+    return [render_sheet_svg(log, entries) for log, entries in days]
+
+
+# End-to-end API
+
+def _api_client():
+    from rest_framework.test import APIClient
+    return APIClient()
+
+
+def _setup_create_trip():
+    return (_api_client(),)
+
+
+@benchmark("api_create_trip[long]", setup=_setup_create_trip, count_queries=True)
+def _bench_api_create_trip(client):
+    with stub_openroute(TRIP_LENGTHS["long"]), contextlib.redirect_stdout(io.StringIO()):
+        response = client.post("/api/trips/", trip_payload(), format="json")
+    assert response.status_code == 201, response.content
+
+
+def _setup_get_trip(cached: bool):
+    state = {}
+
+    def setup():
+        from django.core.cache import cache
+
+        if "trip" not in state:
+            cache.clear()
+            state["trip"] = create_planned_trip(TRIP_LENGTHS["long"])
+        if not cached:
+            cache.delete(f"trip-response:{state['trip'].pk}")
+        return _api_client(), state["trip"].pk
+    return setup
+
+
+@benchmark("api_get_trip[long]", setup=_setup_get_trip(cached=False), count_queries=True)
+def _bench_api_get_trip(client, trip_id):
+    response = client.get(f"/api/trips/{trip_id}/")
+    assert response.status_code == 200, response.content
+
+
+@benchmark("api_get_trip_cached[long]", setup=_setup_get_trip(cached=True), count_queries=True)
+def _bench_api_get_trip_cached(client, trip_id):
+    response = client.get(f"/api/trips/{trip_id}/")
+    assert response.status_code == 200, response.content
+
+
+def _setup_trip_list():
+    cache = {}
+
+    def setup():
+        if "trips" not in cache:
+            Trip.objects.all().delete()
+            cache["trips"] = [create_planned_trip(TRIP_LENGTHS["medium"]) for _ in range(20)]
+        return (_api_client(),)
+    return setup
+
+
+@benchmark("api_trip_list[20x-medium]", setup=_setup_trip_list(), count_queries=True)
+def _bench_api_trip_list(client):
+    response = client.get("/api/trips/list/")
+    assert response.status_code == 200, response.content
+
+
+def _setup_lane_quotes():
+    from django.core.cache import cache
+    from .services.lane_pricing import transit_summary
+
+    cache.clear()
+    transit_summary.cache_clear()
+    return _api_client(), {"origins": lane_locations(50), "destinations": lane_locations(60)[10:]}
+
+
+@benchmark("api_lane_quotes[50x50]", setup=_setup_lane_quotes)
+def _bench_api_lane_quotes(client, payload):
+    with stub_openroute_matrix():
+        response = client.post("/api/lanes/quote/", payload, format="json")
+    assert response.status_code == 200, response.content
+
+
+def _setup_simulate_trip():
+    from .services import trip_simulator
+
+    # Cold memo: only what the request's own scenarios share is reused
+    trip_simulator.clear()
+    scenarios = [
+        {
+            "name": f"{rule_set} +{delay}h",
+            "rule_set": rule_set,
+            "delay_hours": delay,
+            "driving_hours": 6,
+            "window_hours": 8,
+            "current_cycle_used": 40,
+        }
+        for rule_set in RULE_SETS for delay in (0, 2, 4, 6, 8, 10, 12, 14)
+    ]
+    return _api_client(), {"trip_miles": 2345.6, "start_time": START_TIME.isoformat(), "scenarios": scenarios}
+
+
+@benchmark("api_simulate_trip[40-scenarios]", setup=_setup_simulate_trip)
+def _bench_api_simulate_trip(client, payload):
+    response = client.post("/api/trips/simulate/", payload, format="json")
+    assert response.status_code == 200, response.content
+
+
+def _setup_fleet_analytics():
+    cache = {}
+
+    def setup():
+        from datetime import timedelta
+        from django.contrib.auth.models import User
+
+        if "drivers" not in cache:
+            # A year of rollups for 50 drivers: what ~18k daily logs a day would scan otherwise
+            drivers = [User.objects.create(username=f"bench-fleet-{i}") for i in range(50)]
+            FleetRollup.objects.bulk_create([
+                FleetRollup(
+                    driver=driver, log_date=START_TIME.date() - timedelta(days=day), log_count=1,
+                    total_miles=500, driving_hours=9, on_duty_hours=2, fuel_stops=day % 2,
+                )
+                for driver in drivers for day in range(365)
+            ], batch_size=1000)
+            cache["drivers"] = drivers
+        return (_api_client(),)
+    return setup
+
+
+@benchmark("api_fleet_analytics[90d-by-day]", setup=_setup_fleet_analytics(), count_queries=True)
+def _bench_api_fleet_analytics(client):
+    response = client.get("/api/analytics/fleet/", {"start": "2024-10-09", "end": "2025-01-06"})
+    assert response.status_code == 200, response.content
+
+
+def _setup_import_chunk():
+    rounds = itertools.count()
+
+    def setup():
+        # Fresh external ids each round, so every row is written rather than skipped
+        round_number = next(rounds)
+        payload = {
+            "current_location": {"name": "Chicago, IL", "coords": [-87.63, 41.88]},
+            "pickup_location": {"name": "Gary, IN", "coords": [-87.35, 41.59]},
+            "dropoff_location": {"name": "Dallas, TX", "coords": [-96.8, 32.78]},
+            "current_cycle_used": 10,
+            "start_time": START_TIME.isoformat(),
+        }
+        rows = [
+            (i, {**payload, "external_id": f"{round_number}-{i}", "distance_miles": 300 + 10 * i})
+            for i in range(1, 101)
+        ]
+        return (rows,)
+
+    return setup
+
+
+@benchmark("import_chunk[100]", setup=_setup_import_chunk(), count_queries=True)
+def _bench_import_chunk(rows):
+    stats = import_chunk(rows, "benchmark", offline=True)
+    assert stats["imported"] == len(rows), stats
+
+
+def _setup_ingest_positions(fmt: str):
+    cache = {}
+    rounds = itertools.count()
+
+    def setup():
+        from django.contrib.auth.models import User
+
+        if "drivers" not in cache:
+            cache["drivers"] = [
+                create_planned_trip(TRIP_LENGTHS["long"], user=User.objects.create(username=f"bench-gps-{fmt}-{i}")).user_id
+                for i in range(20)
+            ]
+        # 50 pings 5 s apart per truck, an hour and a half into the trip and later each round
+        start = START_TIME.timestamp() + 5400 + next(rounds) * 250
+        pings = [
+            (driver_id, start + 5 * i, -87.35 + i * 0.0011, 41.59, 55.0)
+            for driver_id in cache["drivers"] for i in range(50)
+        ]
+        if fmt == "binary":
+            return (_api_client(), pack_pings(pings), "application/octet-stream")
+        body = "\n".join(
+            json.dumps({"driver": d, "recorded_at": t, "coords": [lon, lat], "speed_mph": v})
+            for d, t, lon, lat, v in pings
+        )
+        return (_api_client(), body, "application/x-ndjson")
+
+    return setup
+
+
+for _fmt in ("ndjson", "binary"):
+    @benchmark(f"api_ingest_positions[1000-{_fmt}]", setup=_setup_ingest_positions(_fmt), count_queries=True)
+    def _bench_api_ingest_positions(client, body, content_type):
+        response = client.post("/api/positions/", body, content_type=content_type)
+        assert response.status_code == 200 and response.json()["accepted"] == 1000, response.content
+
+
+def _setup_hos_monitor(trips: int):
+    def setup():
+        result = plan_trip(TRIP_LENGTHS["long"])
+        rows = [
+            (s["sequence_number"], s["segment_type"], s["start_time"], s["end_time"], Decimal(s["distance_tenths"]) / 10)
+            for s in result["segments"]
+        ]
+        plan = hos_monitor.TripPlan(0, rows, compile_rule_set())
+        start = START_TIME.timestamp() + 3 * 3600
+        states = []
+        for trip_id in range(trips):
+            progress = TripProgress(trip_id=trip_id, driven_miles=Decimal(110), behind_seconds=trip_id % 4000)
+            hos_monitor.start(progress, plan, start, moving=True)
+            states.append(progress)
+        return (plan, states, start)
+    return setup
+
+
+@benchmark("hos_monitor_advance[5000-trips]", setup=_setup_hos_monitor(5000))
+def _bench_hos_monitor_advance(plan, states, start):
+    # One ping per active trip, five seconds after the last
+    for progress in states:
+        hos_monitor.advance(progress, plan, start, start + 5, "driving")
+        hos_monitor.update_eta(progress, plan, start + 5)
+
+
+# Worker startup
+
+# What a preloading gunicorn master does before forking workers
+_STARTUP_SCRIPT = (
+    "import django; django.setup();"
+    "from django.core.wsgi import get_wsgi_application; get_wsgi_application();"
+    "from django.urls import get_resolver; get_resolver().url_patterns"
+)
+# Settings profiles to compare; those built on settings_production also need STARTUP_ENV
+STARTUP_PROFILES = {
+    "default": "truck_tracker.settings",
+    "api": "truck_tracker.settings_api",
+}
+STARTUP_ENV = {
+    "SECRET_KEY": "startup-benchmark", "ALLOWED_HOSTS": "localhost", "DB_ENGINE": "sqlite", "DEBUG": "False",
+}
+
+
+def import_profile(settings_module: str) -> Dict[str, Any]:
+    """
+    Boot the app under `settings_module` in a fresh interpreter with
+    `python -X importtime`. Returns the total import time and each module's
+    (self, cumulative) import time, in microseconds.
+    """
+    from django.conf import settings
+
+    env = {**os.environ, **STARTUP_ENV, "DJANGO_SETTINGS_MODULE": settings_module}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _STARTUP_SCRIPT],
+        env=env, cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+    )
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return {"total_us": sum(self_us for self_us, _ in modules.values()), "modules": modules}
+
+
+for _profile, _settings_module in STARTUP_PROFILES.items():
+    @benchmark(f"worker_startup[{_profile}]", setup=lambda settings_module=_settings_module: (settings_module,))
+    def _bench_worker_startup(settings_module):
+        return import_profile(settings_module)
+
+
+def run_benchmark(name: str, rounds: int = 20, warmup: int = 1) -> Dict[str, Any]:
+    bench = BENCHMARKS[name]
+    func, setup = bench["func"], bench["setup"]
+    timings: List[float] = []
+    queries = None
+
+    for i in range(warmup + rounds):
+        args = setup() if setup else ()
+        if bench["count_queries"]:
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                func(*args)
+                elapsed = time.perf_counter() - start
+            queries = len(ctx.captured_queries)
+        else:
+            start = time.perf_counter()
+            func(*args)
+            elapsed = time.perf_counter() - start
+        if i >= warmup:
+            timings.append(elapsed)
+
+    result = {
+        "rounds": rounds,
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.fmean(timings),
+        "stdev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+    }
+    if queries is not None:
+        result["queries"] = queries
+    return result
+
+
+def run_benchmarks(selected: Optional[List[str]] = None, rounds: int = 20, warmup: int = 1) -> Dict[str, Any]:
+    names = [
+        name for name in BENCHMARKS
+        if not selected or any(pattern in name for pattern in selected)
+    ]
+    return {name: run_benchmark(name, rounds=rounds, warmup=warmup) for name in names}
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.10,
+                    metric: str = "median") -> List[Dict[str, Any]]:
+    """
+    Compare two benchmark runs. Returns one row per shared benchmark; rows with
+    `regression` set are slower than baseline by more than `threshold`, or run
+    more queries than before.
+    """
+    rows = []
+    for name, result in current.items():
+        if name not in baseline:
+            continue
+        base = baseline[name]
+        change = (result[metric] - base[metric]) / base[metric] if base[metric] else 0.0
+        query_increase = result.get("queries", 0) > base.get("queries", 0)
+        rows.append({
+            "name": name,
+            "baseline": base[metric],
+            "current": result[metric],
+            "change": change,
+            "baseline_queries": base.get("queries"),
+            "queries": result.get("queries"),
+            "regression": change > threshold or query_increase,
+        })
+    return rows
+
+
+def load_results(path) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)["benchmarks"]
+
+
+def save_results(path, results: Dict[str, Any]):
+    import platform
+
+    payload = {
+        "created_at": datetime.now(dt_timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "benchmarks": results,
+    }
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2, sort_keys=True)
@@ -0,0 +1,73 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+
+class Command(BaseCommand):
+    help = "Run the HOS planner/serializer/API benchmarks and compare against a JSON baseline"
+
+    def add_arguments(self, parser):
+        parser.add_argument("-k", dest="selected", action="append", default=[],
+                            help="Only run benchmarks whose name contains this substring (repeatable)")
+        parser.add_argument("--rounds", type=int, default=20)
+        parser.add_argument("--warmup", type=int, default=1)
+        parser.add_argument("--save", metavar="PATH",
+                            help="Write results to PATH (e.g. benchmarks/baseline.json)")
+        parser.add_argument("--compare", metavar="PATH",
+                            help="Compare results against the baseline stored at PATH")
+        parser.add_argument("--threshold", type=float, default=0.10,
+                            help="Relative slowdown that counts as a regression (default 0.10 = 10%%)")
+        parser.add_argument("--list", action="store_true", help="List benchmark names and exit")
+
+    def handle(self, *args, **options):
+        from core.benchmarks import BENCHMARKS, compare_results, load_results, run_benchmarks, save_results
+
+        if options["list"]:
+            for name in BENCHMARKS:
+                self.stdout.write(name)
+            return
+
+        baseline = load_results(options["compare"]) if options["compare"] else None
+
+        # Benchmarks write trips, so run them against a throwaway test database
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = run_benchmarks(options["selected"], rounds=options["rounds"], warmup=options["warmup"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        for name, result in results.items():
+            queries = f"  queries={result['queries']}" if "queries" in result else ""
+            self.stdout.write(
+                f"{name:<45} median={result['median'] * 1000:9.3f}ms  min={result['min'] * 1000:9.3f}ms{queries}"
+            )
+
+        if options["save"]:
+            path = Path(options["save"])
+            if not path.is_absolute():
+                path = Path(settings.BASE_DIR) / path
+            path.parent.mkdir(parents=True, exist_ok=True)
+            save_results(path, results)
+            self.stdout.write(self.style.SUCCESS(f"Saved {len(results)} results to {path}"))
+
+        if baseline is not None:
+            rows = compare_results(baseline, results, threshold=options["threshold"])
+            regressions = [row for row in rows if row["regression"]]
+            for row in rows:
+                line = (
+                    f"{row['name']:<45} {row['baseline'] * 1000:9.3f}ms -> {row['current'] * 1000:9.3f}ms "
+                    f"({row['change']:+.1%})"
+                )
+                if row["queries"] is not None:
+                    line += f"  queries {row['baseline_queries']} -> {row['queries']}"
+                style = self.style.ERROR if row["regression"] else self.style.SUCCESS
+                self.stdout.write(style(line))
+            if regressions:
+                raise CommandError(
+                    f"{len(regressions)} benchmark(s) regressed by more than {options['threshold']:.0%}"
+                )
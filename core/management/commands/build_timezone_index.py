@@ -0,0 +1,38 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services.timezones import DEFAULT_CELL_SIZE, DEFAULT_INDEX_PATH, build_index
+
+
+class Command(BaseCommand):
+    help = "Compile a GeoJSON file of time zone polygons (with a `tzid` property) into the lookup index"
+
+    def add_arguments(self, parser):
+        parser.add_argument("source", help="GeoJSON FeatureCollection, e.g. timezone-boundary-builder output")
+        parser.add_argument("--cell-size", type=float, default=DEFAULT_CELL_SIZE,
+                            help="Grid cell size in degrees (default %(default)s)")
+        parser.add_argument("--output", default=DEFAULT_INDEX_PATH,
+                            help="Where to write the index (default: the bundled core/data/timezone_index.json)")
+
+    def handle(self, *args, **options):
+        if options["cell_size"] <= 0:
+            raise CommandError("--cell-size must be positive")
+        try:
+            with open(options["source"]) as f:
+                features = json.load(f)["features"]
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f"Couldn't read {options['source']}: {e}")
+
+        index = build_index(features, options["cell_size"])
+        output = Path(options["output"])
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with open(output, "w") as f:
+            json.dump(index, f, separators=(",", ":"))
+
+        split = sum(isinstance(cell, list) for cell in index["cells"].values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {len(index['polygons'])} polygons in {len(index['cells'])} cells "
+            f"({split} on a boundary) to {output}"
+        ))
@@ -0,0 +1,118 @@
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from core.services.trip_import import import_chunk, init_worker, plan_chunk, read_rows, write_chunk
+
+
+class Command(BaseCommand):
+    help = (
+        "Import historical trips from a CSV or JSON Lines file. Worker processes plan and bulk-write "
+        "chunks of rows in parallel, one transaction per chunk. Progress is checkpointed as chunks "
+        "commit, so an interrupted import resumes where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV (current_name, current_lon, current_lat, pickup_..., dropoff_..., ...) "
+                                         "or JSON Lines of POST /api/trips/ payloads")
+        parser.add_argument("--format", choices=["csv", "jsonl"], help="Default: from the file extension")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                            help="Worker processes (0 imports in this process)")
+        parser.add_argument("--chunk-size", type=int, default=500, help="Rows per worker task and per transaction")
+        parser.add_argument("--offline", action="store_true",
+                            help="Never call OpenRouteService: use distance_miles, cached legs or estimates")
+        parser.add_argument("--source", help="Name used in idempotency keys (default: the file name)")
+        parser.add_argument("--checkpoint", help="Progress file (default: <path>.checkpoint.json)")
+        parser.add_argument("--errors", help="Rejected rows as JSON Lines (default: <path>.errors.jsonl)")
+        parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if not os.path.exists(path):
+            raise CommandError(f"No such file: {path}")
+        if options["chunk_size"] < 1 or options["workers"] < 0:
+            raise CommandError("--chunk-size must be positive and --workers non-negative")
+
+        source = options["source"] or os.path.basename(path)
+        checkpoint_path = options["checkpoint"] or f"{path}.checkpoint.json"
+        errors_path = options["errors"] or f"{path}.errors.jsonl"
+
+        progress = {"source": source, "rows_done": 0, "imported": 0, "skipped": 0, "failed": 0}
+        if os.path.exists(checkpoint_path) and not options["restart"]:
+            with open(checkpoint_path) as f:
+                saved = json.load(f)
+            if saved.get("source") != source:
+                raise CommandError(f"{checkpoint_path} belongs to source {saved.get('source')!r}; pass --restart")
+            progress.update(saved)
+            self.stdout.write(f"Resuming after row {progress['rows_done']}")
+
+        rows = read_rows(path, options["format"])
+        # Committed rows are skipped unplanned; any overlap is caught by the idempotency keys
+        for _ in islice(rows, progress["rows_done"]):
+            pass
+        chunks = iter(lambda: list(islice(rows, options["chunk_size"])), [])
+
+        started, rows_at_start = time.monotonic(), progress["rows_done"]
+        with open(errors_path, "a", encoding="utf-8") as errors:
+            def record(stats):
+                for failure in stats["failures"]:
+                    errors.write(json.dumps(failure) + "\n")
+                errors.flush()
+                progress["rows_done"] += stats["rows"]
+                progress["imported"] += stats["imported"]
+                progress["skipped"] += stats["skipped"]
+                progress["failed"] += len(stats["failures"])
+                self._save_checkpoint(checkpoint_path, progress)
+
+                rate = (progress["rows_done"] - rows_at_start) / max(time.monotonic() - started, 1e-9)
+                self.stdout.write(
+                    f"  {progress['rows_done']} rows: {progress['imported']} imported, "
+                    f"{progress['skipped']} already present, {progress['failed']} failed ({rate:.0f} rows/s)"
+                )
+
+            if options["workers"] == 0:
+                for chunk in chunks:
+                    record(import_chunk(chunk, source, options["offline"]))
+            else:
+                # SQLite takes one writer at a time, so there workers only plan
+                # and this process writes; elsewhere workers write their chunks too
+                serial_writes = connection.vendor == "sqlite"
+                task = plan_chunk if serial_writes else import_chunk
+
+                def finish(future):
+                    if not serial_writes:
+                        return record(future.result())
+                    planned = future.result()
+                    record({**write_chunk(planned), "rows": len(planned)})
+
+                # Forked workers must not share this process's connection
+                connections.close_all()
+                # Results are recorded in file order, so the checkpoint only
+                # covers rows whose chunk (and every chunk before it) has
+                # committed. At most two chunks per worker are in flight, which
+                # keeps memory bounded for any file size.
+                with ProcessPoolExecutor(max_workers=options["workers"], initializer=init_worker) as pool:
+                    pending = deque()
+                    for chunk in chunks:
+                        pending.append(pool.submit(task, chunk, source, options["offline"]))
+                        if len(pending) >= 2 * options["workers"]:
+                            finish(pending.popleft())
+                    while pending:
+                        finish(pending.popleft())
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {progress['imported']} trips ({progress['skipped']} already present, "
+            f"{progress['failed']} failed; see {errors_path})"
+        ))
+
+    def _save_checkpoint(self, path, progress):
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(progress, f)
+        os.replace(tmp, path)
@@ -0,0 +1,76 @@
+import contextlib
+import io
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections, connection, transaction
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure concurrent create_trip write throughput against the configured database. "
+        "Run once per settings profile to compare backends."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--trips", type=int, default=200, help="Total trips to write")
+        parser.add_argument("--concurrency", type=int, default=8, help="Writer threads")
+        parser.add_argument("--miles", type=float, default=1500.0, help="Trip length to plan")
+        parser.add_argument("--keep", action="store_true", help="Keep the trips written by the run")
+
+    def handle(self, *args, **options):
+        from core.benchmarks import plan_trip
+        from core.models import Trip
+        from core.services import locations
+        from core.services.trip_persistence import save_trip_results
+
+        miles = options["miles"]
+        names = ("Load Test", "Load Test Pickup", "Load Test Dropoff")
+        location_ids = locations.intern(names)
+
+        def write_one(_):
+            result = plan_trip(miles)
+            start = time.perf_counter()
+            try:
+                with transaction.atomic():
+                    trip = Trip.objects.create(
+                        current_location_id=location_ids[names[0]],
+                        pickup_location_id=location_ids[names[1]],
+                        dropoff_location_id=location_ids[names[2]],
+                        total_distance=miles,
+                    )
+                    save_trip_results(trip, result)
+                return trip.pk, time.perf_counter() - start, None
+            except DatabaseError as e:
+                return None, time.perf_counter() - start, str(e)
+            finally:
+                close_old_connections()
+
+        vendor = connection.vendor
+        self.stdout.write(
+            f"Writing {options['trips']} trips ({miles} mi) with {options['concurrency']} threads on {vendor}"
+        )
+
+        wall_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool, \
+                contextlib.redirect_stdout(io.StringIO()):
+            results = list(pool.map(write_one, range(options["trips"])))
+        wall = time.perf_counter() - wall_start
+
+        trip_ids = [pk for pk, _, _ in results if pk is not None]
+        latencies = sorted(latency for pk, latency, _ in results if pk is not None)
+        errors = [error for _, _, error in results if error]
+
+        self.stdout.write(f"  written:    {len(trip_ids)}")
+        self.stdout.write(f"  errors:     {len(errors)}" + (f" (e.g. {errors[0]})" if errors else ""))
+        self.stdout.write(f"  throughput: {len(trip_ids) / wall:.1f} trips/s over {wall:.2f}s")
+        if latencies:
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            self.stdout.write(
+                f"  latency:    p50={statistics.median(latencies) * 1000:.1f}ms p95={p95 * 1000:.1f}ms"
+            )
+
+        if not options["keep"] and trip_ids:
+            Trip.objects.filter(pk__in=trip_ids).delete()
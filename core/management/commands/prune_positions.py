@@ -0,0 +1,38 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.models import PositionPing
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete GPS pings older than --days, oldest first and in batches, so the positions "
+        "table stays bounded without long write locks. Run it daily."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=30, help="Days of pings to keep")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Pings deleted per statement")
+
+    def handle(self, *args, **options):
+        if options["days"] < 1:
+            raise CommandError("--days must be positive")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive")
+
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        deleted = 0
+        while True:
+            # Walks the recorded_at index; each batch commits on its own
+            batch = list(
+                PositionPing.objects.filter(recorded_at__lt=cutoff)
+                .order_by("recorded_at").values_list("pk", flat=True)[:options["batch_size"]]
+            )
+            if not batch:
+                break
+            deleted += PositionPing.objects.filter(pk__in=batch).delete()[0]
+            self.stdout.write(f"  {deleted} pings deleted")
+
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} pings recorded before {cutoff:%Y-%m-%d %H:%M}"))
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_date
+
+from core.models import FleetRollup
+from core.services.fleet_rollups import rebuild_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute fleet analytics rollups from daily logs. Run it after bulk imports or manual "
+        "log edits, while no trips are being planned for the rebuilt dates."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", help="First log date to rebuild (YYYY-MM-DD, default: all)")
+        parser.add_argument("--end", help="Last log date to rebuild (YYYY-MM-DD, default: all)")
+        parser.add_argument("--batch-size", type=int, default=2000, help="Rollup rows written per insert")
+
+    def handle(self, *args, **options):
+        dates = {}
+        for name in ("start", "end"):
+            value = options[name]
+            dates[name] = parse_date(value) if value else None
+            if value and dates[name] is None:
+                raise CommandError(f"Invalid --{name} date: {value}")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive")
+
+        stale = FleetRollup.objects.all()
+        if dates["start"]:
+            stale = stale.filter(log_date__gte=dates["start"])
+        if dates["end"]:
+            stale = stale.filter(log_date__lte=dates["end"])
+
+        written = 0
+        # Readers see either the old rollups or the complete new ones
+        with transaction.atomic():
+            stale.delete()
+            batch = []
+            for row in rebuild_rows(dates["start"], dates["end"]):
+                batch.append(row)
+                if len(batch) >= options["batch_size"]:
+                    FleetRollup.objects.bulk_create(batch)
+                    written += len(batch)
+                    batch = []
+                    self.stdout.write(f"  {written} rollup rows (through {row.log_date})")
+            FleetRollup.objects.bulk_create(batch)
+            written += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} fleet rollup rows"))
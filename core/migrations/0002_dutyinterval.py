@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DutyInterval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('duty_status', models.CharField(choices=[('off_duty', 'Off Duty'), ('sleeper_berth', 'Sleeper Berth'), ('driving', 'Driving'), ('on_duty_not_driving', 'On Duty (Not Driving)')], max_length=20)),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField()),
+                ('location', models.CharField(max_length=255)),
+                ('driver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='duty_intervals', to=settings.AUTH_USER_MODEL)),
+                ('trip', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='duty_intervals', to='core.trip')),
+            ],
+            options={
+                'ordering': ['driver', 'start'],
+                'indexes': [models.Index(fields=['driver', 'start'], name='core_dutyinterval_driver_start')],
+            },
+        ),
+    ]
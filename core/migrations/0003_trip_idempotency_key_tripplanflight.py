@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_dutyinterval'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TripPlanFlight',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('distance_miles', models.FloatField(blank=True, null=True)),
+                ('start_time', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='idempotency_key',
+            field=models.CharField(blank=True, help_text='Idempotency-Key header of the request that created this trip', max_length=255, null=True, unique=True),
+        ),
+    ]
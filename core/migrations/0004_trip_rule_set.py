@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_trip_idempotency_key_tripplanflight'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trip',
+            name='adverse_conditions',
+            field=models.BooleanField(default=False, help_text='Plan with the adverse driving conditions extension'),
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='rule_set',
+            field=models.CharField(choices=[('property', 'Property-carrying (11/14, 30-min break, 10-hr reset)'), ('property_short_haul', 'Property-carrying, 150 air-mile short-haul exemption'), ('property_split_7_3', 'Property-carrying, 7/3 split sleeper berth'), ('property_split_8_2', 'Property-carrying, 8/2 split sleeper berth'), ('passenger', 'Passenger-carrying (10/15, 8-hr reset)')], default='property', max_length=30),
+        ),
+        migrations.AlterField(
+            model_name='tripsegment',
+            name='segment_type',
+            field=models.CharField(choices=[('driving', 'Driving'), ('rest_break', '30-min Rest Break'), ('sleeper_berth', 'Sleeper Berth'), ('off_duty', 'Off Duty'), ('fuel', 'Fueling'), ('pickup', 'Pickup'), ('dropoff', 'Dropoff')], max_length=20),
+        ),
+    ]
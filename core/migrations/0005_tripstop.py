@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_trip_rule_set'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tripsegment',
+            name='segment_type',
+            field=models.CharField(choices=[('driving', 'Driving'), ('rest_break', '30-min Rest Break'), ('sleeper_berth', 'Sleeper Berth'), ('off_duty', 'Off Duty'), ('wait', 'Waiting for Time Window'), ('fuel', 'Fueling'), ('pickup', 'Pickup'), ('dropoff', 'Dropoff')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='TripStop',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence_number', models.IntegerField()),
+                ('requested_position', models.IntegerField(help_text='Position in the request, before stop ordering')),
+                ('stop_type', models.CharField(choices=[('pickup', 'Pickup'), ('dropoff', 'Dropoff')], max_length=10)),
+                ('name', models.CharField(max_length=255)),
+                ('longitude', models.FloatField()),
+                ('latitude', models.FloatField()),
+                ('window_start', models.DateTimeField(blank=True, null=True)),
+                ('window_end', models.DateTimeField(blank=True, null=True)),
+                ('leg_miles', models.DecimalField(decimal_places=1, default=0, max_digits=7)),
+                ('planned_arrival', models.DateTimeField(blank=True, null=True)),
+                ('trip', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stops', to='core.trip')),
+            ],
+            options={
+                'ordering': ['trip', 'sequence_number'],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-19 05:00
+
+import core.services.timezones
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_tripstop'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trip',
+            name='home_terminal_time_zone',
+            field=models.CharField(default=core.services.timezones.default_home_terminal_time_zone, help_text="IANA time zone the driver's daily logs are kept in", max_length=64),
+        ),
+        migrations.AddField(
+            model_name='tripsegment',
+            name='time_zone',
+            field=models.CharField(blank=True, default='', help_text='IANA time zone of the local clock', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='tripstop',
+            name='time_zone',
+            field=models.CharField(blank=True, default='', help_text='IANA time zone at the stop', max_length=64),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.6 on 2026-10-19 05:04
+
+from zoneinfo import ZoneInfo
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_fuel_stops(apps, schema_editor):
+    """Count each existing log's fuel stops from the trip's fuel segments."""
+    Trip = apps.get_model('core', 'Trip')
+    TripSegment = apps.get_model('core', 'TripSegment')
+    DailyLog = apps.get_model('core', 'DailyLog')
+
+    zones = dict(Trip.objects.values_list('id', 'home_terminal_time_zone'))
+    counts = {}
+    for trip_id, start_time in (
+            TripSegment.objects.filter(segment_type='fuel').values_list('trip_id', 'start_time').iterator()):
+        key = (trip_id, start_time.astimezone(ZoneInfo(zones[trip_id] or 'UTC')).date())
+        counts[key] = counts.get(key, 0) + 1
+    for (trip_id, log_date), fuel_stops in counts.items():
+        DailyLog.objects.filter(trip_id=trip_id, log_date=log_date).update(fuel_stops=fuel_stops)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_trip_time_zones'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailylog',
+            name='fuel_stops',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='FleetRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('log_date', models.DateField()),
+                ('log_count', models.IntegerField(default=0, help_text='Daily logs (trip-days) rolled up')),
+                ('total_miles', models.DecimalField(decimal_places=1, default=0, max_digits=12)),
+                ('driving_hours', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('on_duty_hours', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('fuel_stops', models.IntegerField(default=0)),
+                ('driver', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='fleet_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['log_date', 'driver'],
+                'indexes': [models.Index(fields=['driver', 'log_date'], name='core_fleetrollup_driver_date')],
+                'constraints': [models.UniqueConstraint(fields=('log_date', 'driver'), name='core_fleetrollup_date_driver')],
+            },
+        ),
+        migrations.RunPython(backfill_fuel_stops, migrations.RunPython.noop),
+    ]
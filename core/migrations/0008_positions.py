@@ -0,0 +1,47 @@
+# Generated by Django 5.2.6 on 2026-10-19 05:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_fleet_rollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TripProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recorded_at', models.DateTimeField(help_text='Time of the latest ping matched to the trip')),
+                ('longitude', models.FloatField()),
+                ('latitude', models.FloatField()),
+                ('driven_miles', models.DecimalField(decimal_places=3, default=0, max_digits=10)),
+                ('planned_miles', models.DecimalField(decimal_places=1, default=0, help_text='Miles the plan has driven by recorded_at', max_digits=10)),
+                ('segment_sequence', models.IntegerField(help_text='Planned segment at recorded_at')),
+                ('behind_seconds', models.IntegerField(default=0, help_text='How far the truck runs behind the plan at driven_miles (negative: ahead)')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('trip', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='progress', to='core.trip')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PositionPing',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recorded_at', models.DateTimeField()),
+                ('longitude', models.FloatField()),
+                ('latitude', models.FloatField()),
+                ('speed_mph', models.FloatField(blank=True, null=True)),
+                ('driver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='positions', to=settings.AUTH_USER_MODEL)),
+                ('trip', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='positions', to='core.trip')),
+            ],
+            options={
+                'ordering': ['driver', 'recorded_at'],
+                'indexes': [models.Index(fields=['driver', 'recorded_at'], name='core_position_driver_time'), models.Index(fields=['recorded_at'], name='core_position_time')],
+            },
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.6 on 2026-10-19 05:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_positions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tripprogress',
+            name='alerts_raised',
+            field=models.IntegerField(default=0, help_text='HOS alerts already raised since the last rest'),
+        ),
+        migrations.AddField(
+            model_name='tripprogress',
+            name='driving_seconds',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tripprogress',
+            name='duty_status',
+            field=models.CharField(choices=[('off_duty', 'Off Duty'), ('sleeper_berth', 'Sleeper Berth'), ('driving', 'Driving'), ('on_duty_not_driving', 'On Duty (Not Driving)')], default='on_duty_not_driving', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='tripprogress',
+            name='estimated_arrival',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='tripprogress',
+            name='eta_drift_steps',
+            field=models.IntegerField(default=0, help_text='ETA drift at the last eta_drift alert, in steps'),
+        ),
+        migrations.AddField(
+            model_name='tripprogress',
+            name='since_break_seconds',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tripprogress',
+            name='status_since',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='tripprogress',
+            name='window_seconds',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='tripprogress',
+            name='recorded_at',
+            field=models.DateTimeField(help_text='Time of the latest ping or duty status change on the trip'),
+        ),
+        migrations.CreateModel(
+            name='TripAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('driving_limit', 'Driving limit exceeded'), ('window_limit', 'Driving after the on-duty window'), ('missed_break', 'Required break missed'), ('rest_early', 'Must rest before the planned stop'), ('eta_drift', 'Arrival estimate moved')], max_length=20)),
+                ('recorded_at', models.DateTimeField(help_text='Time of the ping or status change that raised the alert')),
+                ('value_seconds', models.IntegerField(help_text='Seconds over the limit, short of the planned rest, or behind plan')),
+                ('message', models.CharField(max_length=200)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('trip', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='core.trip')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.6 on 2026-10-19 05:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_hos_monitor'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='trip',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='trip',
+            name='dropoff_location',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='trip',
+            name='pickup_location',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='tripstop',
+            name='name',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='dailylog',
+            index=models.Index(fields=['log_date'], name='core_dailylog_log_date'),
+        ),
+        migrations.AddIndex(
+            model_name='logentry',
+            index=models.Index(fields=['duty_status', 'daily_log', 'start_hour'], name='core_logentry_status_log_hour'),
+        ),
+        migrations.AddIndex(
+            model_name='tripsegment',
+            index=models.Index(fields=['segment_type', 'trip', 'sequence_number'], name='core_segment_type_trip_seq'),
+        ),
+    ]
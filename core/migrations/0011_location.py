@@ -0,0 +1,102 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+# (model, field, was indexed) for every free-text location column
+LOCATION_COLUMNS = [
+    ('trip', 'current_location', False),
+    ('trip', 'pickup_location', True),
+    ('trip', 'dropoff_location', True),
+    ('tripsegment', 'location', False),
+    ('logentry', 'location', False),
+    ('dutyinterval', 'location', False),
+]
+
+
+def intern_location_names(apps, schema_editor):
+    Location = apps.get_model('core', 'Location')
+    names = set()
+    for model_name, field, _ in LOCATION_COLUMNS:
+        model = apps.get_model('core', model_name)
+        names.update(model.objects.values_list(field, flat=True).distinct().iterator())
+    Location.objects.bulk_create([Location(name=name) for name in sorted(names)], batch_size=1000)
+
+    # Trip stops already carry coordinates for their names
+    TripStop = apps.get_model('core', 'TripStop')
+    for name, longitude, latitude in TripStop.objects.values_list('name', 'longitude', 'latitude').iterator():
+        Location.objects.filter(name=name, longitude__isnull=True).update(longitude=longitude, latitude=latitude)
+
+    for model_name, field, _ in LOCATION_COLUMNS:
+        model = apps.get_model('core', model_name)
+        model.objects.update(**{
+            f'{field}_ref': Subquery(Location.objects.filter(name=OuterRef(field)).values('pk')[:1])
+        })
+
+
+def restore_location_names(apps, schema_editor):
+    Location = apps.get_model('core', 'Location')
+    for model_name, field, _ in LOCATION_COLUMNS:
+        model = apps.get_model('core', model_name)
+        model.objects.update(**{
+            field: Subquery(Location.objects.filter(pk=OuterRef(f'{field}_ref')).values('name')[:1])
+        })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('longitude', models.FloatField(blank=True, null=True)),
+                ('latitude', models.FloatField(blank=True, null=True)),
+            ],
+        ),
+        *[
+            migrations.AddField(
+                model_name=model_name,
+                name=f'{field}_ref',
+                field=models.ForeignKey(
+                    null=True, db_index=False, on_delete=django.db.models.deletion.PROTECT,
+                    related_name='+', to='core.location'
+                ),
+            )
+            for model_name, field, _ in LOCATION_COLUMNS
+        ],
+        # Nullable first, so the old columns can be added back and refilled on reverse
+        *[
+            migrations.AlterField(
+                model_name=model_name,
+                name=field,
+                field=models.CharField(max_length=255, null=True, db_index=indexed),
+            )
+            for model_name, field, indexed in LOCATION_COLUMNS
+        ],
+        migrations.RunPython(intern_location_names, restore_location_names),
+        *[
+            migrations.RemoveField(model_name=model_name, name=field)
+            for model_name, field, _ in LOCATION_COLUMNS
+        ],
+        *[
+            migrations.RenameField(model_name=model_name, old_name=f'{field}_ref', new_name=field)
+            for model_name, field, _ in LOCATION_COLUMNS
+        ],
+        *[
+            migrations.AlterField(
+                model_name=model_name,
+                name=field,
+                field=models.ForeignKey(
+                    db_index=indexed, on_delete=django.db.models.deletion.PROTECT,
+                    related_name='+', to='core.location'
+                ),
+            )
+            for model_name, field, indexed in LOCATION_COLUMNS
+        ],
+    ]
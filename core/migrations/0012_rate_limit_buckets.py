@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-19 05:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_location'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateLimitBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=40, unique=True)),
+                ('capacity', models.FloatField()),
+                ('period_seconds', models.FloatField()),
+                ('fixed_window', models.BooleanField(default=False, help_text='Refilled all at once at each period boundary (UTC) rather than continuously')),
+                ('tokens', models.FloatField()),
+                ('updated_at', models.FloatField()),
+                ('granted', models.BigIntegerField(default=0)),
+                ('shed', models.BigIntegerField(default=0, help_text='Calls refused for lack of tokens')),
+                ('upstream_throttled', models.BigIntegerField(default=0, help_text='429 responses from OpenRouteService')),
+            ],
+        ),
+    ]
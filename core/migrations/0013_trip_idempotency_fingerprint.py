@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 05:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_rate_limit_buckets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trip',
+            name='idempotency_fingerprint',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-19 05:57
+
+from django.db import migrations, models
+
+
+def plan_split_trips_as_property(apps, schema_editor):
+    # Replans must compile the trip's rule set; saved plans are left as they are
+    Trip = apps.get_model('core', 'Trip')
+    Trip.objects.filter(rule_set__in=['property_split_7_3', 'property_split_8_2']).update(rule_set='property')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_trip_idempotency_fingerprint'),
+    ]
+
+    operations = [
+        migrations.RunPython(plan_split_trips_as_property, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='trip',
+            name='rule_set',
+            field=models.CharField(choices=[('property', 'Property-carrying (11/14, 30-min break, 10-hr reset)'), ('property_short_haul', 'Property-carrying, 150 air-mile short-haul exemption'), ('passenger', 'Passenger-carrying (10/15, 8-hr reset)')], default='property', max_length=30),
+        ),
+    ]
@@ -1,15 +1,38 @@
+from datetime import timedelta
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from .services.hos_rules import DEFAULT_RULE_SET, RULE_SET_CHOICES
+from .services.timezones import default_home_terminal_time_zone
+
+
+class Location(models.Model):
+    """
+    A place name stored once and referenced by id from trips, segments, log
+    entries and duty intervals. Rows are created through
+    `services.locations.intern`. A name isn't a place (there are many
+    Springfields), so requests always carry their own coordinates for
+    routing; the ones stored here are only the first seen with the name, and
+    null for planner labels like "On Route".
+    """
+    name = models.CharField(max_length=255, unique=True)
+    longitude = models.FloatField(null=True, blank=True)
+    latitude = models.FloatField(null=True, blank=True)
+
+    def __str__(self):
+        return self.name
+
 
 class Trip(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="trips", null=True, blank=True)
     
     # Required inputs from assessment
-    current_location = models.CharField(max_length=255)
-    pickup_location = models.CharField(max_length=255)
-    dropoff_location = models.CharField(max_length=255)
+    current_location = models.ForeignKey(Location, on_delete=models.PROTECT, related_name="+", db_index=False)
+    # Indexed for the admin's searches by pickup and dropoff name
+    pickup_location = models.ForeignKey(Location, on_delete=models.PROTECT, related_name="+")
+    dropoff_location = models.ForeignKey(Location, on_delete=models.PROTECT, related_name="+")
     current_cycle_used = models.DecimalField(
         max_digits=4,
         decimal_places=2,
@@ -17,6 +40,16 @@ class Trip(models.Model):
         default=0.00,
         help_text="Hours already used in current 8-day cycle (max 70)"
     )
+    rule_set = models.CharField(max_length=30, choices=RULE_SET_CHOICES, default=DEFAULT_RULE_SET)
+    adverse_conditions = models.BooleanField(
+        default=False,
+        help_text="Plan with the adverse driving conditions extension"
+    )
+    home_terminal_time_zone = models.CharField(
+        max_length=64,
+        default=default_home_terminal_time_zone,
+        help_text="IANA time zone the driver's daily logs are kept in"
+    )
     
     # Calculated fields
     total_distance = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
@@ -25,7 +58,16 @@ class Trip(models.Model):
     required_rest_stops = models.IntegerField(default=0)
     
     # Trip metadata
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    idempotency_key = models.CharField(
+        max_length=255,
+        unique=True,
+        null=True,
+        blank=True,
+        help_text="Idempotency-Key header of the request that created this trip"
+    )
+    # Hash of the caller and body of that request; a reused key with another fingerprint is refused
+    idempotency_fingerprint = models.CharField(max_length=64, blank=True, default="")
     
     def __str__(self):
         return f"Trip {self.id}: {self.pickup_location} → {self.dropoff_location}"
@@ -36,6 +78,8 @@ class TripSegment(models.Model):
         ("driving", "Driving"),
         ("rest_break", "30-min Rest Break"),
         ("sleeper_berth", "Sleeper Berth"),
+        ("off_duty", "Off Duty"),
+        ("wait", "Waiting for Time Window"),
         ("fuel", "Fueling"),
         ("pickup", "Pickup"),
         ("dropoff", "Dropoff"),
@@ -49,15 +93,53 @@ class TripSegment(models.Model):
     end_time = models.DateTimeField()
     duration_hours = models.DecimalField(max_digits=4, decimal_places=2)
     distance_miles = models.DecimalField(max_digits=7, decimal_places=2, null=True, blank=True, default=0)
-    location = models.CharField(max_length=255)
+    # Nothing looks segments up by location, so the FK needs no index
+    location = models.ForeignKey(Location, on_delete=models.PROTECT, related_name="+", db_index=False)
+    time_zone = models.CharField(max_length=64, blank=True, default="", help_text="IANA time zone of the local clock")
     
     class Meta:
         ordering = ["trip", "sequence_number"]
+        indexes = [
+            # Filtering by type in the default order
+            models.Index(fields=["segment_type", "trip", "sequence_number"], name="core_segment_type_trip_seq"),
+        ]
     
     def __str__(self):
         return f"{self.segment_type} - {self.duration_hours}h"
 
 
+class TripStop(models.Model):
+    """
+    A pickup or delivery on a multi-stop trip, in the order it is visited.
+    The trip's pickup_location/dropoff_location hold the first and last stop.
+    """
+    STOP_TYPES = [
+        ("pickup", "Pickup"),
+        ("dropoff", "Dropoff"),
+    ]
+    
+    trip = models.ForeignKey(Trip, on_delete=models.CASCADE, related_name="stops")
+    sequence_number = models.IntegerField()
+    requested_position = models.IntegerField(help_text="Position in the request, before stop ordering")
+    stop_type = models.CharField(max_length=10, choices=STOP_TYPES)
+    name = models.CharField(max_length=255, db_index=True)
+    longitude = models.FloatField()
+    latitude = models.FloatField()
+    window_start = models.DateTimeField(null=True, blank=True)
+    window_end = models.DateTimeField(null=True, blank=True)
+    time_zone = models.CharField(max_length=64, blank=True, default="", help_text="IANA time zone at the stop")
+    
+    # From the HOS plan
+    leg_miles = models.DecimalField(max_digits=7, decimal_places=1, default=0)
+    planned_arrival = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ["trip", "sequence_number"]
+    
+    def __str__(self):
+        return f"Stop {self.sequence_number}: {self.name}"
+
+
 class DailyLog(models.Model):
     trip = models.ForeignKey(Trip, on_delete=models.CASCADE, related_name="daily_logs")
     log_date = models.DateField()
@@ -69,10 +151,14 @@ class DailyLog(models.Model):
     sleeper_berth_hours = models.DecimalField(max_digits=4, decimal_places=2, default=0)
     driving_hours = models.DecimalField(max_digits=4, decimal_places=2, default=0)
     on_duty_hours = models.DecimalField(max_digits=4, decimal_places=2, default=0)
+    fuel_stops = models.IntegerField(default=0)
     
     class Meta:
         ordering = ["trip", "day_number"]
         unique_together = ["trip", "day_number"]
+        indexes = [
+            models.Index(fields=["log_date"], name="core_dailylog_log_date"),
+        ]
     
     def __str__(self):
         return f"Day {self.day_number} - {self.log_date}"
@@ -91,10 +177,195 @@ class LogEntry(models.Model):
     
     start_hour = models.DecimalField(max_digits=4, decimal_places=2)
     end_hour = models.DecimalField(max_digits=4, decimal_places=2)
-    location = models.CharField(max_length=100)
+    location = models.ForeignKey(Location, on_delete=models.PROTECT, related_name="+", db_index=False)
     
     class Meta:
         ordering = ["daily_log", "start_hour"]
+        indexes = [
+            # Filtering by status in the default order
+            models.Index(fields=["duty_status", "daily_log", "start_hour"], name="core_logentry_status_log_hour"),
+        ]
     
     def __str__(self):
-        return f"{self.duty_status} {self.start_hour}-{self.end_hour}"
\ No newline at end of file
+        return f"{self.duty_status} {self.start_hour}-{self.end_hour}"
+
+class DutyInterval(models.Model):
+    """
+    A driver's duty status over an absolute time range, one row per planned
+    segment. Kept in sync by `save_trip_results` for trips with a driver, so
+    a driver's timeline can be read without walking DailyLog/LogEntry.
+    """
+    # Longer segments are split so an overlap query only has to look back this far
+    MAX_DURATION = timedelta(hours=24)
+
+    driver = models.ForeignKey(User, on_delete=models.CASCADE, related_name="duty_intervals")
+    trip = models.ForeignKey(Trip, on_delete=models.CASCADE, related_name="duty_intervals")
+    duty_status = models.CharField(max_length=20, choices=LogEntry.DUTY_STATUS_CHOICES)
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+    location = models.ForeignKey(Location, on_delete=models.PROTECT, related_name="+", db_index=False)
+
+    class Meta:
+        ordering = ["driver", "start"]
+        indexes = [
+            models.Index(fields=["driver", "start"], name="core_dutyinterval_driver_start"),
+        ]
+
+    def __str__(self):
+        return f"{self.driver_id} {self.duty_status} {self.start:%Y-%m-%d %H:%M}-{self.end:%H:%M}"
+
+
+class FleetRollup(models.Model):
+    """
+    Fleet totals for one driver (or for trips without one) on one log date.
+    Kept up to date from DailyLog by `core.services.fleet_rollups`, so fleet
+    analytics read a row per driver-day instead of aggregating every log.
+    """
+    driver = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name="fleet_rollups")
+    log_date = models.DateField()
+    log_count = models.IntegerField(default=0, help_text="Daily logs (trip-days) rolled up")
+    total_miles = models.DecimalField(max_digits=12, decimal_places=1, default=0)
+    driving_hours = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    on_duty_hours = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    fuel_stops = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ["log_date", "driver"]
+        constraints = [
+            models.UniqueConstraint(fields=["log_date", "driver"], name="core_fleetrollup_date_driver"),
+        ]
+        indexes = [
+            models.Index(fields=["driver", "log_date"], name="core_fleetrollup_driver_date"),
+        ]
+
+    def __str__(self):
+        return f"{self.log_date} driver={self.driver_id}: {self.total_miles} mi"
+
+
+class TripPlanFlight(models.Model):
+    """
+    Cross-worker claim on computing a trip plan for a normalized request.
+    The worker that inserts the row routes the trip; workers with the same
+    key wait for it to fill in the result instead of calling OpenRouteService.
+    """
+    key = models.CharField(max_length=64, unique=True)
+    distance_miles = models.FloatField(null=True, blank=True)
+    start_time = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.key[:12]} ({'done' if self.completed_at else 'in flight'})"
+
+
+class RateLimitBucket(models.Model):
+    """
+    Token bucket shared by every worker for one OpenRouteService endpoint and
+    quota period ("directions:minute", "geocode:day", ...). Tokens are taken
+    with a single conditional UPDATE by `core.services.openroute_quota`.
+    """
+    name = models.CharField(max_length=40, unique=True)
+    # `capacity` calls per `period_seconds`
+    capacity = models.FloatField()
+    period_seconds = models.FloatField()
+    fixed_window = models.BooleanField(
+        default=False,
+        help_text="Refilled all at once at each period boundary (UTC) rather than continuously",
+    )
+    tokens = models.FloatField()
+    # Unix time `tokens` was last brought up to date
+    updated_at = models.FloatField()
+    # Usage counters, for /api/routing/quota/
+    granted = models.BigIntegerField(default=0)
+    shed = models.BigIntegerField(default=0, help_text="Calls refused for lack of tokens")
+    upstream_throttled = models.BigIntegerField(default=0, help_text="429 responses from OpenRouteService")
+
+    def __str__(self):
+        return f"{self.name}: {self.tokens:.1f}/{self.capacity:g}"
+
+
+class PositionPing(models.Model):
+    """
+    One GPS fix from a driver's truck. Append-only: `core.services.positions`
+    writes pings in bulk and `manage.py prune_positions` drops old days.
+    """
+    driver = models.ForeignKey(User, on_delete=models.CASCADE, related_name="positions")
+    # The trip being driven when the fix was taken, if any
+    trip = models.ForeignKey(Trip, on_delete=models.SET_NULL, null=True, blank=True, related_name="positions")
+    recorded_at = models.DateTimeField()
+    longitude = models.FloatField()
+    latitude = models.FloatField()
+    speed_mph = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["driver", "recorded_at"]
+        indexes = [
+            models.Index(fields=["driver", "recorded_at"], name="core_position_driver_time"),
+            models.Index(fields=["recorded_at"], name="core_position_time"),
+        ]
+
+    def __str__(self):
+        return f"{self.driver_id} @ {self.recorded_at:%Y-%m-%d %H:%M:%S} ({self.longitude:.5f}, {self.latitude:.5f})"
+
+
+class TripProgress(models.Model):
+    """
+    How far a trip's truck has driven against the plan, updated from GPS pings
+    by `core.services.positions`.
+    """
+    trip = models.OneToOneField(Trip, on_delete=models.CASCADE, related_name="progress")
+    recorded_at = models.DateTimeField(help_text="Time of the latest ping or duty status change on the trip")
+    # Where driven miles were last counted from (moves under MIN_MOVE_MILES are GPS jitter)
+    longitude = models.FloatField()
+    latitude = models.FloatField()
+    driven_miles = models.DecimalField(max_digits=10, decimal_places=3, default=0)
+    planned_miles = models.DecimalField(
+        max_digits=10, decimal_places=1, default=0, help_text="Miles the plan has driven by recorded_at"
+    )
+    segment_sequence = models.IntegerField(help_text="Planned segment at recorded_at")
+    behind_seconds = models.IntegerField(
+        default=0, help_text="How far the truck runs behind the plan at driven_miles (negative: ahead)"
+    )
+    estimated_arrival = models.DateTimeField(null=True, blank=True)
+    # HOS counters as observed (see core.services.hos_monitor); while the
+    # driver is stopped they stand as of status_since
+    duty_status = models.CharField(
+        max_length=20, choices=LogEntry.DUTY_STATUS_CHOICES, default="on_duty_not_driving"
+    )
+    status_since = models.DateTimeField(null=True, blank=True)
+    driving_seconds = models.IntegerField(default=0)
+    window_seconds = models.IntegerField(default=0)
+    since_break_seconds = models.IntegerField(default=0)
+    alerts_raised = models.IntegerField(default=0, help_text="HOS alerts already raised since the last rest")
+    eta_drift_steps = models.IntegerField(default=0, help_text="ETA drift at the last eta_drift alert, in steps")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Trip {self.trip_id}: {self.driven_miles} of {self.planned_miles} planned mi"
+
+
+class TripAlert(models.Model):
+    """
+    A deviation from a trip's plan found by `core.services.hos_monitor`, read
+    through `/api/alerts/`.
+    """
+    KIND_CHOICES = [
+        ("driving_limit", "Driving limit exceeded"),
+        ("window_limit", "Driving after the on-duty window"),
+        ("missed_break", "Required break missed"),
+        ("rest_early", "Must rest before the planned stop"),
+        ("eta_drift", "Arrival estimate moved"),
+    ]
+
+    trip = models.ForeignKey(Trip, on_delete=models.CASCADE, related_name="alerts")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    recorded_at = models.DateTimeField(help_text="Time of the ping or status change that raised the alert")
+    value_seconds = models.IntegerField(help_text="Seconds over the limit, short of the planned rest, or behind plan")
+    message = models.CharField(max_length=200)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["id"]
+
+    def __str__(self):
+        return f"Trip {self.trip_id} {self.kind}: {self.message}"
@@ -1,5 +1,17 @@
+import json
+from datetime import timedelta
+
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Trip, TripSegment, DailyLog, LogEntry
+from .models import Trip, TripSegment, TripStop, DailyLog, LogEntry, DutyInterval
+from .services import locations
+from .services.hos_rules import DEFAULT_RULE_SET, RULE_SET_CHOICES
+from .services.timezones import default_home_terminal_time_zone, is_valid_time_zone, local_isoformat
+
+try:
+    import orjson
+except ImportError:  # optional, render_trip_json falls back to the stdlib encoder
+    orjson = None
 
 
 class LocationCoordinateSerializer(serializers.Serializer):
@@ -28,6 +40,19 @@ class LocationCoordinateSerializer(serializers.Serializer):
         return value
 
 
+class LocationNameField(serializers.ReadOnlyField):
+    """A Location foreign key, given its `<field>_id` as source, rendered as the location's name."""
+    
+    def to_representation(self, value):
+        return locations.name_for(value)
+
+
+def validate_time_zone(value):
+    if not is_valid_time_zone(value):
+        raise serializers.ValidationError(f"Unknown time zone: {value}")
+    return value
+
+
 class TripCreateSerializer(serializers.ModelSerializer):
     current_location = LocationCoordinateSerializer()
     pickup_location = LocationCoordinateSerializer()
@@ -37,17 +62,193 @@ class TripCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Current cycle cannot exceed 70 hours")
         return value
 
+    def validate_home_terminal_time_zone(self, value):
+        return validate_time_zone(value)
+
     class Meta:
         model = Trip
         fields = [
             "current_location",
             "pickup_location", 
             "dropoff_location",
-            "current_cycle_used"
+            "current_cycle_used",
+            "rule_set",
+            "adverse_conditions",
+            "home_terminal_time_zone"
         ]
-        
+
+
+class TripImportRowSerializer(TripCreateSerializer):
+    """One historical trip in a `manage.py import_trips` file."""
+    external_id = serializers.CharField(max_length=200, required=False, help_text="ID in the source system")
+    start_time = serializers.DateTimeField(required=False, help_text="Defaults to the import time")
+    distance_miles = serializers.FloatField(
+        required=False, min_value=0.1, help_text="Known route miles; skips routing for this row"
+    )
+    driver_id = serializers.IntegerField(required=False, min_value=1)
+
+    class Meta(TripCreateSerializer.Meta):
+        fields = TripCreateSerializer.Meta.fields + ["external_id", "start_time", "distance_miles", "driver_id"]
+
+
+class TripStopCreateSerializer(LocationCoordinateSerializer):
+    stop_type = serializers.ChoiceField(choices=TripStop.STOP_TYPES, default="dropoff")
+    window_start = serializers.DateTimeField(required=False, allow_null=True, default=None)
+    window_end = serializers.DateTimeField(required=False, allow_null=True, default=None)
+    
+    def validate(self, data):
+        if data["window_start"] and data["window_end"] and data["window_end"] <= data["window_start"]:
+            raise serializers.ValidationError("window_end must be after window_start")
+        return data
+
+
+class MultiStopTripCreateSerializer(serializers.Serializer):
+    # One OpenRouteService matrix request covers the origin and every stop
+    MAX_STOPS = 25
+    
+    current_location = LocationCoordinateSerializer()
+    stops = TripStopCreateSerializer(many=True, min_length=1, max_length=MAX_STOPS)
+    current_cycle_used = serializers.DecimalField(
+        max_digits=4, decimal_places=2, min_value=0, max_value=70, default=0
+    )
+    rule_set = serializers.ChoiceField(choices=RULE_SET_CHOICES, default=DEFAULT_RULE_SET)
+    adverse_conditions = serializers.BooleanField(default=False)
+    home_terminal_time_zone = serializers.CharField(
+        max_length=64, default=default_home_terminal_time_zone, validators=[validate_time_zone]
+    )
+    optimize_stops = serializers.BooleanField(
+        default=True,
+        help_text="Reorder stops to cut miles and time-window lateness"
+    )
+    start_time = serializers.DateTimeField(required=False, help_text="Defaults to now")
+
+
+class LaneQuoteSerializer(serializers.Serializer):
+    MAX_LOCATIONS = 200
+    MAX_LANES = 10000
+    
+    origins = LocationCoordinateSerializer(many=True, min_length=1, max_length=MAX_LOCATIONS)
+    destinations = LocationCoordinateSerializer(many=True, min_length=1, max_length=MAX_LOCATIONS)
+    rule_set = serializers.ChoiceField(choices=RULE_SET_CHOICES, default=DEFAULT_RULE_SET)
+    adverse_conditions = serializers.BooleanField(default=False)
+    format = serializers.ChoiceField(choices=["json", "csv"], default="json")
+    
+    def validate(self, data):
+        if len(data["origins"]) * len(data["destinations"]) > self.MAX_LANES:
+            raise serializers.ValidationError(f"At most {self.MAX_LANES} lanes per request")
+        return data
+
+
+class TripScenarioSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=100, required=False)
+    delay_hours = serializers.FloatField(
+        min_value=0, max_value=168, default=0,
+        help_text="Off duty before leaving; a full off-duty reset starts with fresh counters"
+    )
+    driving_hours = serializers.FloatField(min_value=0, max_value=24, default=0, help_text="Driven since the last rest")
+    window_hours = serializers.FloatField(
+        min_value=0, max_value=24, default=0, help_text="Elapsed in the on-duty window since the last rest"
+    )
+    since_break_hours = serializers.FloatField(
+        min_value=0, max_value=24, default=0, help_text="Driving or on duty since the last break"
+    )
+    miles_since_fuel = serializers.FloatField(min_value=0, max_value=5000, default=0)
+    current_cycle_used = serializers.DecimalField(max_digits=4, decimal_places=2, min_value=0, max_value=70, default=0)
+    rule_set = serializers.ChoiceField(choices=RULE_SET_CHOICES, default=DEFAULT_RULE_SET)
+    adverse_conditions = serializers.BooleanField(default=False)
+
+
+class TripSimulationSerializer(serializers.Serializer):
+    MAX_SCENARIOS = 100
+
+    trip_miles = serializers.FloatField(
+        required=False, min_value=0.1, max_value=20000, help_text="Route miles; routed from the locations if left out"
+    )
+    current_location = LocationCoordinateSerializer(required=False)
+    pickup_location = LocationCoordinateSerializer(required=False)
+    dropoff_location = LocationCoordinateSerializer(required=False)
+    start_time = serializers.DateTimeField(required=False, help_text="Defaults to now")
+    scenarios = TripScenarioSerializer(many=True, min_length=1, max_length=MAX_SCENARIOS)
+
+    def validate(self, data):
+        locations_given = [field in data for field in ("current_location", "pickup_location", "dropoff_location")]
+        if "trip_miles" not in data and not all(locations_given):
+            raise serializers.ValidationError("Give trip_miles or all of current, pickup and dropoff locations")
+        for number, scenario in enumerate(data["scenarios"], start=1):
+            scenario.setdefault("name", f"Scenario {number}")
+        return data
+
+
+class FleetAnalyticsQuerySerializer(serializers.Serializer):
+    # Dashboards look back at most a few years; keeps a bad query bounded
+    MAX_DAYS = 3 * 366
+    DEFAULT_DAYS = 30
+    
+    start = serializers.DateField(required=False, help_text="First log date (defaults to 30 days before end)")
+    end = serializers.DateField(required=False, help_text="Last log date (defaults to today)")
+    driver = serializers.IntegerField(required=False, min_value=1)
+    group_by = serializers.ChoiceField(choices=["day", "driver", "day_driver"], default="day")
+    
+    def validate(self, data):
+        data["end"] = data.get("end") or timezone.localdate()
+        data["start"] = data.get("start") or data["end"] - timedelta(days=self.DEFAULT_DAYS - 1)
+        if data["start"] > data["end"]:
+            raise serializers.ValidationError("start must not be after end")
+        if (data["end"] - data["start"]).days >= self.MAX_DAYS:
+            raise serializers.ValidationError(f"At most {self.MAX_DAYS} days per query")
+        return data
+
+
+class TripStopSerializer(serializers.ModelSerializer):
+    stop_type_display = serializers.CharField(source='get_stop_type_display', read_only=True)
+    local_planned_arrival = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = TripStop
+        fields = [
+            'sequence_number',
+            'requested_position',
+            'stop_type',
+            'stop_type_display',
+            'name',
+            'longitude',
+            'latitude',
+            'window_start',
+            'window_end',
+            'leg_miles',
+            'planned_arrival',
+            'time_zone',
+            'local_planned_arrival'
+        ]
+    
+    def get_local_planned_arrival(self, obj):
+        return local_isoformat(obj.planned_arrival, obj.time_zone)
+
+
+class TripReplanSerializer(serializers.Serializer):
+    current_location = LocationCoordinateSerializer(help_text="Where the truck is now")
+    dropoff_location = LocationCoordinateSerializer(help_text="Dropoff, changed or unchanged")
+    checkpoint_time = serializers.DateTimeField(
+        required=False,
+        help_text="When the truck was at current_location (defaults to now)"
+    )
+
+
+class DutyStatusEventSerializer(serializers.Serializer):
+    duty_status = serializers.ChoiceField(choices=LogEntry.DUTY_STATUS_CHOICES)
+    at = serializers.DateTimeField(required=False, help_text="When the status changed (defaults to now)")
+
+
+class AlertFeedQuerySerializer(serializers.Serializer):
+    after = serializers.IntegerField(
+        required=False, min_value=0, help_text="Last alert id seen (defaults to the latest alerts)"
+    )
+    trip = serializers.IntegerField(required=False, min_value=1)
+
+
 class LogEntrySerializer(serializers.ModelSerializer):
     duty_status_display = serializers.CharField(source='get_duty_status_display', read_only=True)
+    location = LocationNameField(source='location_id')
     
     class Meta:
         model = LogEntry
@@ -86,6 +287,9 @@ class TripSegmentSerializer(serializers.ModelSerializer):
     segment_type_display = serializers.CharField(source='get_segment_type_display', read_only=True)
     formatted_start_time = serializers.SerializerMethodField()
     formatted_end_time = serializers.SerializerMethodField()
+    local_start_time = serializers.SerializerMethodField()
+    local_end_time = serializers.SerializerMethodField()
+    location = LocationNameField(source='location_id')
     
     class Meta:
         model = TripSegment
@@ -99,7 +303,10 @@ class TripSegmentSerializer(serializers.ModelSerializer):
             'formatted_end_time',
             'duration_hours',
             'distance_miles',
-            'location'
+            'location',
+            'time_zone',
+            'local_start_time',
+            'local_end_time'
         ]
     
     def get_formatted_start_time(self, obj):
@@ -107,9 +314,18 @@ class TripSegmentSerializer(serializers.ModelSerializer):
     
     def get_formatted_end_time(self, obj):
         return obj.end_time.strftime('%m/%d/%Y %H:%M')
+    
+    def get_local_start_time(self, obj):
+        return local_isoformat(obj.start_time, obj.time_zone)
+    
+    def get_local_end_time(self, obj):
+        return local_isoformat(obj.end_time, obj.time_zone)
 
 
 class TripResponseSerializer(serializers.ModelSerializer):
+    current_location = LocationNameField(source='current_location_id')
+    pickup_location = LocationNameField(source='pickup_location_id')
+    dropoff_location = LocationNameField(source='dropoff_location_id')
     segments = TripSegmentSerializer(many=True, read_only=True)
     daily_logs = DailyLogSerializer(many=True, read_only=True)
     
@@ -124,6 +340,9 @@ class TripResponseSerializer(serializers.ModelSerializer):
             'pickup_location', 
             'dropoff_location',
             'current_cycle_used',
+            'rule_set',
+            'adverse_conditions',
+            'home_terminal_time_zone',
             'total_distance',
             'total_duration', 
             'fuel_stops',
@@ -135,12 +354,174 @@ class TripResponseSerializer(serializers.ModelSerializer):
         ]
     
     def get_route_summary(self, obj):
+        names = locations.names_for([obj.current_location_id, obj.pickup_location_id, obj.dropoff_location_id])
         return {
-            'origin': obj.current_location,
-            'destination': obj.dropoff_location,
-            'waypoints': [obj.pickup_location],
+            'origin': names[obj.current_location_id],
+            'destination': names[obj.dropoff_location_id],
+            'waypoints': [names[obj.pickup_location_id]],
             'total_distance_miles': float(obj.total_distance) if obj.total_distance else 0,
             'estimated_duration_hours': float(obj.total_duration) if obj.total_duration else 0,
             'fuel_stops_needed': obj.fuel_stops,
             'rest_stops_needed': obj.required_rest_stops
-        }
\ No newline at end of file
+        }
+
+class DutyIntervalSerializer(serializers.ModelSerializer):
+    duty_status_display = serializers.CharField(source='get_duty_status_display', read_only=True)
+    location = LocationNameField(source='location_id')
+    
+    class Meta:
+        model = DutyInterval
+        fields = [
+            'trip',
+            'duty_status',
+            'duty_status_display',
+            'start',
+            'end',
+            'location'
+        ]
+
+
+# Fast read-only path for TripResponseSerializer.
+#
+# Builds the same structure from `.values_list()` tuples (one query each for
+# trips, segments, daily logs and entries) instead of instantiating nested
+# serializers per row; location names come from joins rather than the
+# interning cache, so the query count doesn't depend on its state.
+# `render_trip_json` produces the same bytes DRF's
+# JSONRenderer would for `TripResponseSerializer(...).data`.
+
+SEGMENT_TYPE_LABELS = dict(TripSegment.SEGMENT_TYPES)
+DUTY_STATUS_LABELS = dict(LogEntry.DUTY_STATUS_CHOICES)
+
+_TRIP_COLUMNS = (
+    'id', 'current_location__name', 'pickup_location__name', 'dropoff_location__name', 'current_cycle_used',
+    'rule_set', 'adverse_conditions', 'home_terminal_time_zone', 'total_distance', 'total_duration', 'fuel_stops',
+    'required_rest_stops', 'created_at',
+)
+_SEGMENT_COLUMNS = (
+    'trip_id', 'segment_type', 'sequence_number', 'start_time', 'end_time',
+    'duration_hours', 'distance_miles', 'location__name', 'time_zone',
+)
+_DAILY_LOG_COLUMNS = (
+    'trip_id', 'id', 'log_date', 'day_number', 'total_miles', 'off_duty_hours',
+    'sleeper_berth_hours', 'driving_hours', 'on_duty_hours',
+)
+_ENTRY_COLUMNS = ('daily_log_id', 'duty_status', 'start_hour', 'end_hour', 'location__name')
+
+
+def _decimal(value):
+    return None if value is None else f'{value:f}'
+
+
+def _datetime(value, tz):
+    if value is None:
+        return None
+    value = value.astimezone(tz).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def fast_trip_response_data(trips):
+    """
+    Read-only equivalent of `TripResponseSerializer(trips, many=True).data`
+    for a Trip queryset, in four queries regardless of trip size.
+    """
+    tz = timezone.get_current_timezone()
+    trip_ids = trips.values('id')
+
+    segments_by_trip = {}
+    for (trip_id, segment_type, sequence_number, start_time, end_time,
+         duration_hours, distance_miles, location, time_zone) in (
+            TripSegment.objects.filter(trip__in=trip_ids)
+            .order_by('trip_id', 'sequence_number')
+            .values_list(*_SEGMENT_COLUMNS)):
+        segments_by_trip.setdefault(trip_id, []).append({
+            'segment_type': segment_type,
+            'segment_type_display': SEGMENT_TYPE_LABELS.get(segment_type, segment_type),
+            'sequence_number': sequence_number,
+            'start_time': _datetime(start_time, tz),
+            'end_time': _datetime(end_time, tz),
+            'formatted_start_time': start_time.strftime('%m/%d/%Y %H:%M'),
+            'formatted_end_time': end_time.strftime('%m/%d/%Y %H:%M'),
+            'duration_hours': _decimal(duration_hours),
+            'distance_miles': _decimal(distance_miles),
+            'location': location,
+            'time_zone': time_zone,
+            'local_start_time': local_isoformat(start_time, time_zone),
+            'local_end_time': local_isoformat(end_time, time_zone),
+        })
+
+    entries_by_log = {}
+    for daily_log_id, duty_status, start_hour, end_hour, location in (
+            LogEntry.objects.filter(daily_log__trip__in=trip_ids)
+            .order_by('daily_log_id', 'start_hour')
+            .values_list(*_ENTRY_COLUMNS)):
+        entries_by_log.setdefault(daily_log_id, []).append({
+            'duty_status': duty_status,
+            'duty_status_display': DUTY_STATUS_LABELS.get(duty_status, duty_status),
+            'start_hour': _decimal(start_hour),
+            'end_hour': _decimal(end_hour),
+            'location': location,
+        })
+
+    logs_by_trip = {}
+    for (trip_id, log_id, log_date, day_number, total_miles, off_duty_hours,
+         sleeper_berth_hours, driving_hours, on_duty_hours) in (
+            DailyLog.objects.filter(trip__in=trip_ids)
+            .order_by('trip_id', 'day_number')
+            .values_list(*_DAILY_LOG_COLUMNS)):
+        logs_by_trip.setdefault(trip_id, []).append({
+            'log_date': log_date.isoformat(),
+            'formatted_date': log_date.strftime('%m/%d/%Y'),
+            'day_number': day_number,
+            'total_miles': _decimal(total_miles),
+            'off_duty_hours': _decimal(off_duty_hours),
+            'sleeper_berth_hours': _decimal(sleeper_berth_hours),
+            'driving_hours': _decimal(driving_hours),
+            'on_duty_hours': _decimal(on_duty_hours),
+            'entries': entries_by_log.get(log_id, []),
+        })
+
+    data = []
+    for (trip_id, current_location, pickup_location, dropoff_location, current_cycle_used,
+         rule_set, adverse_conditions, home_terminal_time_zone, total_distance, total_duration, fuel_stops,
+         required_rest_stops, created_at) in (
+            trips.values_list(*_TRIP_COLUMNS)):
+        data.append({
+            'id': trip_id,
+            'current_location': current_location,
+            'pickup_location': pickup_location,
+            'dropoff_location': dropoff_location,
+            'current_cycle_used': _decimal(current_cycle_used),
+            'rule_set': rule_set,
+            'adverse_conditions': adverse_conditions,
+            'home_terminal_time_zone': home_terminal_time_zone,
+            'total_distance': _decimal(total_distance),
+            'total_duration': _decimal(total_duration),
+            'fuel_stops': fuel_stops,
+            'required_rest_stops': required_rest_stops,
+            'segments': segments_by_trip.get(trip_id, []),
+            'daily_logs': logs_by_trip.get(trip_id, []),
+            'route_summary': {
+                'origin': current_location,
+                'destination': dropoff_location,
+                'waypoints': [pickup_location],
+                'total_distance_miles': float(total_distance) if total_distance else 0,
+                'estimated_duration_hours': float(total_duration) if total_duration else 0,
+                'fuel_stops_needed': fuel_stops,
+                'rest_stops_needed': required_rest_stops
+            },
+            'created_at': _datetime(created_at, tz),
+        })
+    return data
+
+
+def render_trip_json(data):
+    """Encode fast-path data exactly like DRF's default JSONRenderer."""
+    if orjson is not None:
+        ret = orjson.dumps(data)
+    else:
+        ret = json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode()
+    # JSONRenderer always escapes these so the output is a strict JavaScript subset
+    return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
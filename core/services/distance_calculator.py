@@ -3,12 +3,15 @@ from typing import Optional, List, Tuple
 from django.conf import settings
 import logging
 
+from . import openroute_quota
+
 logger = logging.getLogger(__name__)
 
 class DistanceCalculation:
     @staticmethod
-    def geocode_openroute( location: str, api_key: str):
+    def geocode_openroute( location: str, api_key: str, priority=openroute_quota.ROUTING):
         try:
+            openroute_quota.acquire('geocode', priority)
             url = f"https://api.openrouteservice.org/geocode/search"
             
             headers = {
@@ -21,6 +24,8 @@ class DistanceCalculation:
             }
             
             response = requests.get(url, headers=headers, params=params, timeout=5)
+            if response.status_code == 429:
+                openroute_quota.throttled('geocode')
             
             if response.status_code == 200:
                 data = response.json()
@@ -32,10 +37,15 @@ class DistanceCalculation:
             logger.error(f"Geocoding error for {location}: {e}")
             
         return None
-    def calculate_openroute_distance(self, coordinates: List[Tuple[float, float]]) -> Optional[float]:
+    def calculate_openroute_distance(
+        self,
+        coordinates: List[Tuple[float, float]],
+        priority: openroute_quota.Priority = openroute_quota.ROUTING
+    ) -> Optional[float]:
         # print(f"DEBUG: calculate_openroute_distance called with coordinates: {coordinates}")
         api_key = settings.OPENROUTE_API_KEY
         try:
+            openroute_quota.acquire('directions', priority)
             url = "https://api.openrouteservice.org/v2/directions/driving-car"
             
             headers = {
@@ -51,6 +61,8 @@ class DistanceCalculation:
             }
             
             response = requests.post(url, json=body, headers=headers, timeout=15)
+            if response.status_code == 429:
+                openroute_quota.throttled('directions')
             
             if response.status_code == 200:
                 data = response.json()
@@ -65,6 +77,54 @@ class DistanceCalculation:
             print(f"OpenRouteService API error: {e}")
             print(f"DEBUG: Returning None from calculate_openroute_distance")
             return None
+    
+    def calculate_openroute_matrix(
+        self,
+        coordinates: List[Tuple[float, float]],
+        sources: Optional[List[int]] = None,
+        destinations: Optional[List[int]] = None,
+        priority: openroute_quota.Priority = openroute_quota.ROUTING
+    ) -> Optional[List[List[float]]]:
+        """
+        Road miles from each source to each destination (indices into
+        `coordinates`, default all), in one matrix request. Raises
+        QuotaExceeded if the request is shed.
+        """
+        api_key = settings.OPENROUTE_API_KEY
+        try:
+            openroute_quota.acquire('matrix', priority)
+            url = "https://api.openrouteservice.org/v2/matrix/driving-car"
+            
+            headers = {
+                'Authorization': api_key,
+                'Content-Type': 'application/json'
+            }
+            
+            body = {
+                "locations": [[lon, lat] for lon, lat in coordinates],
+                "metrics": ["distance"],
+                "units": "mi"
+            }
+            if sources is not None:
+                body["sources"] = list(sources)
+            if destinations is not None:
+                body["destinations"] = list(destinations)
+            
+            response = requests.post(url, json=body, headers=headers, timeout=15)
+            if response.status_code == 429:
+                openroute_quota.throttled('matrix')
+            
+            if response.status_code == 200:
+                distances = response.json().get('distances')
+                # Unroutable pairs come back as null
+                if distances and all(d is not None for row in distances for d in row):
+                    return [[round(d, 1) for d in row] for row in distances]
+                
+        except openroute_quota.QuotaExceeded:
+            raise
+        except Exception as e:
+            logger.warning(f"OpenRouteService matrix API error: {e}")
+        return None
         
     # def calculate_distance_openroute(self, origin: str, pickup: str, destination: str):
     
@@ -0,0 +1,133 @@
+import math
+from typing import List, Sequence, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import openroute_quota
+from .distance_calculator import DistanceCalculation
+
+
+EARTH_RADIUS_MILES = 3958.8
+# Road miles per great-circle mile, for estimating legs when routing fails
+CIRCUITY_FACTOR = 1.2
+# Sources and destinations per matrix request; OpenRouteService allows
+# 3500 routes per request
+MATRIX_CHUNK = 50
+
+
+def _cache():
+    return caches[getattr(settings, "ROUTING_CACHE", "default")]
+
+
+def _cache_timeout():
+    return getattr(settings, "ROUTING_CACHE_TIMEOUT", 7 * 24 * 60 * 60)
+
+
+def _leg_key(origin: Tuple[float, float], destination: Tuple[float, float]) -> str:
+    # ~1 m at 5 decimal places; close enough to share a leg between requests
+    return "route-leg:{:.5f},{:.5f}:{:.5f},{:.5f}".format(*origin, *destination)
+
+
+def great_circle_miles(origin: Tuple[float, float], destination: Tuple[float, float]) -> float:
+    lon1, lat1, lon2, lat2 = map(math.radians, (*origin, *destination))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_MILES * math.asin(math.sqrt(a))
+
+
+def estimated_miles(origin: Tuple[float, float], destination: Tuple[float, float]) -> float:
+    return round(great_circle_miles(origin, destination) * CIRCUITY_FACTOR, 1)
+
+
+def lane_matrix(
+    sources: Sequence[Tuple[float, float]],
+    destinations: Sequence[Tuple[float, float]],
+    priority: openroute_quota.Priority = openroute_quota.ROUTING,
+) -> Tuple[List[List[float]], List[List[bool]]]:
+    """
+    Road miles from every source to every (lon, lat) destination, and which
+    of them are estimates.
+
+    Legs are read from the routing cache. Blocks of up to MATRIX_CHUNK x
+    MATRIX_CHUNK pairs with any leg missing are fetched with one
+    OpenRouteService matrix request each, at `priority` against the shared
+    quota, and cached leg by leg. Once a request is shed, no more are made.
+    Legs that still can't be routed are estimated from great-circle distance
+    (and not cached).
+    """
+    sources = [tuple(map(float, c)) for c in sources]
+    destinations = [tuple(map(float, c)) for c in destinations]
+    keys = {
+        (i, j): _leg_key(source, destination)
+        for i, source in enumerate(sources)
+        for j, destination in enumerate(destinations)
+        if source != destination
+    }
+
+    cache = _cache()
+    cached = cache.get_many(set(keys.values()))
+    shed = False
+    for si in range(0, len(sources), MATRIX_CHUNK):
+        block_sources = range(si, min(si + MATRIX_CHUNK, len(sources)))
+        for di in range(0, len(destinations), MATRIX_CHUNK):
+            block_destinations = range(di, min(di + MATRIX_CHUNK, len(destinations)))
+            missing = [
+                (i, j) for i in block_sources for j in block_destinations
+                if (i, j) in keys and keys[i, j] not in cached
+            ]
+            if not missing or shed:
+                continue
+            try:
+                fetched = DistanceCalculation().calculate_openroute_matrix(
+                    [sources[i] for i in block_sources] + [destinations[j] for j in block_destinations],
+                    sources=list(range(len(block_sources))),
+                    destinations=list(range(len(block_sources), len(block_sources) + len(block_destinations))),
+                    priority=priority,
+                )
+            except openroute_quota.QuotaExceeded:
+                # The remaining blocks would wait and be shed too
+                shed = True
+                continue
+            if fetched is None:
+                continue
+            legs = {keys[i, j]: fetched[i - si][j - di] for i, j in missing}
+            cache.set_many(legs, _cache_timeout())
+            cached.update(legs)
+
+    matrix = [[0.0] * len(destinations) for _ in sources]
+    estimated = [[False] * len(destinations) for _ in sources]
+    for (i, j), key in keys.items():
+        miles = cached.get(key)
+        if miles is None:
+            miles = estimated_miles(sources[i], destinations[j])
+            estimated[i][j] = True
+        matrix[i][j] = float(miles)
+    return matrix, estimated
+
+
+def distance_matrix(coordinates: Sequence[Tuple[float, float]]) -> List[List[float]]:
+    """Road miles between every ordered pair of (lon, lat) coordinates (see `lane_matrix`)."""
+    return lane_matrix(coordinates, coordinates)[0]
+
+
+def cached_route_miles(coordinates: Sequence[Tuple[float, float]]) -> Tuple[float, bool]:
+    """
+    Road miles along (lon, lat) waypoints from cached legs alone, and
+    whether any leg had to be estimated. Never calls OpenRouteService.
+    """
+    legs = [
+        (tuple(map(float, a)), tuple(map(float, b)))
+        for a, b in zip(coordinates, coordinates[1:])
+        if tuple(a) != tuple(b)
+    ]
+    cached = _cache().get_many([_leg_key(a, b) for a, b in legs])
+    miles, estimated = 0.0, False
+    for a, b in legs:
+        leg = cached.get(_leg_key(a, b))
+        if leg is None:
+            leg, estimated = estimated_miles(a, b), True
+        miles += float(leg)
+    return round(miles, 1), estimated
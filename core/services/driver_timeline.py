@@ -0,0 +1,60 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from core.models import DutyInterval, Trip
+from .hos_calculator import HOSCalculator
+
+
+def sync_trip_intervals(
+    trip: Trip, segments: List[Dict], location_ids: Dict[str, int], since: Optional[datetime] = None
+):
+    """
+    Replace the trip's duty intervals with one row per planned segment. With
+    `since`, only intervals from that time on are replaced and `segments`
+    holds just the re-planned ones. `location_ids` maps the segments'
+    location names to Location ids.
+    """
+    if since is None:
+        DutyInterval.objects.filter(trip=trip).delete()
+    else:
+        DutyInterval.objects.filter(trip=trip, start__gte=since).delete()
+        DutyInterval.objects.filter(trip=trip, start__lt=since, end__gt=since).update(end=since)
+    DutyInterval.objects.bulk_create(build_intervals(trip, segments, location_ids))
+
+
+def build_intervals(trip: Trip, segments: List[Dict], location_ids: Dict[str, int]) -> List[DutyInterval]:
+    """Unsaved duty intervals for a trip's planned segments (none without a driver)."""
+    if not trip.user_id:
+        return []
+
+    intervals = []
+    for segment in segments:
+        start, end = segment["start_time"], segment["end_time"]
+        duty_status = HOSCalculator.duty_status_for(segment["segment_type"])
+        while start < end:
+            chunk_end = min(end, start + DutyInterval.MAX_DURATION)
+            intervals.append(DutyInterval(
+                driver_id=trip.user_id,
+                trip=trip,
+                duty_status=duty_status,
+                start=start,
+                end=chunk_end,
+                location_id=location_ids[segment["location"]]
+            ))
+            start = chunk_end
+    return intervals
+
+
+def intervals_overlapping(driver_id: int, window_start: datetime, window_end: datetime):
+    """
+    Intervals for `driver_id` that overlap [window_start, window_end).
+
+    No interval is longer than MAX_DURATION, so bounding `start` from below
+    keeps this a range scan on the (driver, start) index.
+    """
+    return DutyInterval.objects.filter(
+        driver_id=driver_id,
+        start__gte=window_start - DutyInterval.MAX_DURATION,
+        start__lt=window_end,
+        end__gt=window_start,
+    ).order_by("start")
@@ -0,0 +1,236 @@
+"""
+Server-side rendering of 24-hour ELD log sheets.
+
+The grid, labels and hour ticks are identical for every day, so they are
+built once per process; each sheet only adds its header, duty-status line
+and row totals. Rendered sheets are cached by a hash of the day's content.
+"""
+import hashlib
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.cache import caches
+
+from core.models import DailyLog, LogEntry
+
+try:
+    import cairosvg
+except ImportError:  # optional, PNG output is unavailable without it
+    cairosvg = None
+
+
+# Bump when the drawing changes so cached sheets are not reused
+RENDERER_VERSION = 1
+
+WIDTH = 1000
+GRID_LEFT = 140
+GRID_TOP = 70
+HOUR_WIDTH = 32
+ROW_HEIGHT = 30
+GRID_WIDTH = HOUR_WIDTH * 24
+TOTALS_LEFT = GRID_LEFT + GRID_WIDTH + 12
+SHEET_HEIGHT = GRID_TOP + ROW_HEIGHT * 4 + 40
+
+# Standard log-sheet row order
+ROWS = [status for status, _ in LogEntry.DUTY_STATUS_CHOICES]
+ROW_LABELS = dict(LogEntry.DUTY_STATUS_CHOICES)
+ROW_TOTAL_FIELDS = {
+    "off_duty": "off_duty_hours",
+    "sleeper_berth": "sleeper_berth_hours",
+    "driving": "driving_hours",
+    "on_duty_not_driving": "on_duty_hours",
+}
+
+_LOG_COLUMNS = (
+    "id", "trip_id", "log_date", "day_number", "total_miles", "off_duty_hours",
+    "sleeper_berth_hours", "driving_hours", "on_duty_hours",
+)
+_ENTRY_COLUMNS = ("daily_log_id", "duty_status", "start_hour", "end_hour", "location__name")
+
+GRID_USE = '<use href="#eld-grid"/>'
+
+
+def _hour_label(hour: int) -> str:
+    if hour in (0, 24):
+        return "Mid-night"
+    if hour == 12:
+        return "Noon"
+    return str(hour % 12)
+
+
+@lru_cache(maxsize=None)
+def _grid() -> str:
+    """Static grid shared by every sheet."""
+    top = GRID_TOP
+    bottom = top + ROW_HEIGHT * 4
+    parts = [
+        f'<rect x="{GRID_LEFT}" y="{top}" width="{GRID_WIDTH}" height="{ROW_HEIGHT * 4}" '
+        f'fill="#fff" stroke="#000" stroke-width="1.5"/>'
+    ]
+    for i, status in enumerate(ROWS):
+        y = top + ROW_HEIGHT * i
+        parts.append(f'<line x1="{GRID_LEFT}" y1="{y}" x2="{GRID_LEFT + GRID_WIDTH}" y2="{y}" stroke="#000"/>')
+        parts.append(
+            f'<text x="{GRID_LEFT - 6}" y="{y + ROW_HEIGHT / 2 + 4}" text-anchor="end" '
+            f'font-size="11">{i + 1}. {escape(ROW_LABELS[status])}</text>'
+        )
+    for hour in range(25):
+        x = GRID_LEFT + HOUR_WIDTH * hour
+        parts.append(f'<line x1="{x}" y1="{top}" x2="{x}" y2="{bottom}" stroke="#000"/>')
+        parts.append(
+            f'<text x="{x}" y="{top - 6}" text-anchor="middle" font-size="9">{_hour_label(hour)}</text>'
+        )
+        if hour == 24:
+            continue
+        for quarter in (1, 2, 3):
+            qx = x + HOUR_WIDTH * quarter / 4
+            tick = ROW_HEIGHT / 2 if quarter == 2 else ROW_HEIGHT / 4
+            for i in range(4):
+                y = top + ROW_HEIGHT * i
+                parts.append(f'<line x1="{qx}" y1="{y}" x2="{qx}" y2="{y + tick}" stroke="#999"/>')
+    parts.append(
+        f'<text x="{TOTALS_LEFT}" y="{top - 6}" font-size="9" font-weight="bold">Total Hours</text>'
+    )
+    return "".join(parts)
+
+
+def _x(hour: float) -> float:
+    return round(GRID_LEFT + HOUR_WIDTH * hour, 2)
+
+
+def _row_y(status: str) -> float:
+    return GRID_TOP + ROW_HEIGHT * ROWS.index(status) + ROW_HEIGHT / 2
+
+
+def _sheet_body(log: Dict, entries: Sequence[Tuple], grid: Optional[str] = None) -> str:
+    parts = [
+        f'<text x="20" y="24" font-size="16" font-weight="bold">'
+        f'Driver\'s Daily Log - Day {log["day_number"]}</text>',
+        f'<text x="20" y="44" font-size="12">Date: {log["log_date"]:%m/%d/%Y}'
+        f'    Total miles driving today: {log["total_miles"]}</text>',
+        grid if grid is not None else _grid(),
+    ]
+
+    points = []
+    for duty_status, start_hour, end_hour, _ in entries:
+        start, end = float(start_hour), float(end_hour)
+        if end < start:
+            # Logs saved before entries were split at midnight; the next
+            # day's sheet has no tail for these
+            end = 24.0
+        if end == start:
+            continue
+        y = _row_y(duty_status)
+        points.append(f"{_x(start)},{y} {_x(end)},{y}")
+    if points:
+        parts.append(
+            f'<polyline points="{" ".join(points)}" fill="none" stroke="#1d4ed8" stroke-width="2.5"/>'
+        )
+
+    for status in ROWS:
+        parts.append(
+            f'<text x="{TOTALS_LEFT}" y="{_row_y(status) + 4}" font-size="11">'
+            f'{log[ROW_TOTAL_FIELDS[status]]}</text>'
+        )
+
+    remarks = sorted({location for *_, location in entries if location})
+    if remarks:
+        parts.append(
+            f'<text x="20" y="{GRID_TOP + ROW_HEIGHT * 4 + 24}" font-size="10">'
+            f'Remarks: {escape(", ".join(remarks))}</text>'
+        )
+    return "".join(parts)
+
+
+def _svg(body: str, height: int) -> str:
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{WIDTH}" height="{height}" '
+        f'viewBox="0 0 {WIDTH} {height}" font-family="Helvetica, Arial, sans-serif">'
+        f'<rect width="100%" height="100%" fill="#fff"/>{body}</svg>'
+    )
+
+
+def sheet_hash(log: Dict, entries: Sequence[Tuple]) -> str:
+    """Content hash of everything that is drawn on a sheet."""
+    digest = hashlib.sha256(f"v{RENDERER_VERSION}".encode())
+    digest.update(repr(tuple(log[column] for column in _LOG_COLUMNS[2:])).encode())
+    digest.update(repr(tuple(entries)).encode())
+    return digest.hexdigest()
+
+
+def load_daily_logs(trip_id: int, day_number: Optional[int] = None) -> List[Tuple[Dict, List[Tuple]]]:
+    """(log, entries) pairs for a trip in day order, in two queries."""
+    logs = DailyLog.objects.filter(trip_id=trip_id).order_by("day_number")
+    if day_number is not None:
+        logs = logs.filter(day_number=day_number)
+    logs = [dict(zip(_LOG_COLUMNS, row)) for row in logs.values_list(*_LOG_COLUMNS)]
+    if not logs:
+        return []
+
+    entries_by_log = {log["id"]: [] for log in logs}
+    for daily_log_id, *entry in (
+            LogEntry.objects.filter(daily_log_id__in=entries_by_log)
+            .order_by("daily_log_id", "start_hour")
+            .values_list(*_ENTRY_COLUMNS)):
+        entries_by_log[daily_log_id].append(tuple(entry))
+    return [(log, entries_by_log[log["id"]]) for log in logs]
+
+
+def _cache():
+    return caches[getattr(settings, "ELD_SHEET_CACHE", "default")]
+
+
+def _cache_timeout():
+    return getattr(settings, "ELD_SHEET_CACHE_TIMEOUT", 7 * 24 * 60 * 60)
+
+
+def render_sheet_svg(log: Dict, entries: Sequence[Tuple], content_hash: Optional[str] = None) -> str:
+    """SVG for one day, served from the sheet cache when the content is unchanged."""
+    content_hash = content_hash or sheet_hash(log, entries)
+    cache = _cache()
+    key = f"eld-sheet:svg:{content_hash}"
+    svg = cache.get(key)
+    if svg is None:
+        svg = _svg(_sheet_body(log, entries), SHEET_HEIGHT)
+        cache.set(key, svg, _cache_timeout())
+    return svg
+
+
+def render_sheet_png(log: Dict, entries: Sequence[Tuple], content_hash: Optional[str] = None) -> bytes:
+    if cairosvg is None:
+        raise RuntimeError("PNG rendering requires the cairosvg package")
+    content_hash = content_hash or sheet_hash(log, entries)
+    cache = _cache()
+    key = f"eld-sheet:png:{content_hash}"
+    png = cache.get(key)
+    if png is None:
+        png = cairosvg.svg2png(bytestring=render_sheet_svg(log, entries, content_hash).encode())
+        cache.set(key, png, _cache_timeout())
+    return png
+
+
+def combined_hash(days: Sequence[Tuple[Dict, Sequence[Tuple]]]) -> str:
+    digest = hashlib.sha256()
+    for log, entries in days:
+        digest.update(sheet_hash(log, entries).encode())
+    return digest.hexdigest()
+
+
+def render_sheets_svg(days: Sequence[Tuple[Dict, Sequence[Tuple]]], content_hash: Optional[str] = None) -> str:
+    """All days stacked in one printable SVG, one sheet-height per day."""
+    content_hash = content_hash or combined_hash(days)
+    cache = _cache()
+    key = f"eld-sheet:svg-all:{content_hash}"
+    svg = cache.get(key)
+    if svg is None:
+        # Define the grid once and reference it from every page
+        body = f'<defs><g id="eld-grid">{_grid()}</g></defs>' + "".join(
+            f'<g transform="translate(0,{SHEET_HEIGHT * i})">'
+            f'{_sheet_body(log, entries, grid=GRID_USE)}</g>'
+            for i, (log, entries) in enumerate(days)
+        )
+        svg = _svg(body, SHEET_HEIGHT * max(len(days), 1))
+        cache.set(key, svg, _cache_timeout())
+    return svg
@@ -0,0 +1,46 @@
+"""
+Integer units for the HOS planner.
+
+The planner counts time in whole seconds and distance in units of 1/3600
+mile, so a truck at S mph covers exactly S units a second and every sum is
+exact. Values become Decimal hours and miles only where they are written to
+model fields, through `hours_decimal` and `miles_decimal`, which round the
+way the DecimalField columns store them.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+
+SECONDS_PER_HOUR = 3600
+SECONDS_PER_DAY = 24 * SECONDS_PER_HOUR
+UNITS_PER_MILE = 3600
+ONE_SECOND = timedelta(seconds=1)
+
+
+def to_seconds(hours) -> int:
+    """Whole seconds in `hours` (float, Decimal or int)."""
+    return round(hours * SECONDS_PER_HOUR)
+
+
+def to_units(miles) -> int:
+    """Distance units in `miles` (float, Decimal or int)."""
+    return round(miles * UNITS_PER_MILE)
+
+
+def units_to_tenths(units: int) -> int:
+    """Tenths of a mile in `units`, rounded half up."""
+    return (units * 10 + UNITS_PER_MILE // 2) // UNITS_PER_MILE
+
+
+def hours_decimal(seconds: int) -> Decimal:
+    """Hours to 0.01, rounded half up, for the DecimalField hour columns."""
+    return Decimal((seconds * 100 + SECONDS_PER_HOUR // 2) // SECONDS_PER_HOUR).scaleb(-2)
+
+
+def miles_decimal(tenths: int) -> Decimal:
+    return Decimal(tenths).scaleb(-1)
+
+
+def hours_float(seconds: int) -> float:
+    """Hours to 0.01 for JSON responses."""
+    return float(hours_decimal(seconds))
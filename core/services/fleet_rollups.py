@@ -0,0 +1,145 @@
+"""
+Per-driver, per-day fleet totals rolled up from daily logs.
+
+`FleetRollup` holds one row per (log date, driver). Code that writes a
+trip's daily logs applies the difference to the rollups in the same
+transaction. `save_trip_results` adds a new trip's logs, `save_replan_results`
+swaps the re-planned days, and deleting a trip subtracts it. Increments are
+`F()` expressions, so concurrent trips for the same driver-day don't lose
+updates. `python manage.py rebuild_fleet_rollups` recomputes the table from
+DailyLog after bulk imports or manual edits.
+"""
+from datetime import date
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Optional
+
+from django.db.models import Count, F, Sum
+
+from core.models import DailyLog, FleetRollup
+from .fixed_point import hours_decimal, miles_decimal
+
+
+ROLLUP_FIELDS = ("log_count", "total_miles", "driving_hours", "on_duty_hours", "fuel_stops")
+_LOG_FIELDS = ("log_date", "total_miles", "driving_hours", "on_duty_hours", "fuel_stops")
+
+Totals = Dict[date, Dict[str, Any]]
+
+
+def _zero() -> Dict[str, Any]:
+    return {"log_count": 0, "total_miles": Decimal(0), "driving_hours": Decimal(0), "on_duty_hours": Decimal(0), "fuel_stops": 0}
+
+
+def _add(totals: Totals, log: Dict[str, Any]):
+    day = totals.setdefault(log["log_date"], _zero())
+    day["log_count"] += 1
+    for field in ROLLUP_FIELDS[1:]:
+        day[field] += log[field]
+
+
+def log_totals(logs: Iterable[Dict[str, Any]]) -> Totals:
+    """
+    Rollup totals per log date for the planner's daily log dicts, rounded
+    the way the DailyLog columns store them.
+    """
+    totals: Totals = {}
+    for log in logs:
+        _add(totals, {
+            "log_date": log["log_date"],
+            "total_miles": miles_decimal(log["distance_tenths"]),
+            "driving_hours": hours_decimal(log["driving_seconds"]),
+            "on_duty_hours": hours_decimal(log["on_duty_seconds"]),
+            "fuel_stops": log.get("fuel_stops", 0),
+        })
+    return totals
+
+
+def stored_log_totals(trip_id: int, first_day_number: int = 1) -> Totals:
+    """Totals of a trip's saved daily logs from `first_day_number` on."""
+    totals: Totals = {}
+    for log in DailyLog.objects.filter(trip_id=trip_id, day_number__gte=first_day_number).values(*_LOG_FIELDS):
+        _add(totals, log)
+    return totals
+
+
+def apply_rollup_delta(driver_id: Optional[int], before: Totals, after: Totals):
+    """
+    Move `driver_id`'s rollups from a trip's `before` totals to its `after`
+    totals. Call inside the transaction that rewrites the logs.
+    """
+    deltas = {}
+    for log_date in before.keys() | after.keys():
+        old, new = before.get(log_date) or _zero(), after.get(log_date) or _zero()
+        delta = {field: new[field] - old[field] for field in ROLLUP_FIELDS}
+        if any(delta.values()):
+            deltas[log_date] = delta
+    if not deltas:
+        return
+
+    rows = FleetRollup.objects.filter(driver_id=driver_id, log_date__in=deltas)
+    existing = dict(rows.order_by("-pk").values_list("log_date", "pk"))
+    missing = [log_date for log_date in deltas if log_date not in existing]
+    if missing:
+        # A concurrent writer may insert the same driver-day first
+        FleetRollup.objects.bulk_create(
+            [FleetRollup(driver_id=driver_id, log_date=log_date) for log_date in missing],
+            ignore_conflicts=True,
+        )
+        existing = dict(rows.order_by("-pk").values_list("log_date", "pk"))
+
+    updates = []
+    for log_date in sorted(deltas):
+        row = FleetRollup(pk=existing[log_date])
+        for field, value in deltas[log_date].items():
+            setattr(row, field, F(field) + value)
+        updates.append(row)
+    FleetRollup.objects.bulk_update(updates, ROLLUP_FIELDS)
+
+
+def fleet_totals(start: date, end: date, driver_id: Optional[int] = None, group_by: str = "day"):
+    """
+    Rollup sums for log dates in [start, end], grouped by "day", "driver"
+    or "day_driver" (and over the whole range under "totals").
+    """
+    rows = FleetRollup.objects.filter(log_date__gte=start, log_date__lte=end)
+    if driver_id is not None:
+        rows = rows.filter(driver_id=driver_id)
+
+    sums = {field: Sum(field) for field in ROLLUP_FIELDS}
+    keys = {"day": ["log_date"], "driver": ["driver_id"], "day_driver": ["log_date", "driver_id"]}[group_by]
+    return {
+        "totals": rows.aggregate(**sums),
+        "rows": list(rows.values(*keys).annotate(**sums).order_by(*keys)),
+    }
+
+
+def rebuild_rows(start: Optional[date] = None, end: Optional[date] = None):
+    """
+    FleetRollup rows recomputed from DailyLog (optionally for a log date
+    range), grouped in the database and yielded as they stream in.
+    """
+    logs = DailyLog.objects.all()
+    if start is not None:
+        logs = logs.filter(log_date__gte=start)
+    if end is not None:
+        logs = logs.filter(log_date__lte=end)
+    grouped = (
+        logs.values("log_date", "trip__user_id")
+        .annotate(
+            log_count=Count("id"),
+            sum_miles=Sum("total_miles"),
+            sum_driving=Sum("driving_hours"),
+            sum_on_duty=Sum("on_duty_hours"),
+            sum_fuel=Sum("fuel_stops"),
+        )
+        .order_by("log_date", "trip__user_id")
+    )
+    for row in grouped.iterator():
+        yield FleetRollup(
+            driver_id=row["trip__user_id"],
+            log_date=row["log_date"],
+            log_count=row["log_count"],
+            total_miles=row["sum_miles"],
+            driving_hours=row["sum_driving"],
+            on_duty_hours=row["sum_on_duty"],
+            fuel_stops=row["sum_fuel"],
+        )
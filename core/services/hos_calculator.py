@@ -1,26 +1,77 @@
-from datetime import datetime, timedelta
-from typing import Dict, Any, List, Tuple
+from datetime import date, datetime, time as dt_time, timedelta, timezone as dt_timezone
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
+from zoneinfo import ZoneInfo
 import math
 
+from .fixed_point import (
+    ONE_SECOND, SECONDS_PER_DAY, SECONDS_PER_HOUR, UNITS_PER_MILE, to_seconds, to_units, units_to_tenths
+)
+from .hos_rules import (
+    DEFAULT_RULE_SET, DRIVING, SINCE_BREAK, WINDOW, CompiledRuleSet, Transition, compile_rule_set
+)
+
+
+class Step(NamedTuple):
+    transition: Transition
+    duration: int
+    # Distance driven in the step
+    units: int
+    # The planner's counters after the step
+    driving: int
+    window: int
+    since_break: int
+    units_since_fuel: int
+
 
 class HOSCalculator:
     """
     Simplified HOS calculator for assessment requirements.
     Follows FMCSA rules: 11-hour driving, 14-hour window, 10-hour rest, 70-hour/8-day cycle
-    """
     
-    # HOS Constants per FMCSA regulations
-    MAX_DAILY_DRIVING = 11.0
-    MAX_DAILY_ON_DUTY = 14.0
-    MAX_CYCLE_HOURS = 70.0
-    REQUIRED_OFF_DUTY = 10.0
-    BREAK_REQUIREMENT_HOURS = 8.0  
+    The regulation itself comes from a compiled rule set (see hos_rules), chosen
+    per trip with the `rule_set` and `adverse_conditions` trip data keys.
+    
+    Daily logs follow the driver's home terminal time zone (`home_time_zone`),
+    as the ELD rule requires. Every segment also records the IANA zone its
+    local clock is in: the stop's own zone for pickups, dropoffs and waits
+    (`pickup_time_zone`, `dropoff_time_zone` or a leg's `time_zone`), and the
+    home terminal zone otherwise.
+    
+    Planning runs on integers (see fixed_point): segments carry
+    `duration_seconds` and `distance_tenths`, daily logs carry seconds per
+    duty status, so segment durations add up exactly to the trip's span.
+    Conversion to Decimal hours and miles happens when results are saved.
+    """
     
     # Assessment assumptions
     DEFAULT_AVG_SPEED = 55.0
     FUEL_RANGE = 1000.0  
     FUEL_STOP_DURATION = 0.5  
     PICKUP_DROPOFF_DURATION = 1.0  
+    MAX_DRIVING_SEGMENT = 4.0
+    # Longer waits for a stop to open are split, like DutyInterval.MAX_DURATION,
+    # so each segment fits its 99.99-hour duration column
+    MAX_WAIT_SEGMENT = 24.0
+    
+    # The same in planner units; at S mph a truck covers S distance units a second
+    SPEED = round(DEFAULT_AVG_SPEED * UNITS_PER_MILE / SECONDS_PER_HOUR)
+    FUEL_RANGE_UNITS = to_units(FUEL_RANGE)
+    FUEL_STOP_SECONDS = to_seconds(FUEL_STOP_DURATION)
+    STOP_SECONDS = to_seconds(PICKUP_DROPOFF_DURATION)
+    MAX_DRIVING_SEGMENT_SECONDS = to_seconds(MAX_DRIVING_SEGMENT)
+    MAX_WAIT_SEGMENT_SECONDS = to_seconds(MAX_WAIT_SEGMENT)
+    
+    # ELD duty status recorded for each segment type
+    SEGMENT_DUTY_STATUS = {
+        "driving": "driving",
+        "sleeper_berth": "sleeper_berth",
+        "rest_break": "off_duty",
+        "off_duty": "off_duty",
+        "wait": "off_duty",
+        "fuel": "on_duty_not_driving",
+        "pickup": "on_duty_not_driving",
+        "dropoff": "on_duty_not_driving"
+    }
     
     def __init__(self, trip_data: Dict[str, Any]):
         self.start_time = trip_data.get("start_time")
@@ -33,135 +84,259 @@ class HOSCalculator:
         self.current_location = trip_data.get("current_location", "")
         self.pickup_location = trip_data.get("pickup_location", "")
         self.dropoff_location = trip_data.get("dropoff_location", "")
+        self.home_time_zone = trip_data.get("home_time_zone") or "UTC"
+        self.home_tz = ZoneInfo(self.home_time_zone)
+        self.pickup_time_zone = trip_data.get("pickup_time_zone") or self.home_time_zone
+        self.dropoff_time_zone = trip_data.get("dropoff_time_zone") or self.home_time_zone
+        # Multi-stop trips: [{"location", "stop_type", "leg_miles", "window_start", "time_zone"}, ...]
+        # in visiting order, each leg driven from the previous stop (or the
+        # current location). Without stops, the trip is pickup then dropoff.
+        self.stops = trip_data.get("stops") or []
+        if self.stops and "trip_miles" not in trip_data:
+            self.trip_miles = sum(float(stop["leg_miles"]) for stop in self.stops)
+        self.rules = compile_rule_set(
+            trip_data.get("rule_set") or DEFAULT_RULE_SET,
+            bool(trip_data.get("adverse_conditions", False))
+        )
+        # Set by `replan`: state carried over from segments already driven
+        self.day_segments = []
+        self.first_day_number = 1
+        self.first_log_date = None
     
     def calculate(self) -> Dict[str, Any]:
         """Calculate HOS-compliant trip segments and daily logs"""
         segments = []
         current_time = self.start_time
-        miles_remaining = self.trip_miles
         sequence = 1
         
+        if self.stops:
+            return self._plan_remaining(segments, {
+                "current_time": current_time,
+                "sequence": sequence,
+                "driving_seconds": 0,
+                "window_seconds": 0,
+                "since_break_seconds": 0,
+                "units_since_fuel": 0,
+            })
+        
         # Add pickup segment
         pickup_segment = {
             "segment_type": "pickup",
             "sequence_number": sequence,
             "start_time": current_time,
-            "end_time": current_time + timedelta(hours=self.PICKUP_DROPOFF_DURATION),
-            "duration_hours": self.PICKUP_DROPOFF_DURATION,
-            "distance_miles": 0,
-            "location": self.pickup_location
+            "end_time": current_time + timedelta(seconds=self.STOP_SECONDS),
+            "duration_seconds": self.STOP_SECONDS,
+            "distance_tenths": 0,
+            "location": self.pickup_location,
+            "time_zone": self.pickup_time_zone
         }
         segments.append(pickup_segment)
         sequence += 1
         current_time = pickup_segment["end_time"]
         
-        # Track daily hours
-        daily_driving_hours = 0
-        daily_on_duty_hours = self.PICKUP_DROPOFF_DURATION
-        time_since_break = 0
+        return self._plan_remaining(segments, {
+            "current_time": current_time,
+            "sequence": sequence,
+            # Counters since the last rest, in seconds
+            "driving_seconds": 0,
+            "window_seconds": self.STOP_SECONDS,
+            "since_break_seconds": 0,
+            "units_since_fuel": 0,
+        })
+    
+    def replan(self, checkpoint: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Plan the rest of a trip from a mid-route checkpoint (see `checkpoint_state`).
+        `trip_miles` is the distance still to drive. Only the new segments are
+        returned, numbered on from the checkpoint; daily logs are rebuilt from
+        the checkpoint's day (`day_segments` already driven that day, numbered
+        from `first_day_number`).
+        """
+        self.day_segments = checkpoint.get("day_segments", [])
+        self.first_day_number = checkpoint.get("first_day_number", 1)
+        self.first_log_date = checkpoint.get("first_log_date")
+        return self._plan_remaining([], checkpoint)
+    
+    @staticmethod
+    def checkpoint_state(segments: List[Dict], rules: CompiledRuleSet) -> Dict[str, Any]:
+        """
+        Rebuild the planner's counters after the given (already driven)
+        segments, applying the same transitions as `calculate`. Rests that
+        were cut short by the checkpoint do not reset anything.
+        """
+        counters = [0, 0, 0]
+        units_since_fuel = 0
+        tenths_driven = 0
+        transitions = rules.transitions
         
-        while miles_remaining > 0:
-            if self._needs_fuel_stop(segments):
-                fuel_segment = {
-                    "segment_type": "fuel",
-                    "sequence_number": sequence,
-                    "start_time": current_time,
-                    "end_time": current_time + timedelta(hours=self.FUEL_STOP_DURATION),
-                    "duration_hours": self.FUEL_STOP_DURATION,
-                    "distance_miles": 0,
-                    "location": "Fuel Station"
-                }
-                segments.append(fuel_segment)
-                sequence += 1
-                current_time = fuel_segment["end_time"]
-                daily_on_duty_hours += self.FUEL_STOP_DURATION
-                time_since_break += self.FUEL_STOP_DURATION
-                continue
+        for segment in segments:
+            segment_type = segment["segment_type"]
+            duration = segment["duration_seconds"]
+            tenths = segment.get("distance_tenths") or 0
             
-            if time_since_break >= self.BREAK_REQUIREMENT_HOURS:
-                break_segment = {
-                    "segment_type": "rest_break",
+            if segment_type == "wait":
+                effects = rules.wait_effects(duration)
+                for i, (keep, add) in enumerate(effects):
+                    counters[i] = counters[i] * keep + duration * add
+                continue
+            transition = transitions.get(segment_type)
+            if transition is None or duration < transition.min_seconds:
+                continue
+            for i, (keep, add) in enumerate(transition.effects):
+                counters[i] = counters[i] * keep + duration * add
+            if segment_type == "fuel":
+                units_since_fuel = 0
+            elif segment_type == "driving":
+                units_since_fuel += tenths * UNITS_PER_MILE // 10
+                tenths_driven += tenths
+        
+        return {
+            "driving_seconds": counters[DRIVING],
+            "window_seconds": counters[WINDOW],
+            "since_break_seconds": counters[SINCE_BREAK],
+            "units_since_fuel": units_since_fuel,
+            "distance_tenths": tenths_driven,
+        }
+    
+    @classmethod
+    def next_step(
+        cls, rules: CompiledRuleSet, units_remaining: int, driving: int, window: int,
+        since_break: int, units_since_fuel: int
+    ) -> Step:
+        """
+        The planner's next step on the road with `units_remaining` still to
+        drive: a fuel stop, break or rest if one is due, else driving until
+        the next limit. Shared with trip_simulator, so both plan alike.
+        """
+        if units_since_fuel >= cls.FUEL_RANGE_UNITS:
+            transition, duration, units = rules.transitions["fuel"], cls.FUEL_STOP_SECONDS, 0
+            units_since_fuel = 0
+        elif since_break >= rules.break_after_seconds:
+            transition, duration, units = rules.rest_break, rules.rest_break.seconds, 0
+        elif driving >= rules.max_driving_seconds or window >= rules.max_window_seconds:
+            transition, duration, units = rules.rest, rules.rest.seconds, 0
+        else:
+            transition = rules.transitions["driving"]
+            duration = min(
+                rules.max_driving_seconds - driving,
+                rules.max_window_seconds - window,
+                -(-units_remaining // cls.SPEED),
+                cls.MAX_DRIVING_SEGMENT_SECONDS
+            )
+            units = min(units_remaining, duration * cls.SPEED)
+            units_since_fuel += units
+        
+        (dk, da), (wk, wa), (bk, ba) = transition.effects
+        return Step(
+            transition, duration, units,
+            driving * dk + duration * da,
+            window * wk + duration * wa,
+            since_break * bk + duration * ba,
+            units_since_fuel,
+        )
+    
+    def _plan_remaining(self, segments: List[Dict], state: Dict[str, Any]) -> Dict[str, Any]:
+        current_time = state["current_time"]
+        sequence = state["sequence"]
+        driving = state["driving_seconds"]
+        window = state["window_seconds"]
+        since_break = state["since_break_seconds"]
+        units_since_fuel = state["units_since_fuel"]
+        
+        rules = self.rules
+        next_step = self.next_step
+        stop_seconds = self.STOP_SECONDS
+        # Distance driven so far; each segment gets the change in its rounded
+        # total, so segment tenths add up to the trip's rounded miles
+        units_driven = tenths_driven = 0
+        
+        legs = self.stops or [{
+            "location": self.dropoff_location,
+            "stop_type": "dropoff",
+            "leg_miles": self.trip_miles,
+            "time_zone": self.dropoff_time_zone,
+        }]
+        home_time_zone = self.home_time_zone
+        
+        for leg in legs:
+            units_remaining = to_units(float(leg["leg_miles"]))
+            while units_remaining > 0:
+                transition, duration, units, driving, window, since_break, units_since_fuel = next_step(
+                    rules, units_remaining, driving, window, since_break, units_since_fuel
+                )
+                tenths = 0
+                if units:
+                    units_remaining -= units
+                    units_driven += units
+                    tenths = units_to_tenths(units_driven) - tenths_driven
+                    tenths_driven += tenths
+                
+                end_time = current_time + timedelta(seconds=duration)
+                segments.append({
+                    "segment_type": transition.segment_type,
                     "sequence_number": sequence,
                     "start_time": current_time,
-                    "end_time": current_time + timedelta(hours=0.5),
-                    "duration_hours": 0.5,
-                    "distance_miles": 0,
-                    "location": "Rest Stop"
-                }
-                segments.append(break_segment)
+                    "end_time": end_time,
+                    "duration_seconds": duration,
+                    "distance_tenths": tenths,
+                    "location": transition.location,
+                    "time_zone": home_time_zone
+                })
                 sequence += 1
-                current_time = break_segment["end_time"]
-                time_since_break = 0
-                continue
-            
-            remaining_daily_driving = self.MAX_DAILY_DRIVING - daily_driving_hours
-            remaining_daily_on_duty = self.MAX_DAILY_ON_DUTY - daily_on_duty_hours
-            
-            if remaining_daily_driving <= 0 or remaining_daily_on_duty <= 0:
-                rest_segment = {
-                    "segment_type": "sleeper_berth",
+                current_time = end_time
+        
+            stop_time_zone = leg.get("time_zone") or home_time_zone
+            # Arrived before the stop opens: wait off duty (in whole seconds,
+            # so the wait may end just after the window opens)
+            window_start = leg.get("window_start")
+            while window_start is not None and current_time < window_start:
+                duration = min(-((current_time - window_start) // ONE_SECOND), self.MAX_WAIT_SEGMENT_SECONDS)
+                end_time = current_time + timedelta(seconds=duration)
+                segments.append({
+                    "segment_type": "wait",
                     "sequence_number": sequence,
                     "start_time": current_time,
-                    "end_time": current_time + timedelta(hours=self.REQUIRED_OFF_DUTY),
-                    "duration_hours": self.REQUIRED_OFF_DUTY,
-                    "distance_miles": 0,
-                    "location": "Rest Area"
-                }
-                segments.append(rest_segment)
+                    "end_time": end_time,
+                    "duration_seconds": duration,
+                    "distance_tenths": 0,
+                    "location": leg["location"],
+                    "time_zone": stop_time_zone
+                })
                 sequence += 1
-                current_time = rest_segment["end_time"]
-                daily_driving_hours = 0
-                daily_on_duty_hours = 0
-                time_since_break = 0
-                continue
+                current_time = end_time
+                
+                (dk, da), (wk, wa), (bk, ba) = rules.wait_effects(duration)
+                driving = driving * dk + duration * da
+                window = window * wk + duration * wa
+                since_break = since_break * bk + duration * ba
             
-            hours_for_remaining_miles = miles_remaining / self.DEFAULT_AVG_SPEED
-            max_driving_hours = min(
-                remaining_daily_driving,
-                remaining_daily_on_duty,
-                hours_for_remaining_miles,
-                4.0 
-            )
-            
-            segment_miles = max_driving_hours * self.DEFAULT_AVG_SPEED
-            
-            driving_segment = {
-                "segment_type": "driving",
+            stop_segment = {
+                "segment_type": leg["stop_type"],
                 "sequence_number": sequence,
                 "start_time": current_time,
-                "end_time": current_time + timedelta(hours=max_driving_hours),
-                "duration_hours": round(max_driving_hours, 2),
-                "distance_miles": round(segment_miles, 1),
-                "location": "On Route"
+                "end_time": current_time + timedelta(seconds=stop_seconds),
+                "duration_seconds": stop_seconds,
+                "distance_tenths": 0,
+                "location": leg["location"],
+                "time_zone": stop_time_zone
             }
-            segments.append(driving_segment)
+            segments.append(stop_segment)
             sequence += 1
+            current_time = stop_segment["end_time"]
             
-            current_time = driving_segment["end_time"]
-            daily_driving_hours += max_driving_hours
-            daily_on_duty_hours += max_driving_hours
-            time_since_break += max_driving_hours
-            miles_remaining -= segment_miles
-        
-        dropoff_segment = {
-            "segment_type": "dropoff",
-            "sequence_number": sequence,
-            "start_time": current_time,
-            "end_time": current_time + timedelta(hours=self.PICKUP_DROPOFF_DURATION),
-            "duration_hours": self.PICKUP_DROPOFF_DURATION,
-            "distance_miles": 0,
-            "location": self.dropoff_location
-        }
-        segments.append(dropoff_segment)
+            (dk, da), (wk, wa), (bk, ba) = rules.transitions[leg["stop_type"]].effects
+            driving = driving * dk + stop_seconds * da
+            window = window * wk + stop_seconds * wa
+            since_break = since_break * bk + stop_seconds * ba
         
-        daily_logs = self._generate_daily_logs(segments)
+        daily_logs = self._generate_daily_logs(self.day_segments + segments, self.first_day_number, self.first_log_date)
         
         summary = {
-            "total_distance": self.trip_miles,
-            "total_duration": sum(s["duration_hours"] for s in segments if s["segment_type"] == "driving"),
+            "distance_tenths": tenths_driven,
+            "driving_seconds": sum(s["duration_seconds"] for s in segments if s["segment_type"] == "driving"),
             "fuel_stops": len([s for s in segments if s["segment_type"] == "fuel"]),
             "required_rest_stops": len([s for s in segments if s["segment_type"] == "sleeper_berth"]),
-            "total_trip_time": sum(s["duration_hours"] for s in segments),
+            "trip_seconds": sum(s["duration_seconds"] for s in segments),
             "estimated_arrival": segments[-1]["end_time"]
         }
         
@@ -171,80 +346,103 @@ class HOSCalculator:
             "daily_logs": daily_logs
         }
     
-    def _needs_fuel_stop(self, segments: List[Dict]) -> bool:
-        miles_since_fuel = 0
-        for segment in reversed(segments):
-            if segment["segment_type"] == "fuel":
-                break
-            miles_since_fuel += segment.get("distance_miles", 0)
-        else:
-            miles_since_fuel = sum(s.get("distance_miles", 0) for s in segments)
-        
-        return miles_since_fuel >= self.FUEL_RANGE
+    @classmethod
+    def duty_status_for(cls, segment_type: str) -> str:
+        return cls.SEGMENT_DUTY_STATUS.get(segment_type, "on_duty_not_driving")
     
-    def _generate_daily_logs(self, segments: List[Dict]) -> List[Dict]:
+    def _day_pieces(self, segment: Dict):
+        """
+        (start, end, seconds, tenths) for each home-terminal day `segment`
+        covers, so a log only holds time on its own day. Miles are split in
+        proportion to time, rounded so the pieces add up to the segment's.
+        """
+        home_tz = self.home_tz
+        start_time = segment["start_time"]
+        end_time = segment["end_time"]
+        duration = segment["duration_seconds"]
+        tenths = segment.get("distance_tenths", 0)
+        seconds_done = tenths_done = 0
+        while True:
+            local_start = start_time.astimezone(home_tz)
+            # In UTC, so the subtraction below holds across DST changes
+            midnight = datetime.combine(local_start.date() + timedelta(days=1), dt_time(), home_tz)
+            midnight = midnight.astimezone(dt_timezone.utc)
+            if end_time <= midnight:
+                yield local_start, end_time.astimezone(home_tz), duration - seconds_done, tenths - tenths_done
+                return
+            seconds = round((midnight - start_time) / ONE_SECOND)
+            seconds_done += seconds
+            piece_tenths = tenths * seconds_done // duration - tenths_done
+            tenths_done += piece_tenths
+            yield local_start, midnight.astimezone(home_tz), seconds, piece_tenths
+            start_time = midnight
+    
+    def _generate_daily_logs(
+        self, segments: List[Dict], first_day_number: int = 1, first_log_date: Optional[date] = None
+    ) -> List[Dict]:
+        """
+        Daily logs on the home terminal's clock, numbered from
+        `first_day_number`. Segments that cross midnight are split between
+        the days' logs; with `first_log_date`, days before it are left out.
+        """
         if not segments:
             return []
         
         daily_logs = {}
-        day_number = 1
+        day_number = first_day_number
         
         for segment in segments:
-            day = segment["start_time"].date()
-            
-            if day not in daily_logs:
-                daily_logs[day] = {
-                    "log_date": day,
-                    "day_number": day_number,
-                    "entries": [],
-                    "driving_hours": 0,
-                    "on_duty_hours": 0,
-                    "sleeper_berth_hours": 0,
-                    "off_duty_hours": 0,
-                    "total_miles": 0
-                }
-                day_number += 1
-            
-            duration = segment["duration_hours"]
             segment_type = segment["segment_type"]
-            
-            if segment_type == "driving":
-                daily_logs[day]["driving_hours"] += duration
-                daily_logs[day]["total_miles"] += segment.get("distance_miles", 0)
-            elif segment_type == "sleeper_berth":
-                daily_logs[day]["sleeper_berth_hours"] += duration
-            elif segment_type in ["fuel", "pickup", "dropoff"]:
-                daily_logs[day]["on_duty_hours"] += duration
-            else:
-                daily_logs[day]["off_duty_hours"] += duration
-            
-            start_hour = segment["start_time"].hour + segment["start_time"].minute / 60
-            end_hour = segment["end_time"].hour + segment["end_time"].minute / 60
-            
-            duty_status_map = {
-                "driving": "driving",
-                "sleeper_berth": "sleeper_berth", 
-                "rest_break": "off_duty",
-                "fuel": "on_duty_not_driving",
-                "pickup": "on_duty_not_driving",
-                "dropoff": "on_duty_not_driving"
-            }
-            
-            daily_logs[day]["entries"].append({
-                "duty_status": duty_status_map.get(segment_type, "on_duty_not_driving"),
-                "start_hour": round(start_hour, 2),
-                "end_hour": round(end_hour, 2),
-                "location": segment["location"]
-            })
+            for piece, (start_time, end_time, duration, tenths) in enumerate(self._day_pieces(segment)):
+                day = start_time.date()
+                if first_log_date is not None and day < first_log_date:
+                    continue
+                
+                if day not in daily_logs:
+                    daily_logs[day] = {
+                        "log_date": day,
+                        "day_number": day_number,
+                        "entries": [],
+                        "driving_seconds": 0,
+                        "on_duty_seconds": 0,
+                        "sleeper_berth_seconds": 0,
+                        "off_duty_seconds": 0,
+                        "distance_tenths": 0,
+                        "fuel_stops": 0
+                    }
+                    day_number += 1
+                
+                if segment_type == "driving":
+                    daily_logs[day]["driving_seconds"] += duration
+                    daily_logs[day]["distance_tenths"] += tenths
+                elif segment_type == "sleeper_berth":
+                    daily_logs[day]["sleeper_berth_seconds"] += duration
+                elif segment_type in ["fuel", "pickup", "dropoff"]:
+                    daily_logs[day]["on_duty_seconds"] += duration
+                    if segment_type == "fuel" and piece == 0:
+                        daily_logs[day]["fuel_stops"] += 1
+                else:
+                    daily_logs[day]["off_duty_seconds"] += duration
+                
+                # Seconds since midnight; a piece ending at the next midnight ends at 24:00
+                end_second = end_time.hour * SECONDS_PER_HOUR + end_time.minute * 60 + end_time.second
+                if end_time.date() > day:
+                    end_second = SECONDS_PER_DAY
+                daily_logs[day]["entries"].append({
+                    "duty_status": self.duty_status_for(segment_type),
+                    "start_second": start_time.hour * SECONDS_PER_HOUR + start_time.minute * 60 + start_time.second,
+                    "end_second": end_second,
+                    "location": segment["location"]
+                })
         
         for day_data in daily_logs.values():
-            total_hours = (
-                day_data["driving_hours"] + 
-                day_data["on_duty_hours"] + 
-                day_data["sleeper_berth_hours"] + 
-                day_data["off_duty_hours"]
+            total_seconds = (
+                day_data["driving_seconds"] + 
+                day_data["on_duty_seconds"] + 
+                day_data["sleeper_berth_seconds"] + 
+                day_data["off_duty_seconds"]
             )
-            if total_hours < 24:
-                day_data["off_duty_hours"] += (24 - total_hours)
+            if total_seconds < SECONDS_PER_DAY:
+                day_data["off_duty_seconds"] += SECONDS_PER_DAY - total_seconds
         
-        return list(daily_logs.values())
\ No newline at end of file
+        return list(daily_logs.values())
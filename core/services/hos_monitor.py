@@ -0,0 +1,291 @@
+"""
+Actual-vs-planned HOS monitoring for trips tracked by GPS.
+
+Every ping or duty status change on a trip advances its TripProgress row in
+constant time:
+
+- Driving time since the previous observation is added to the observed HOS
+  counters. A stop is applied when it ends, with the counter effects the
+  planner uses for waits (see `CompiledRuleSet.wait_effects`). The driver is
+  driving while the truck moves at `MOVING_MPH` or more and is taken to be off
+  duty once it stops, unless the ELD reports otherwise.
+- Driving past the driving limit, the on-duty window or the break deadline
+  raises a `TripAlert`, once per stretch between rests. So does reaching the
+  point where the driver can no longer legally get to the plan's next rest
+  (`rest_early`).
+- Each move of the projected arrival by another `ETA_DRIFT_STEP` raises an
+  `eta_drift` alert.
+
+Counters start from the plan's own counters at the trip's first ping, and no
+step re-runs `HOSCalculator`. Split sleeper pairings and the 70-hour cycle
+aren't tracked.
+"""
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone as dt_timezone
+from itertools import groupby
+from operator import itemgetter
+from typing import Any, Dict, List, Optional
+
+from core.models import TripAlert, TripProgress, TripSegment
+from .fixed_point import SECONDS_PER_HOUR, hours_float
+from .hos_calculator import HOSCalculator
+from .hos_rules import DRIVING, RESET, SINCE_BREAK, compile_rule_set
+
+
+MOVING_MPH = 5.0
+ETA_DRIFT_STEP = 1800
+# rest_early is raised once the shortfall is more than this
+REST_EARLY_MARGIN = 900
+PLAN_TTL = 60.0
+_MAX_PLANS = 10000
+
+REST_TYPES = ("rest_break", "sleeper_berth", "off_duty")
+
+# Bits of TripProgress.alerts_raised
+DRIVING_LIMIT, WINDOW_LIMIT, MISSED_BREAK, REST_EARLY = 1, 2, 4, 8
+_AFTER_RESET = ~(DRIVING_LIMIT | WINDOW_LIMIT | MISSED_BREAK | REST_EARLY)
+_AFTER_BREAK = ~(MISSED_BREAK | REST_EARLY)
+
+# Alerts per feed page
+FEED_LIMIT = 500
+
+
+class TripPlan:
+    """
+    A trip's planned segments as arrays of epoch seconds and cumulative tenths
+    of a mile, with its compiled rule set.
+    """
+
+    def __init__(self, trip_id: int, rows, rules):
+        self.trip_id = trip_id
+        self.rules = rules
+        self.loaded_at = time.monotonic()
+        self.types, self.starts, self.ends, self.before, self.tenths, self.sequence = [], [], [], [], [], []
+        driven = 0
+        for sequence_number, segment_type, start, end, miles in rows:
+            tenths = int((miles or 0) * 10)
+            self.types.append(segment_type)
+            self.starts.append(start.timestamp())
+            self.ends.append(end.timestamp())
+            self.before.append(driven)
+            self.tenths.append(tenths)
+            self.sequence.append(sequence_number)
+            driven += tenths
+        self.start, self.end = self.starts[0], self.ends[-1]
+        # Tenths driven by the end of each segment, for `behind`
+        self.after = [before + tenths for before, tenths in zip(self.before, self.tenths)]
+
+        # From the start of each segment to the next planned rest (or the
+        # drop-off): driving seconds, and wall seconds
+        self.to_rest_driving = [0] * len(self.types)
+        self.to_rest_elapsed = [0.0] * len(self.types)
+        rest_start, driving = self.starts[-1], 0
+        for i in reversed(range(len(self.types))):
+            if self.types[i] in REST_TYPES:
+                rest_start, driving = self.starts[i], 0
+            elif self.types[i] == "driving":
+                driving += round(self.ends[i] - self.starts[i])
+            self.to_rest_driving[i] = driving
+            self.to_rest_elapsed[i] = max(rest_start - self.starts[i], 0.0)
+
+    def planned(self, at: float):
+        """(tenths the plan has driven by `at`, planned segment's sequence number)"""
+        i = max(bisect_right(self.starts, at) - 1, 0)
+        span = self.ends[i] - self.starts[i]
+        fraction = min(max((at - self.starts[i]) / span, 0.0), 1.0) if span > 0 else 1.0
+        return self.before[i] + round(self.tenths[i] * fraction), self.sequence[i]
+
+    def _time_at(self, i: int, tenths: int) -> float:
+        if i == len(self.after):
+            return self.end
+        fraction = (tenths - self.before[i]) / self.tenths[i] if self.tenths[i] else 0.0
+        return self.starts[i] + (self.ends[i] - self.starts[i]) * min(max(fraction, 0.0), 1.0)
+
+    def behind(self, at: float, tenths: int) -> float:
+        """
+        Seconds between `at` and when the plan has driven `tenths`: positive if
+        the plan got past it earlier, negative if it gets there later, 0 while
+        the plan is there too (e.g. both parked at a rest stop).
+        """
+        earliest = self._time_at(bisect_left(self.after, tenths), tenths)
+        latest = self._time_at(bisect_right(self.after, tenths), tenths)
+        if at > latest:
+            return at - latest
+        return min(at - earliest, 0.0)
+
+    def counters_at(self, at: float) -> Dict[str, Any]:
+        """The planner's counters at `at`, cutting the segment in progress short there."""
+        segments = [
+            {"segment_type": segment_type, "duration_seconds": round(min(end, at) - start)}
+            for segment_type, start, end in zip(self.types, self.starts, self.ends)
+            if start < at
+        ]
+        return HOSCalculator.checkpoint_state(segments, self.rules)
+
+    def rest_shortfall(self, tenths: int, driving: int, window: int, since_break: int) -> float:
+        """
+        How much longer than the counters allow the driver would have to keep
+        going to reach the plan's next rest from `tenths` (0 if they can).
+        """
+        # At a planned rest's mileage the driver is arriving there, not leaving
+        i = bisect_left(self.after, tenths)
+        if i == len(self.after):
+            return 0.0
+        duration = self.ends[i] - self.starts[i]
+        elapsed = duration * min(max((tenths - self.before[i]) / self.tenths[i], 0.0), 1.0) if self.tenths[i] else 0.0
+        rules = self.rules
+        driving_left = min(rules.max_driving_seconds - driving, rules.break_after_seconds - since_break)
+        return max(
+            self.to_rest_driving[i] - elapsed - driving_left,
+            self.to_rest_elapsed[i] - elapsed - (rules.max_window_seconds - window),
+            0.0,
+        )
+
+
+_plans: Dict[int, TripPlan] = {}
+
+
+def load_plans(trip_ids) -> Dict[int, TripPlan]:
+    """Plans for `trip_ids`, from this process's cache or one segment query for the missing ones."""
+    now = time.monotonic()
+    missing = [
+        trip_id for trip_id in trip_ids
+        if trip_id not in _plans or now - _plans[trip_id].loaded_at > PLAN_TTL
+    ]
+    if missing:
+        if len(_plans) + len(missing) > _MAX_PLANS:
+            _plans.clear()
+        rows = (
+            TripSegment.objects.filter(trip_id__in=missing)
+            .order_by("trip_id", "sequence_number")
+            .values_list(
+                "trip_id", "trip__rule_set", "trip__adverse_conditions",
+                "sequence_number", "segment_type", "start_time", "end_time", "distance_miles",
+            )
+        )
+        for (trip_id, rule_set, adverse), trip_rows in groupby(rows, key=itemgetter(0, 1, 2)):
+            _plans[trip_id] = TripPlan(trip_id, [row[3:] for row in trip_rows], compile_rule_set(rule_set, adverse))
+    return {trip_id: _plans[trip_id] for trip_id in trip_ids if trip_id in _plans}
+
+
+def _stop_kind(duty_status: str) -> str:
+    if duty_status == "driving":
+        return "driving"
+    return "on_duty" if duty_status == "on_duty_not_driving" else "off_duty"
+
+
+def _apply(progress: TripProgress, effects, seconds: int):
+    counters = [progress.driving_seconds, progress.window_seconds, progress.since_break_seconds]
+    for i, (keep, add) in enumerate(effects):
+        counters[i] = counters[i] * keep + seconds * add
+    progress.driving_seconds, progress.window_seconds, progress.since_break_seconds = counters
+    if effects[DRIVING] == RESET:
+        progress.alerts_raised &= _AFTER_RESET
+    elif effects[SINCE_BREAK] == RESET:
+        progress.alerts_raised &= _AFTER_BREAK
+
+
+def start(progress: TripProgress, plan: TripPlan, at: float, moving: bool):
+    """Begin monitoring a trip at its first ping, from the plan's counters at that time."""
+    counters = plan.counters_at(at)
+    progress.driving_seconds = counters["driving_seconds"]
+    progress.window_seconds = counters["window_seconds"]
+    progress.since_break_seconds = counters["since_break_seconds"]
+    progress.duty_status = "driving" if moving else "on_duty_not_driving"
+    progress.status_since = datetime.fromtimestamp(at, tz=dt_timezone.utc)
+    progress.alerts_raised = 0
+    progress.eta_drift_steps = 0
+
+
+def _alert(progress: TripProgress, kind: str, at: float, value: float, message: str) -> TripAlert:
+    return TripAlert(
+        trip_id=progress.trip_id, kind=kind, recorded_at=datetime.fromtimestamp(at, tz=dt_timezone.utc),
+        value_seconds=round(value), message=message,
+    )
+
+
+def advance(progress: TripProgress, plan: TripPlan, previous: float, at: float, duty_status: str) -> List[TripAlert]:
+    """
+    Bring `progress` from the observation at `previous` to the one at `at`,
+    after which the driver is in `duty_status`. The time in between counts
+    under the status that held at `previous`. Returns the alerts raised.
+    """
+    rules = plan.rules
+    old_kind, new_kind = _stop_kind(progress.duty_status), _stop_kind(duty_status)
+    if old_kind == "driving":
+        _apply(progress, rules.transitions["driving"].effects, round(at - previous))
+    if new_kind != old_kind:
+        if old_kind != "driving":
+            seconds = round(at - progress.status_since.timestamp())
+            effects = rules.transitions["pickup"].effects if old_kind == "on_duty" else rules.wait_effects(seconds)
+            _apply(progress, effects, seconds)
+        progress.status_since = datetime.fromtimestamp(at, tz=dt_timezone.utc)
+    progress.duty_status = duty_status
+
+    alerts = []
+    if old_kind != "driving":
+        return alerts
+    limits = (
+        (DRIVING_LIMIT, "driving_limit", progress.driving_seconds, rules.max_driving_seconds, "driven"),
+        (WINDOW_LIMIT, "window_limit", progress.window_seconds, rules.max_window_seconds, "on duty"),
+        (MISSED_BREAK, "missed_break", progress.since_break_seconds, rules.break_after_seconds, "without a break"),
+    )
+    for bit, kind, value, limit, what in limits:
+        if value > limit and not progress.alerts_raised & bit:
+            progress.alerts_raised |= bit
+            alerts.append(_alert(
+                progress, kind, at, value - limit,
+                f"{hours_float(value):g} h {what}, over the {hours_float(limit):g} h limit",
+            ))
+    if not progress.alerts_raised & REST_EARLY:
+        shortfall = plan.rest_shortfall(
+            int(progress.driven_miles * 10),
+            progress.driving_seconds, progress.window_seconds, progress.since_break_seconds,
+        )
+        if shortfall > REST_EARLY_MARGIN:
+            progress.alerts_raised |= REST_EARLY
+            alerts.append(_alert(
+                progress, "rest_early", at, shortfall,
+                f"Hours run out {round(shortfall / 60)} min before the planned rest",
+            ))
+    return alerts
+
+
+def update_eta(progress: TripProgress, plan: TripPlan, at: float) -> List[TripAlert]:
+    """Project the arrival from `behind_seconds`; alert when it moves by another ETA_DRIFT_STEP."""
+    progress.estimated_arrival = datetime.fromtimestamp(plan.end + progress.behind_seconds, tz=dt_timezone.utc)
+    steps = int(progress.behind_seconds / ETA_DRIFT_STEP)
+    if steps == progress.eta_drift_steps:
+        return []
+    progress.eta_drift_steps = steps
+    minutes = round(abs(progress.behind_seconds) / 60)
+    if steps == 0:
+        message = f"Back within {ETA_DRIFT_STEP // 60} min of the planned arrival"
+    else:
+        message = f"Arriving {minutes} min {'late' if steps > 0 else 'early'}, at {progress.estimated_arrival:%Y-%m-%d %H:%M} UTC"
+    return [_alert(progress, "eta_drift", at, progress.behind_seconds, message)]
+
+
+def is_moving(speed_mph: Optional[float], moved_miles: float, seconds: float) -> bool:
+    """Whether a ping shows the truck moving: by its speed, or by its distance from the last fix."""
+    if speed_mph is not None:
+        return speed_mph >= MOVING_MPH
+    return seconds > 0 and moved_miles / seconds * SECONDS_PER_HOUR >= MOVING_MPH
+
+
+def _alert_rows(queryset) -> List[Dict[str, Any]]:
+    return list(queryset.values("id", "trip_id", "kind", "recorded_at", "value_seconds", "message", "created_at"))
+
+
+def alerts_after(after: Optional[int], trip_id: Optional[int] = None, limit: int = FEED_LIMIT) -> List[Dict[str, Any]]:
+    """
+    Alerts with ids above `after`, oldest first. With no `after`, the latest
+    `limit` alerts.
+    """
+    alerts = TripAlert.objects.all()
+    if trip_id is not None:
+        alerts = alerts.filter(trip_id=trip_id)
+    if after is None:
+        return _alert_rows(alerts.order_by("-id")[:limit])[::-1]
+    return _alert_rows(alerts.filter(id__gt=after).order_by("id")[:limit])
@@ -0,0 +1,168 @@
+"""
+HOS rule sets and their compiled transition tables.
+
+A `RuleSet` describes a regulation in hours. `compile_rule_set` turns it
+into a `CompiledRuleSet`: per-stretch limits plus a transition for every
+segment type, where each transition says how the planner's counters change.
+Counter updates are encoded as (keep, add) multipliers so the planning loop
+applies any transition with the same two multiply-adds and no branching on
+the rule set. Limits and durations are compiled to whole seconds too (see
+fixed_point), so the planner's counters stay integers. Compiled tables are
+cached per process and shared by every request.
+"""
+import sys
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from .fixed_point import to_seconds
+
+
+# Counters tracked by the planner, in table order
+DRIVING, WINDOW, SINCE_BREAK = range(3)
+
+# (keep, add) multipliers: counter = counter * keep + duration * add
+KEEP = (1, 0)
+ADD = (1, 1)
+RESET = (0, 0)
+
+# `break_after_seconds` when the rule set needs no break
+NEVER = sys.maxsize
+
+
+@dataclass(frozen=True)
+class RuleSet:
+    name: str
+    label: str
+    max_driving: float
+    max_window: float
+    off_duty_reset: float
+    # Driving/on-duty hours after which a break is required; None if exempt
+    break_after: Optional[float] = 8.0
+    break_duration: float = 0.5
+    # On-duty hours allowed per cycle
+    cycle_hours: float = 70.0
+    # Extra driving and window hours allowed under adverse driving conditions
+    adverse_extension: float = 2.0
+
+
+RULE_SETS: Dict[str, RuleSet] = {
+    rule_set.name: rule_set for rule_set in [
+        RuleSet(
+            name="property",
+            label="Property-carrying (11/14, 30-min break, 10-hr reset)",
+            max_driving=11.0, max_window=14.0, off_duty_reset=10.0,
+        ),
+        RuleSet(
+            name="property_short_haul",
+            label="Property-carrying, 150 air-mile short-haul exemption",
+            max_driving=11.0, max_window=14.0, off_duty_reset=10.0, break_after=None,
+        ),
+        RuleSet(
+            name="passenger",
+            label="Passenger-carrying (10/15, 8-hr reset)",
+            max_driving=10.0, max_window=15.0, off_duty_reset=8.0, break_after=None,
+        ),
+    ]
+}
+
+RULE_SET_CHOICES = [(rule_set.name, rule_set.label) for rule_set in RULE_SETS.values()]
+DEFAULT_RULE_SET = "property"
+
+
+@dataclass(frozen=True)
+class Transition:
+    segment_type: str
+    duration: float
+    location: str
+    # (keep, add) per counter, indexed by DRIVING, WINDOW, SINCE_BREAK
+    effects: Tuple[Tuple[int, int], Tuple[int, int], Tuple[int, int]]
+    # Shortest period that still counts as this transition (rests cut short don't reset)
+    min_duration: float = 0.0
+    # `duration` and `min_duration` in whole seconds
+    seconds: int = field(init=False)
+    min_seconds: int = field(init=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "seconds", to_seconds(self.duration))
+        object.__setattr__(self, "min_seconds", to_seconds(self.min_duration))
+
+
+@dataclass(frozen=True)
+class CompiledRuleSet:
+    rule_set: RuleSet
+    adverse_conditions: bool
+    # Limits per stretch between rests
+    max_driving: float
+    max_window: float
+    break_after: float
+    rest_break: Transition
+    # Rest period taken each time a stretch limit is reached
+    rest: Transition
+    # Counter effects for every segment type
+    transitions: Dict[str, Transition]
+    # The limits above in whole seconds
+    max_driving_seconds: int
+    max_window_seconds: int
+    break_after_seconds: int
+
+    def wait_effects(self, seconds: int):
+        """Counter effects of waiting off duty for `seconds` (e.g. for a stop to open)."""
+        if seconds >= to_seconds(self.rule_set.off_duty_reset):
+            return (RESET, RESET, RESET)
+        if seconds >= to_seconds(self.rule_set.break_duration):
+            return (KEEP, ADD, RESET)
+        return (KEEP, ADD, KEEP)
+
+
+# Segment types whose counter effects don't depend on the rule set
+_ON_DUTY = (KEEP, ADD, ADD)
+_FIXED_EFFECTS = {
+    "driving": (ADD, ADD, ADD),
+    "fuel": _ON_DUTY,
+    "pickup": (KEEP, ADD, KEEP),
+    "dropoff": (KEEP, ADD, KEEP),
+}
+_FIXED_LOCATIONS = {"driving": "On Route", "fuel": "Fuel Station"}
+
+
+@lru_cache(maxsize=None)
+def compile_rule_set(name: str = DEFAULT_RULE_SET, adverse_conditions: bool = False) -> CompiledRuleSet:
+    try:
+        rule_set = RULE_SETS[name]
+    except KeyError:
+        raise ValueError(f"Unknown HOS rule set {name!r}")
+
+    extension = rule_set.adverse_extension if adverse_conditions else 0.0
+    max_driving = rule_set.max_driving + extension
+    max_window = rule_set.max_window + extension
+
+    rest = Transition(
+        "sleeper_berth", rule_set.off_duty_reset, "Rest Area", (RESET, RESET, RESET), rule_set.off_duty_reset
+    )
+
+    rest_break = Transition(
+        "rest_break", rule_set.break_duration, "Rest Stop", (KEEP, KEEP, RESET), rule_set.break_duration
+    )
+
+    transitions = {
+        segment_type: Transition(segment_type, 0.0, _FIXED_LOCATIONS.get(segment_type, ""), effects)
+        for segment_type, effects in _FIXED_EFFECTS.items()
+    }
+    transitions["rest_break"] = rest_break
+    transitions[rest.segment_type] = rest
+
+    break_after = rule_set.break_after if rule_set.break_after is not None else float("inf")
+    return CompiledRuleSet(
+        rule_set=rule_set,
+        adverse_conditions=adverse_conditions,
+        max_driving=max_driving,
+        max_window=max_window,
+        break_after=break_after,
+        rest_break=rest_break,
+        rest=rest,
+        transitions=transitions,
+        max_driving_seconds=to_seconds(max_driving),
+        max_window_seconds=to_seconds(max_window),
+        break_after_seconds=to_seconds(break_after) if rule_set.break_after is not None else NEVER,
+    )
@@ -0,0 +1,89 @@
+"""
+Miles and HOS-compliant transit times for many origin/destination lanes.
+
+Distances come from `lane_matrix` in chunked matrix requests. Transit times
+come from `transit_summary`, which only keeps a plan's totals (see
+trip_simulator), so a grid of hundreds of lanes doesn't build segments and
+daily logs it would throw away.
+"""
+import csv
+import io
+from functools import lru_cache
+from typing import Any, Dict, Sequence
+
+from . import openroute_quota
+from .distance_matrix import lane_matrix
+from .fixed_point import hours_float
+from .hos_calculator import HOSCalculator
+from .hos_rules import DEFAULT_RULE_SET, compile_rule_set
+from .trip_simulator import departure_state, plan_totals
+
+
+LANE_COLUMNS = (
+    "origin", "destination", "miles", "driving_hours", "transit_hours",
+    "fuel_stops", "rest_stops", "estimated",
+)
+
+
+@lru_cache(maxsize=4096)
+def transit_summary(miles: float, rule_set: str = DEFAULT_RULE_SET, adverse_conditions: bool = False) -> Dict[str, Any]:
+    """
+    The `summary` totals HOSCalculator.calculate() would give for a trip of
+    `miles` (driving hours, total trip time, fuel and rest stops).
+    """
+    rules = compile_rule_set(rule_set, adverse_conditions)
+    totals = plan_totals(rules, departure_state(rules, miles))
+    return {
+        "driving_hours": hours_float(totals.driving_seconds),
+        # The planned trip starts with a pickup; the totals end with the dropoff
+        "transit_hours": hours_float(HOSCalculator.STOP_SECONDS + totals.trip_seconds),
+        "fuel_stops": totals.fuel_stops,
+        "rest_stops": totals.rest_stops,
+    }
+
+
+def quote_lanes(
+    origins: Sequence[Dict[str, Any]],
+    destinations: Sequence[Dict[str, Any]],
+    rule_set: str = DEFAULT_RULE_SET,
+    adverse_conditions: bool = False,
+) -> Dict[str, Any]:
+    """
+    Quote grid for every origin x destination ({"name", "coords"} dicts), as
+    parallel columns in origin-major order. `origin`/`destination` columns
+    hold indices into the `origins`/`destinations` name lists.
+    """
+    matrix, estimated = lane_matrix(
+        [o["coords"] for o in origins], [d["coords"] for d in destinations], priority=openroute_quota.BATCH
+    )
+    columns = {column: [] for column in LANE_COLUMNS}
+    for i, row in enumerate(matrix):
+        for j, miles in enumerate(row):
+            summary = transit_summary(miles, rule_set, adverse_conditions)
+            columns["origin"].append(i)
+            columns["destination"].append(j)
+            columns["miles"].append(miles)
+            columns["driving_hours"].append(summary["driving_hours"])
+            columns["transit_hours"].append(summary["transit_hours"])
+            columns["fuel_stops"].append(summary["fuel_stops"])
+            columns["rest_stops"].append(summary["rest_stops"])
+            columns["estimated"].append(estimated[i][j])
+    return {
+        "rule_set": rule_set,
+        "adverse_conditions": adverse_conditions,
+        "origins": [o["name"] for o in origins],
+        "destinations": [d["name"] for d in destinations],
+        "lanes": columns,
+    }
+
+
+def lanes_csv(grid: Dict[str, Any]) -> str:
+    """One row per lane, with origin and destination names."""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(LANE_COLUMNS)
+    lanes = grid["lanes"]
+    origins, destinations = grid["origins"], grid["destinations"]
+    for row in zip(*(lanes[column] for column in LANE_COLUMNS)):
+        writer.writerow((origins[row[0]], destinations[row[1]], *row[2:]))
+    return out.getvalue()
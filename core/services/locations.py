@@ -0,0 +1,99 @@
+"""
+In-process interning of place names to `Location` ids.
+
+Every trip repeats the same few names ("On Route", "Fuel Station", its
+pickup and dropoff), so each worker keeps name <-> id maps and writers
+resolve a whole plan's names in at most one query (three when some names
+are new). Entries are only cached once the rows behind them are committed:
+a rolled-back insert's id can be handed out again on SQLite.
+"""
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from django.db import connection, transaction
+
+from core.models import Location
+
+# Cleared when full; distinct names are stop names plus a handful of planner labels
+MAX_CACHED = 100000
+
+_ids: Dict[str, int] = {}
+_names: Dict[int, str] = {}
+
+
+def clear():
+    _ids.clear()
+    _names.clear()
+
+
+def _remember(rows: List[Tuple[int, str]]):
+    def store():
+        if len(_names) + len(rows) > MAX_CACHED:
+            clear()
+        for pk, name in rows:
+            _ids[name] = pk
+            _names[pk] = name
+
+    if connection.in_atomic_block:
+        transaction.on_commit(store)
+    else:
+        store()
+
+
+def intern(names: Iterable[str], coordinates: Optional[Mapping[str, Sequence[float]]] = None) -> Dict[str, int]:
+    """
+    {name: Location id} for `names`, creating the locations not stored yet
+    with their [longitude, latitude] from `coordinates` where given.
+    Coordinates of locations that already exist are left as they are.
+    """
+    coordinates = coordinates or {}
+    ids, missing = {}, set()
+    for name in names:
+        pk = _ids.get(name)
+        if pk is None:
+            missing.add(name)
+        else:
+            ids[name] = pk
+    if not missing:
+        return ids
+
+    found = dict(Location.objects.filter(name__in=missing).values_list("name", "id"))
+    new = missing - found.keys()
+    if new:
+        # A concurrent writer may insert the same names; the unique name wins either way
+        Location.objects.bulk_create([
+            Location(name=name, longitude=coords[0], latitude=coords[1]) if coords else Location(name=name)
+            for name, coords in ((name, coordinates.get(name)) for name in sorted(new))
+        ], ignore_conflicts=True)
+        found.update(Location.objects.filter(name__in=new).values_list("name", "id"))
+    _remember([(pk, name) for name, pk in found.items()])
+    ids.update(found)
+    return ids
+
+
+def plan_location_names(segments: Iterable[Dict], daily_logs: Iterable[Dict] = ()) -> set:
+    """Every location name in an HOSCalculator result's segments and log entries."""
+    names = {segment["location"] for segment in segments}
+    for log in daily_logs:
+        names.update(entry["location"] for entry in log.get("entries", ()))
+    return names
+
+
+def names_for(ids: Iterable[int]) -> Dict[int, str]:
+    """{id: name} for Location `ids`, in at most one query."""
+    found, missing = {}, set()
+    for pk in ids:
+        name = _names.get(pk)
+        if name is None:
+            missing.add(pk)
+        else:
+            found[pk] = name
+    if missing:
+        rows = list(Location.objects.filter(pk__in=missing).values_list("id", "name"))
+        _remember(rows)
+        found.update(rows)
+    return found
+
+
+def name_for(pk: int) -> str:
+    return names_for([pk])[pk]
+
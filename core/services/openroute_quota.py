@@ -0,0 +1,198 @@
+"""
+OpenRouteService quota, shared by every worker process.
+
+Each endpoint has a per-minute and a per-day quota, kept as two token
+buckets in RateLimitBucket rows so all workers draw on one budget. The
+minute bucket refills continuously; the day bucket refills all at once at
+midnight UTC, when OpenRouteService resets its daily counts. Tokens are
+taken with a compare-and-swap UPDATE, so no lock is held between calls and
+it works the same on SQLite and PostgreSQL.
+
+Callers pass a priority. Lower priorities can't draw a bucket below their
+reserve, which is kept for routing trips, and wait less (autocomplete not at
+all) for tokens before the call is shed with QuotaExceeded.
+"""
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Least
+
+from core.models import RateLimitBucket
+
+# (per minute, per day) requests for each endpoint; OpenRouteService's standard plan
+DEFAULT_QUOTAS = {
+    "directions": (40, 2000),
+    "matrix": (40, 500),
+    "geocode": (100, 1000),
+}
+MINUTE = 60.0
+DAY = 24 * 60 * 60.0
+# Shortest sleep between attempts while waiting for tokens
+POLL_INTERVAL = 0.05
+
+
+class Priority(NamedTuple):
+    name: str
+    # Share of each bucket left untouched for higher priorities
+    reserve: float
+    # Seconds to wait for tokens before the call is shed
+    max_wait: float
+
+
+# Creating and replanning trips; well inside the directions timeout and gunicorn's 30 s
+ROUTING = Priority("routing", 0.0, 5.0)
+# Lane quotes and imports, which fall back to cached or estimated miles
+BATCH = Priority("batch", 0.1, 2.0)
+# A late suggestion is no use to someone typing
+AUTOCOMPLETE = Priority("autocomplete", 0.3, 0.0)
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, endpoint: str, retry_after: float):
+        super().__init__(f"OpenRouteService {endpoint} quota exhausted, retry in {retry_after:.0f}s")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+class _Spec(NamedTuple):
+    name: str
+    period: str
+    capacity: float
+    period_seconds: float
+    fixed_window: bool
+
+
+def quotas() -> Dict[str, Tuple[int, int]]:
+    return getattr(settings, "OPENROUTE_QUOTAS", DEFAULT_QUOTAS)
+
+
+def _specs(endpoint: str) -> List[_Spec]:
+    per_minute, per_day = quotas()[endpoint]
+    return [
+        _Spec(f"{endpoint}:minute", "minute", float(per_minute), MINUTE, False),
+        _Spec(f"{endpoint}:day", "day", float(per_day), DAY, True),
+    ]
+
+
+def _bucket(spec: _Spec, now: float) -> RateLimitBucket:
+    """The bucket's row, created full if missing, with its limits as currently configured."""
+    bucket = RateLimitBucket.objects.filter(name=spec.name).first()
+    if bucket is None:
+        try:
+            with transaction.atomic():
+                bucket = RateLimitBucket.objects.create(
+                    name=spec.name, capacity=spec.capacity, period_seconds=spec.period_seconds,
+                    fixed_window=spec.fixed_window, tokens=spec.capacity, updated_at=now,
+                )
+        except IntegrityError:
+            bucket = RateLimitBucket.objects.get(name=spec.name)
+    bucket.capacity, bucket.period_seconds, bucket.fixed_window = spec.capacity, spec.period_seconds, spec.fixed_window
+    return bucket
+
+
+def _refilled(bucket: RateLimitBucket, now: float) -> float:
+    """Tokens in `bucket` at `now`."""
+    if bucket.fixed_window:
+        if now // bucket.period_seconds > bucket.updated_at // bucket.period_seconds:
+            return bucket.capacity
+        return min(bucket.tokens, bucket.capacity)
+    elapsed = max(now - bucket.updated_at, 0.0)
+    return min(bucket.capacity, bucket.tokens + elapsed * bucket.capacity / bucket.period_seconds)
+
+
+def _wait(bucket: RateLimitBucket, needed: float, now: float) -> float:
+    """Seconds from `now` until `bucket` holds `needed` tokens."""
+    if bucket.fixed_window:
+        return (now // bucket.period_seconds + 1) * bucket.period_seconds - now
+    return (needed - _refilled(bucket, now)) * bucket.period_seconds / bucket.capacity
+
+
+def _take(spec: _Spec, priority: Priority, now: float) -> Optional[Tuple[RateLimitBucket, float]]:
+    """Take a token from the bucket; if it's too low for `priority`, (bucket, seconds to wait) instead."""
+    needed = 1 + priority.reserve * spec.capacity
+    while True:
+        bucket = _bucket(spec, now)
+        tokens = _refilled(bucket, now)
+        if tokens < needed:
+            return bucket, _wait(bucket, needed, now)
+        # Only applies if no other worker has touched the bucket since it was read
+        taken = RateLimitBucket.objects.filter(
+            pk=bucket.pk, tokens=bucket.tokens, updated_at=bucket.updated_at
+        ).update(
+            capacity=spec.capacity, period_seconds=spec.period_seconds, fixed_window=spec.fixed_window,
+            tokens=tokens - 1, updated_at=max(now, bucket.updated_at), granted=F("granted") + 1,
+        )
+        if taken:
+            return None
+
+
+def _give_back(spec: _Spec):
+    RateLimitBucket.objects.filter(name=spec.name).update(
+        tokens=Least(F("tokens") + 1, F("capacity")), granted=F("granted") - 1
+    )
+
+
+def acquire(endpoint: str, priority: Priority = ROUTING):
+    """
+    Take one call from `endpoint`'s quota, waiting up to `priority.max_wait`
+    for tokens. Raises QuotaExceeded if there are none by then. Call outside
+    a transaction, so other workers see the tokens as they go.
+    """
+    specs = _specs(endpoint)
+    deadline = time.time() + priority.max_wait
+    while True:
+        now = time.time()
+        taken = []
+        for spec in specs:
+            refused = _take(spec, priority, now)
+            if refused is not None:
+                break
+            taken.append(spec)
+        else:
+            return
+        for spec in taken:
+            _give_back(spec)
+
+        bucket, wait = refused
+        if now + wait > deadline:
+            RateLimitBucket.objects.filter(pk=bucket.pk).update(shed=F("shed") + 1)
+            raise QuotaExceeded(endpoint, wait)
+        time.sleep(max(wait, POLL_INTERVAL))
+
+
+def throttled(endpoint: str):
+    """
+    Record a 429 from OpenRouteService for `endpoint`. It has counted calls
+    these buckets haven't (another key holder, a restarted window), so the
+    minute bucket is emptied and refills from now.
+    """
+    now = time.time()
+    spec = _specs(endpoint)[0]
+    _bucket(spec, now)
+    RateLimitBucket.objects.filter(name=spec.name).update(
+        tokens=0, updated_at=now, upstream_throttled=F("upstream_throttled") + 1
+    )
+
+
+def quota_usage() -> List[Dict[str, Any]]:
+    """Remaining tokens and call counters for every configured bucket."""
+    now = time.time()
+    usage = []
+    for endpoint in quotas():
+        for spec in _specs(endpoint):
+            bucket = _bucket(spec, now)
+            remaining = _refilled(bucket, now)
+            usage.append({
+                "endpoint": endpoint,
+                "period": spec.period,
+                "limit": int(spec.capacity),
+                "remaining": int(remaining),
+                "utilization": round(1 - remaining / spec.capacity, 3),
+                "granted": bucket.granted,
+                "shed": bucket.shed,
+                "upstream_throttled": bucket.upstream_throttled,
+            })
+    return usage
@@ -0,0 +1,386 @@
+"""
+Live truck positions from batched GPS pings.
+
+`POST /api/positions/` takes pings as NDJSON or as packed binary records
+(see `PING_RECORD`). Each batch is checked, appended to PositionPing with
+one bulk insert and applied to two kinds of state:
+
+- `latest_positions`, an array-backed store holding each driver's newest fix
+  in this worker. A lookup is a dict hit and a few array reads. Entries are
+  re-read from the database once they are `STALE_AFTER` seconds old, since
+  another worker may have ingested newer pings.
+- TripProgress for the trip each ping falls in, found through the driver's
+  duty intervals. Driven miles add up the great-circle distance between
+  fixes, ignoring jitter below `MIN_MOVE_MILES` and jumps faster than
+  `MAX_PLAUSIBLE_MPH`. They are compared with the miles the plan has driven
+  by the same time, and `hos_monitor` checks the driver's hours against the
+  plan. Pings for one truck are expected in time order from one sender. An
+  out-of-order ping is stored but doesn't move progress. The stored rows
+  are read and written under a row lock in the batch's transaction, so
+  batches and duty status changes for a trip handled by different workers
+  apply one after another.
+"""
+import json
+import math
+import struct
+import time
+from array import array
+from bisect import bisect_right
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from operator import itemgetter
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+
+from core.models import DutyInterval, PositionPing, TripAlert, TripProgress
+from . import hos_monitor
+from .fixed_point import miles_decimal
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # pragma: no cover - orjson is optional
+    _loads = json.loads
+
+
+# Little-endian driver id, epoch seconds, longitude and latitude in
+# microdegrees, speed in 0.1 mph (NO_SPEED if unknown): 18 bytes a ping
+PING_RECORD = struct.Struct("<IIiiH")
+NO_SPEED = 0xFFFF
+MAX_BATCH = 10000
+# Pings stamped further ahead of the server clock are rejected, as are
+# pings stamped before 2000-01-01
+MAX_CLOCK_SKEW = 300
+MIN_RECORDED_AT = 946684800.0
+STALE_AFTER = 5.0
+MIN_MOVE_MILES = 0.02
+MAX_PLAUSIBLE_MPH = 120.0
+
+# (driver id, epoch seconds, longitude, latitude, speed mph or None)
+Ping = Tuple[int, float, float, float, Optional[float]]
+
+
+class PingFormatError(ValueError):
+    pass
+
+
+class TrackingError(ValueError):
+    pass
+
+
+def _check(driver_id, recorded_at, lon, lat, speed, now) -> Optional[str]:
+    if type(driver_id) is not int or driver_id < 1:
+        return "driver must be a positive integer"
+    if not (-180 <= lon <= 180 and -90 <= lat <= 90):
+        return "coords out of range"
+    if recorded_at > now + MAX_CLOCK_SKEW:
+        return "recorded_at is in the future"
+    if not recorded_at >= MIN_RECORDED_AT:
+        return "recorded_at is before 2000"
+    if speed is not None and not (speed >= 0 and math.isfinite(speed)):
+        return "speed_mph must be non-negative"
+    return None
+
+
+def _epoch(value) -> float:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=dt_timezone.utc)
+    return parsed.timestamp()
+
+
+def parse_ndjson(body: bytes) -> Tuple[List[Ping], List[Dict[str, Any]]]:
+    """
+    Pings from lines like {"driver": 7, "coords": [lon, lat], "recorded_at":
+    ISO 8601 or epoch seconds, "speed_mph": 52.5}, and {"line", "error"} for
+    lines that don't parse or check out.
+    """
+    pings, errors = [], []
+    now = time.time()
+    for number, line in enumerate(body.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            row = _loads(line)
+            lon, lat = (float(v) for v in row["coords"])
+            speed = row.get("speed_mph")
+            ping = (row["driver"], _epoch(row["recorded_at"]), lon, lat, None if speed is None else float(speed))
+        except (ValueError, TypeError, KeyError) as e:
+            errors.append({"line": number, "error": f"Invalid ping: {e}"})
+            continue
+        error = _check(*ping, now)
+        if error:
+            errors.append({"line": number, "error": error})
+        else:
+            pings.append(ping)
+    return pings, errors
+
+
+def parse_binary(body: bytes) -> Tuple[List[Ping], List[Dict[str, Any]]]:
+    """Pings from concatenated PING_RECORD structs; errors name the record number."""
+    if len(body) % PING_RECORD.size:
+        raise PingFormatError(f"Body is not a whole number of {PING_RECORD.size}-byte records")
+    pings, errors = [], []
+    now = time.time()
+    for number, (driver_id, recorded_at, lon, lat, speed) in enumerate(PING_RECORD.iter_unpack(body), start=1):
+        ping = (driver_id, float(recorded_at), lon / 1e6, lat / 1e6, None if speed == NO_SPEED else speed / 10)
+        error = _check(*ping, now)
+        if error:
+            errors.append({"line": number, "error": error})
+        else:
+            pings.append(ping)
+    return pings, errors
+
+
+def pack_pings(pings: List[Ping]) -> bytes:
+    """The binary body for `pings` (for clients and tests)."""
+    return b"".join(
+        PING_RECORD.pack(
+            driver_id, int(recorded_at), round(lon * 1e6), round(lat * 1e6),
+            NO_SPEED if speed is None else round(speed * 10),
+        )
+        for driver_id, recorded_at, lon, lat, speed in pings
+    )
+
+
+class LatestPositions:
+    """
+    Newest fix per driver in parallel typed arrays, indexed through a dict
+    from driver id to slot: O(1) lookups and updates and about 50 bytes a
+    truck, instead of a dict or model instance each.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._slots: Dict[int, int] = {}
+        self._recorded_at = array("d")
+        self._longitude = array("d")
+        self._latitude = array("d")
+        self._speed = array("d")  # NaN if unknown
+        self._trip = array("q")  # 0 if none
+        self._checked = array("d")  # time.monotonic() when last known current
+
+    def __len__(self):
+        return len(self._slots)
+
+    def update(self, driver_id: int, recorded_at: float, lon: float, lat: float,
+               speed: Optional[float], trip_id: Optional[int]) -> bool:
+        """Store a fix unless an equally new or newer one is stored; True if stored."""
+        slot = self._slots.get(driver_id)
+        if slot is None:
+            self._slots[driver_id] = len(self._recorded_at)
+            for column in (self._recorded_at, self._longitude, self._latitude, self._speed, self._trip, self._checked):
+                column.append(0)
+            slot = self._slots[driver_id]
+        elif recorded_at <= self._recorded_at[slot]:
+            self._checked[slot] = time.monotonic()
+            return False
+        self._recorded_at[slot] = recorded_at
+        self._longitude[slot] = lon
+        self._latitude[slot] = lat
+        self._speed[slot] = math.nan if speed is None else speed
+        self._trip[slot] = trip_id or 0
+        self._checked[slot] = time.monotonic()
+        return True
+
+    def get(self, driver_id: int, max_age: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        The stored fix for `driver_id`, or None if there is none or (with
+        `max_age`) it was last confirmed more than `max_age` seconds ago.
+        """
+        slot = self._slots.get(driver_id)
+        if slot is None or (max_age is not None and time.monotonic() - self._checked[slot] > max_age):
+            return None
+        speed = self._speed[slot]
+        return {
+            "driver_id": driver_id,
+            "recorded_at": datetime.fromtimestamp(self._recorded_at[slot], tz=dt_timezone.utc),
+            "coords": [self._longitude[slot], self._latitude[slot]],
+            "speed_mph": None if math.isnan(speed) else speed,
+            "trip_id": self._trip[slot] or None,
+        }
+
+
+latest_positions = LatestPositions()
+
+
+def latest_position(driver_id: int) -> Optional[Dict[str, Any]]:
+    """A driver's newest fix: from this worker's store, or the database once the entry is stale."""
+    position = latest_positions.get(driver_id, max_age=STALE_AFTER)
+    if position is not None:
+        return position
+    row = (
+        PositionPing.objects.filter(driver_id=driver_id).order_by("-recorded_at")
+        .values_list("recorded_at", "longitude", "latitude", "speed_mph", "trip_id").first()
+    )
+    if row is None:
+        return None
+    recorded_at, lon, lat, speed, trip_id = row
+    latest_positions.update(driver_id, recorded_at.timestamp(), lon, lat, speed, trip_id)
+    return latest_positions.get(driver_id)
+
+
+def _match_trips(pings: List[Ping]) -> List[Optional[int]]:
+    """The trip each ping was taken on, from its driver's duty intervals (one query)."""
+    if not pings:
+        return []
+    lookback = DutyInterval.MAX_DURATION.total_seconds()
+    first = min(ping[1] for ping in pings)
+    last = max(ping[1] for ping in pings)
+    intervals = (
+        DutyInterval.objects.filter(
+            driver_id__in={ping[0] for ping in pings},
+            start__gte=datetime.fromtimestamp(first - lookback, tz=dt_timezone.utc),
+            start__lte=datetime.fromtimestamp(last, tz=dt_timezone.utc),
+        )
+        .order_by("driver_id", "start")
+        .values_list("driver_id", "start", "end", "trip_id")
+    )
+    by_driver: Dict[int, List[Tuple[float, float, int]]] = {}
+    for driver_id, start, end, trip_id in intervals:
+        by_driver.setdefault(driver_id, []).append((start.timestamp(), end.timestamp(), trip_id))
+
+    trips: List[Optional[int]] = []
+    for driver_id, recorded_at, *_rest in pings:
+        spans = by_driver.get(driver_id, ())
+        i = bisect_right(spans, (recorded_at, math.inf, 0)) - 1
+        trips.append(spans[i][2] if i >= 0 and recorded_at < spans[i][1] else None)
+    return trips
+
+
+def _progress(pings: List[Ping], trips: List[Optional[int]], plans: Dict[int, Any]):
+    """
+    TripProgress rows after the batch, and the alerts raised on the way. The
+    stored rows are locked until the transaction this runs in ends.
+    """
+    from .distance_matrix import great_circle_miles
+
+    trip_ids = {trip_id for trip_id in trips if trip_id}
+    if not trip_ids:
+        return [], []
+    # Locked in trip order, so workers with overlapping batches can't deadlock
+    stored = {
+        progress.trip_id: progress
+        for progress in TripProgress.objects.select_for_update().filter(trip_id__in=trip_ids).order_by("trip_id")
+    }
+
+    updated, alerts = {}, []
+    for ping, trip_id in zip(pings, trips):
+        plan = plans.get(trip_id) if trip_id else None
+        if plan is None:
+            continue
+        _driver_id, recorded_at, lon, lat, speed = ping
+        progress = updated.get(trip_id) or stored.get(trip_id)
+        if progress is None:
+            progress = TripProgress(trip_id=trip_id, longitude=lon, latitude=lat, driven_miles=Decimal(0))
+            hos_monitor.start(progress, plan, recorded_at, speed is not None and speed >= hos_monitor.MOVING_MPH)
+            last = recorded_at
+        else:
+            last = progress.recorded_at.timestamp()
+            if recorded_at <= last:
+                continue
+            moved = great_circle_miles((progress.longitude, progress.latitude), (lon, lat))
+            if moved >= MIN_MOVE_MILES and moved / (recorded_at - last) * 3600 <= MAX_PLAUSIBLE_MPH:
+                progress.driven_miles += Decimal(moved).quantize(Decimal("0.001"))
+                progress.longitude, progress.latitude = lon, lat
+            else:
+                moved = 0.0
+            if hos_monitor.is_moving(speed, moved, recorded_at - last):
+                duty_status = "driving"
+            elif progress.duty_status == "driving":
+                duty_status = "off_duty"
+            else:
+                duty_status = progress.duty_status
+            alerts += hos_monitor.advance(progress, plan, last, recorded_at, duty_status)
+        progress.recorded_at = datetime.fromtimestamp(recorded_at, tz=dt_timezone.utc)
+        planned_tenths, progress.segment_sequence = plan.planned(recorded_at)
+        progress.planned_miles = miles_decimal(planned_tenths)
+        progress.behind_seconds = round(plan.behind(recorded_at, int(progress.driven_miles * 10)))
+        alerts += hos_monitor.update_eta(progress, plan, recorded_at)
+        updated[trip_id] = progress
+    return list(updated.values()), alerts
+
+
+_PROGRESS_FIELDS = [
+    "recorded_at", "longitude", "latitude", "driven_miles", "planned_miles", "segment_sequence",
+    "behind_seconds", "estimated_arrival", "duty_status", "status_since", "driving_seconds",
+    "window_seconds", "since_break_seconds", "alerts_raised", "eta_drift_steps", "updated_at",
+]
+
+
+def _store_batch(pings: List[Ping], trips: List[Optional[int]], plans: Dict[int, Any]) -> list:
+    """Insert the pings and apply them to trip progress in one transaction; returns the alerts."""
+    with transaction.atomic():
+        progress, alerts = _progress(pings, trips, plans)
+        PositionPing.objects.bulk_create([
+            PositionPing(
+                driver_id=driver_id,
+                trip_id=trip_id,
+                recorded_at=datetime.fromtimestamp(recorded_at, tz=dt_timezone.utc),
+                longitude=lon,
+                latitude=lat,
+                speed_mph=speed,
+            )
+            for (driver_id, recorded_at, lon, lat, speed), trip_id in zip(pings, trips)
+        ], batch_size=2000)
+        TripProgress.objects.bulk_update([p for p in progress if p.pk is not None], _PROGRESS_FIELDS)
+        # Raises IntegrityError if another worker created one of these first
+        TripProgress.objects.bulk_create([p for p in progress if p.pk is None])
+        TripAlert.objects.bulk_create(alerts)
+    return alerts
+
+
+def ingest_pings(pings: List[Ping]) -> Dict[str, Any]:
+    """
+    Store a batch of checked pings and apply them to the latest-position store
+    and trip progress. Returns {"accepted", "unknown_drivers", "alerts"}.
+    """
+    if not pings:
+        return {"accepted": 0, "unknown_drivers": []}
+    known = set(User.objects.filter(pk__in={ping[0] for ping in pings}).values_list("pk", flat=True))
+    unknown = sorted({ping[0] for ping in pings} - known)
+    pings = sorted((ping for ping in pings if ping[0] in known), key=itemgetter(0, 1))
+    trips = _match_trips(pings)
+    plans = hos_monitor.load_plans({trip_id for trip_id in trips if trip_id})
+    try:
+        alerts = _store_batch(pings, trips, plans)
+    except IntegrityError:
+        # A concurrent batch started tracking one of the trips; its row can be locked now
+        alerts = _store_batch(pings, trips, plans)
+
+    # Pings are sorted by time, so the last one per driver is the newest
+    for i, ping in enumerate(pings):
+        if i + 1 == len(pings) or pings[i + 1][0] != ping[0]:
+            latest_positions.update(*ping, trips[i])
+    return {"accepted": len(pings), "unknown_drivers": unknown, "alerts": len(alerts)}
+
+
+def record_duty_status(driver_id: int, duty_status: str, at: datetime) -> Tuple[TripProgress, list]:
+    """
+    Apply a duty status change reported by the driver's ELD to the progress of
+    the trip they are on. A change stamped before the trip's latest ping takes
+    effect from that ping. Returns the progress and the alerts raised; raises
+    TrackingError if no tracked trip matches.
+    """
+    at = at.timestamp()
+    trip_id = _match_trips([(driver_id, at, 0.0, 0.0, None)])[0]
+    if trip_id is None:
+        raise TrackingError("Driver has no trip at that time")
+    plan = hos_monitor.load_plans([trip_id]).get(trip_id)
+    with transaction.atomic():
+        progress = TripProgress.objects.select_for_update().filter(trip_id=trip_id).first()
+        if progress is None or plan is None:
+            raise TrackingError("Trip has no positions yet")
+        last = progress.recorded_at.timestamp()
+        at = max(at, last)
+        alerts = hos_monitor.advance(progress, plan, last, at, duty_status)
+        progress.recorded_at = datetime.fromtimestamp(at, tz=dt_timezone.utc)
+        progress.save()
+        TripAlert.objects.bulk_create(alerts)
+    return progress, alerts
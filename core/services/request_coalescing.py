@@ -0,0 +1,142 @@
+import hashlib
+import json
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from core.models import TripPlanFlight
+from .hos_rules import DEFAULT_RULE_SET
+from .timezones import default_home_terminal_time_zone
+
+
+# How long a waiting worker trusts an unfinished claim before taking over.
+# Longer than the OpenRouteService directions timeout.
+FLIGHT_TIMEOUT = timedelta(seconds=20)
+# Finished claims older than this are cleared out by the next leader
+RETENTION = timedelta(minutes=10)
+POLL_INTERVAL = 0.05
+
+
+def trip_plan_key(trip_data: Dict[str, Any]) -> str:
+    """Hash of a validated TripCreateSerializer payload, stable across float formatting."""
+    def location(loc):
+        lon, lat = loc['coords']
+        return [str(loc.get('name', '')), round(float(lon), 6), round(float(lat), 6)]
+
+    cycle_used = trip_data.get('current_cycle_used') or 0
+    payload = {
+        'current_location': location(trip_data['current_location']),
+        'pickup_location': location(trip_data['pickup_location']),
+        'dropoff_location': location(trip_data['dropoff_location']),
+        'current_cycle_used': f"{Decimal(str(cycle_used)):.2f}",
+        'rule_set': trip_data.get('rule_set') or DEFAULT_RULE_SET,
+        'adverse_conditions': bool(trip_data.get('adverse_conditions', False)),
+        'home_terminal_time_zone': trip_data.get('home_terminal_time_zone') or default_home_terminal_time_zone(),
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def request_fingerprint(user_id: Optional[int], payload: Any) -> str:
+    """Hash of who sent a request and its JSON body, to tell a retry from a reused Idempotency-Key."""
+    encoded = json.dumps([user_id, payload], sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Runs `fn` once per key among threads calling `do` concurrently; the
+    others block and receive the same result (or exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+def shared_route(key: str, compute_distance: Callable[[], float]) -> Tuple[float, Any]:
+    """
+    Return (distance_miles, start_time) for a plan key, computing the distance
+    at most once among workers asking for it at the same time. Only a flight
+    that was still in progress when this call found it is shared; one that
+    had already finished is cleared, so a later request plans from its own
+    clock. Must be called outside a transaction so other workers can see the
+    claim.
+    """
+    deadline = time.monotonic() + FLIGHT_TIMEOUT.total_seconds()
+    # The in-progress flight this call is waiting on
+    awaited = None
+    while True:
+        now = timezone.now()
+        flight = TripPlanFlight.objects.filter(key=key).first()
+
+        if flight is not None:
+            if flight.completed_at and flight.pk == awaited:
+                return flight.distance_miles, flight.start_time
+            if flight.completed_at or flight.created_at < now - FLIGHT_TIMEOUT:
+                # Stale result or abandoned claim; clear it and race for a new one
+                TripPlanFlight.objects.filter(pk=flight.pk).delete()
+                flight = None
+
+        if flight is None:
+            try:
+                with transaction.atomic():
+                    flight = TripPlanFlight.objects.create(key=key)
+            except IntegrityError:
+                continue
+            return _lead_flight(flight, compute_distance)
+
+        if time.monotonic() > deadline:
+            return compute_distance(), timezone.now()
+        awaited = flight.pk
+        time.sleep(POLL_INTERVAL)
+
+
+def _lead_flight(flight: TripPlanFlight, compute_distance: Callable[[], float]) -> Tuple[float, Any]:
+    try:
+        distance_miles = compute_distance()
+    except BaseException:
+        flight.delete()
+        raise
+
+    flight.distance_miles = distance_miles
+    flight.start_time = flight.completed_at = timezone.now()
+    flight.save(update_fields=['distance_miles', 'start_time', 'completed_at'])
+    TripPlanFlight.objects.filter(created_at__lt=flight.completed_at - RETENTION).delete()
+    return flight.distance_miles, flight.start_time
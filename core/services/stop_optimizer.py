@@ -0,0 +1,126 @@
+"""
+Stop ordering for multi-stop trips.
+
+Stops are ordered by nearest neighbour from the truck's position and then
+improved with 2-opt over a distance matrix whose row/column 0 is the origin
+and 1..n are the stops. Routes are compared first by hours late against the
+stops' time windows, then by miles. Arrival times are estimated at the
+planner's average speed with a rest each time a stretch's driving limit is
+reached; the HOS planner then produces the real schedule for the chosen order.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .hos_calculator import HOSCalculator
+from .hos_rules import DEFAULT_RULE_SET, CompiledRuleSet, compile_rule_set
+
+
+@dataclass
+class StopOrder:
+    # Indices into the stops list, in visiting order
+    order: List[int]
+    miles: float
+    lateness_hours: float
+
+    @property
+    def cost(self) -> Tuple[float, float]:
+        return (round(self.lateness_hours, 6), round(self.miles, 6))
+
+
+def _hours_after(start_time: datetime, value: Optional[datetime]) -> Optional[float]:
+    return None if value is None else (value - start_time).total_seconds() / 3600
+
+
+class _RouteEvaluator:
+    def __init__(self, matrix, stops, start_time, rules: CompiledRuleSet):
+        self.matrix = matrix
+        self.windows = [
+            (_hours_after(start_time, stop.get("window_start")), _hours_after(start_time, stop.get("window_end")))
+            for stop in stops
+        ]
+        self.speed = HOSCalculator.DEFAULT_AVG_SPEED
+        self.service = HOSCalculator.PICKUP_DROPOFF_DURATION
+        self.max_driving = rules.max_driving
+        self.rest_hours = rules.rest.duration
+
+    def __call__(self, order: Sequence[int]) -> StopOrder:
+        matrix, windows = self.matrix, self.windows
+        clock = driving = miles = lateness = 0.0
+        previous = 0
+        for stop in order:
+            leg = matrix[previous][stop + 1]
+            miles += leg
+            hours = leg / self.speed
+            while driving + hours > self.max_driving:
+                stretch = self.max_driving - driving
+                clock += stretch + self.rest_hours
+                hours -= stretch
+                driving = 0.0
+            clock += hours
+            driving += hours
+
+            window_start, window_end = windows[stop]
+            if window_start is not None and clock < window_start:
+                if window_start - clock >= self.rest_hours:
+                    driving = 0.0
+                clock = window_start
+            if window_end is not None and clock > window_end:
+                lateness += clock - window_end
+            clock += self.service
+            previous = stop + 1
+        return StopOrder(list(order), miles, lateness)
+
+
+def _nearest_neighbour(evaluate: _RouteEvaluator, count: int) -> List[int]:
+    order: List[int] = []
+    remaining = set(range(count))
+    previous = 0
+    while remaining:
+        # Prefer stops that can still be reached in their window, then the closest
+        def rank(stop):
+            return (evaluate(order + [stop]).lateness_hours > 0, evaluate.matrix[previous][stop + 1], stop)
+        stop = min(remaining, key=rank)
+        order.append(stop)
+        remaining.remove(stop)
+        previous = stop + 1
+    return order
+
+
+def _two_opt(evaluate: _RouteEvaluator, order: List[int]) -> StopOrder:
+    best = evaluate(order)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(len(order) - 1):
+            for j in range(i + 1, len(order)):
+                candidate = evaluate(best.order[:i] + best.order[i:j + 1][::-1] + best.order[j + 1:])
+                if candidate.cost < best.cost:
+                    best = candidate
+                    improved = True
+    return best
+
+
+def optimize_stop_order(
+    matrix: Sequence[Sequence[float]],
+    stops: Sequence[Dict[str, Any]],
+    start_time: datetime,
+    rules: Optional[CompiledRuleSet] = None,
+) -> StopOrder:
+    """
+    Order `stops` (dicts with optional `window_start`/`window_end`) to cut
+    miles and lateness. `matrix` has the origin at index 0.
+    """
+    evaluate = _RouteEvaluator(matrix, stops, start_time, rules or compile_rule_set(DEFAULT_RULE_SET))
+    return _two_opt(evaluate, _nearest_neighbour(evaluate, len(stops)))
+
+
+def evaluate_stop_order(
+    matrix: Sequence[Sequence[float]],
+    stops: Sequence[Dict[str, Any]],
+    start_time: datetime,
+    rules: Optional[CompiledRuleSet] = None,
+) -> StopOrder:
+    """Miles and lateness of visiting `stops` in the order given."""
+    evaluate = _RouteEvaluator(matrix, stops, start_time, rules or compile_rule_set(DEFAULT_RULE_SET))
+    return evaluate(range(len(stops)))
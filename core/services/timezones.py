@@ -0,0 +1,187 @@
+"""
+Offline lookup of the IANA time zone at a (lon, lat) coordinate.
+
+Zone boundaries come from a GeoJSON file of polygons with a `tzid`
+property, compiled by `build_index` into a grid of square cells. Cells that
+lie entirely inside one zone map straight to its name, so most lookups are
+a dict read; only cells a boundary crosses keep a list of candidate
+polygons to test with point-in-polygon.
+
+The bundled index (core/data/timezone_index.json) is built from coarse
+lower-48 boundaries in core/data/timezones_us.geojson. Rebuild it from an
+accurate source (e.g. timezone-boundary-builder) with
+`python manage.py build_timezone_index <geojson>`.
+"""
+import json
+import math
+import os
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.conf import settings
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+DEFAULT_INDEX_PATH = os.path.join(DATA_DIR, "timezone_index.json")
+DEFAULT_CELL_SIZE = 0.5
+
+Ring = List[Tuple[float, float]]
+
+
+def is_valid_time_zone(name: str) -> bool:
+    try:
+        ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return False
+    return True
+
+
+def default_home_terminal_time_zone() -> str:
+    return getattr(settings, "HOME_TERMINAL_TIME_ZONE", "UTC")
+
+
+def _point_in_ring(x: float, y: float, ring: Sequence[Sequence[float]]) -> bool:
+    inside = False
+    x1, y1 = ring[-1]
+    for x2, y2 in ring:
+        if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+        x1, y1 = x2, y2
+    return inside
+
+
+def _point_in_polygon(x: float, y: float, polygon: Sequence[Sequence[Sequence[float]]]) -> bool:
+    # First ring is the outline, the rest are holes
+    return _point_in_ring(x, y, polygon[0]) and not any(_point_in_ring(x, y, hole) for hole in polygon[1:])
+
+
+def _segments_cross_box(ring, x0, y0, x1, y1) -> bool:
+    """Whether any edge of `ring` passes through the box (x0, y0)-(x1, y1)."""
+    px, py = ring[-1]
+    for qx, qy in ring:
+        if max(px, qx) >= x0 and min(px, qx) <= x1 and max(py, qy) >= y0 and min(py, qy) <= y1:
+            # Clip the edge to the box (Liang-Barsky)
+            t0, t1 = 0.0, 1.0
+            dx, dy = qx - px, qy - py
+            for p, q in ((-dx, px - x0), (dx, x1 - px), (-dy, py - y0), (dy, y1 - py)):
+                if p == 0:
+                    if q < 0:
+                        break
+                    continue
+                t = q / p
+                if p < 0:
+                    t0 = max(t0, t)
+                else:
+                    t1 = min(t1, t)
+                if t0 > t1:
+                    break
+            else:
+                return True
+        px, py = qx, qy
+    return False
+
+
+def _polygons(geometry: Dict[str, Any]) -> List[List[Ring]]:
+    if geometry["type"] == "Polygon":
+        return [geometry["coordinates"]]
+    if geometry["type"] == "MultiPolygon":
+        return list(geometry["coordinates"])
+    return []
+
+
+def build_index(features: Iterable[Dict[str, Any]], cell_size: float = DEFAULT_CELL_SIZE) -> Dict[str, Any]:
+    """
+    Compile GeoJSON features with a `tzid` property into a lookup index.
+
+    Cells are keyed "x,y" (floor of lon/lat over `cell_size`). A cell's
+    value is a zone name when one polygon covers it completely, or a list of
+    indices into `polygons` when edges cross it. Cells outside every
+    polygon are left out.
+    """
+    zones: List[str] = []
+    polygons: List[List[Ring]] = []
+    for feature in features:
+        tzid = feature["properties"]["tzid"]
+        for polygon in _polygons(feature["geometry"]):
+            zones.append(tzid)
+            polygons.append([[(float(x), float(y)) for x, y in ring] for ring in polygon])
+
+    cells: Dict[str, Any] = {}
+    eps = cell_size * 1e-9
+    for index, polygon in enumerate(polygons):
+        xs = [x for x, _ in polygon[0]]
+        ys = [y for _, y in polygon[0]]
+        for cx in range(math.floor(min(xs) / cell_size), math.floor(max(xs) / cell_size) + 1):
+            for cy in range(math.floor(min(ys) / cell_size), math.floor(max(ys) / cell_size) + 1):
+                x0, y0 = cx * cell_size, cy * cell_size
+                x1, y1 = x0 + cell_size, y0 + cell_size
+                key = f"{cx},{cy}"
+                # Edges that only run along the cell's border don't split it
+                if any(_segments_cross_box(ring, x0 + eps, y0 + eps, x1 - eps, y1 - eps) for ring in polygon):
+                    candidates = cells.get(key)
+                    if not isinstance(candidates, list):
+                        # A whole-cell zone from an overlapping polygon still
+                        # needs testing once this cell is split
+                        candidates = cells[key] = [] if candidates is None else [candidates]
+                    candidates.append(index)
+                elif _point_in_polygon((x0 + x1) / 2, (y0 + y1) / 2, polygon):
+                    existing = cells.get(key)
+                    if existing is None:
+                        cells[key] = index
+                    elif isinstance(existing, list):
+                        existing.append(index)
+
+    # Whole cells are stored by zone name; polygon indices were only needed
+    # while candidate lists could still absorb them
+    for key, value in cells.items():
+        if isinstance(value, int):
+            cells[key] = zones[value]
+    return {
+        "cell_size": cell_size,
+        "zones": zones,
+        "polygons": polygons,
+        "cells": cells,
+    }
+
+
+class TimeZoneIndex:
+    def __init__(self, data: Dict[str, Any]):
+        self.cell_size = data["cell_size"]
+        self.zones = data["zones"]
+        self.polygons = data["polygons"]
+        self.cells = data["cells"]
+
+    def lookup(self, longitude: float, latitude: float) -> Optional[str]:
+        key = f"{math.floor(longitude / self.cell_size)},{math.floor(latitude / self.cell_size)}"
+        cell = self.cells.get(key)
+        if cell is None or isinstance(cell, str):
+            return cell
+        for index in cell:
+            if _point_in_polygon(longitude, latitude, self.polygons[index]):
+                return self.zones[index]
+        return None
+
+
+@lru_cache(maxsize=None)
+def load_index(path: str = DEFAULT_INDEX_PATH) -> TimeZoneIndex:
+    with open(path) as f:
+        return TimeZoneIndex(json.load(f))
+
+
+def timezone_at(longitude: float, latitude: float) -> Optional[str]:
+    """IANA zone name at (longitude, latitude), or None outside the index."""
+    path = getattr(settings, "TIMEZONE_INDEX_PATH", DEFAULT_INDEX_PATH)
+    return load_index(path).lookup(float(longitude), float(latitude))
+
+
+def local_isoformat(value, time_zone: str) -> Optional[str]:
+    """ISO 8601 `value` on the clock of `time_zone`, or None without a zone."""
+    if value is None or not time_zone:
+        return None
+    return value.astimezone(ZoneInfo(time_zone)).isoformat()
+
+
+def timezone_at_or_default(coords: Sequence[float], default: str) -> str:
+    """Zone at [lon, lat] `coords`, falling back to `default`."""
+    return timezone_at(coords[0], coords[1]) or default
@@ -0,0 +1,122 @@
+"""
+Read-through cache for rendered trip responses.
+
+Each trip has a generation number in the cache. Writes to a trip or its
+segments, logs or stops bump it once the transaction commits, and a cached
+response is only served while its generation is current. A reader that
+rendered an old version can therefore never overwrite a newer one.
+
+Entries also go stale after TRIP_CACHE_TIMEOUT seconds. The first reader to
+see a stale entry takes a short lock and re-renders it, while the others
+keep serving the stale copy. Readers that find no entry at all wait briefly
+for the lock holder instead of all hitting the database at once.
+"""
+import threading
+import time
+from functools import partial
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+
+# How long a re-render may hold the lock before another reader takes over
+LOCK_TIMEOUT = 10
+# How long readers wait for another reader to fill a missing entry
+LOCK_WAIT = 2.0
+POLL_INTERVAL = 0.02
+
+_pending = threading.local()
+
+
+def _cache():
+    return caches[getattr(settings, "TRIP_CACHE", "default")]
+
+
+def _timeout():
+    return getattr(settings, "TRIP_CACHE_TIMEOUT", 300)
+
+
+def _entry_key(trip_id):
+    return f"trip-response:{trip_id}"
+
+
+def _generation_key(trip_id):
+    return f"trip-response-gen:{trip_id}"
+
+
+def _lock_key(trip_id):
+    return f"trip-response-lock:{trip_id}"
+
+
+def _current_generation(cache, trip_id, values):
+    generation = values.get(_generation_key(trip_id))
+    if generation is None:
+        cache.add(_generation_key(trip_id), time.time_ns(), None)
+        generation = cache.get(_generation_key(trip_id))
+    return generation
+
+
+def get_trip_json(trip_id: int, render: Callable[[], Optional[bytes]]) -> Optional[bytes]:
+    """
+    The cached response for `trip_id`, calling `render` on a miss. `render`
+    returns None for a missing trip, which isn't cached.
+    """
+    cache = _cache()
+    entry_key, lock_key = _entry_key(trip_id), _lock_key(trip_id)
+    deadline = time.monotonic() + LOCK_WAIT
+
+    while True:
+        values = cache.get_many([entry_key, _generation_key(trip_id)])
+        generation = _current_generation(cache, trip_id, values)
+        entry = values.get(entry_key)
+        current = entry is not None and entry[0] == generation
+
+        if current and entry[1] > time.time():
+            return entry[2]
+        if cache.add(lock_key, True, LOCK_TIMEOUT):
+            try:
+                body = render()
+                if body is not None:
+                    cache.set(entry_key, (generation, time.time() + _timeout(), body), _timeout() * 2)
+                return body
+            finally:
+                cache.delete(lock_key)
+        if current:
+            # Someone else is re-rendering; the stale copy is still this generation
+            return entry[2]
+        if time.monotonic() > deadline:
+            return render()
+        time.sleep(POLL_INTERVAL)
+
+
+def _bump(trip_ids):
+    cache = _cache()
+    now = time.time_ns()
+    cache.set_many({_generation_key(trip_id): now for trip_id in trip_ids}, None)
+    cache.delete_many([_entry_key(trip_id) for trip_id in trip_ids])
+
+
+def _flush(using):
+    trip_ids = _pending.__dict__.pop(using, None)
+    if trip_ids:
+        _bump(trip_ids)
+
+
+def invalidate_trip(trip_id: int, using: str = DEFAULT_DB_ALIAS):
+    """
+    Drop the cached response for `trip_id` once the current transaction
+    commits (or right away outside one). Repeated calls in a transaction
+    collapse into one cache write per trip.
+    """
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        _bump([trip_id])
+        return
+
+    # Every call schedules a flush and the first to run writes the whole set.
+    # A rolled-back transaction drops its flushes unrun; its trip ids stay
+    # pending until the next commit, which only costs those trips a re-render.
+    _pending.__dict__.setdefault(using, set()).add(trip_id)
+    transaction.on_commit(partial(_flush, using), using=using)
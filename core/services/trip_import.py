@@ -0,0 +1,231 @@
+"""
+Bulk import of historical trips (see `manage.py import_trips`).
+
+Rows are read lazily from CSV or JSON Lines and handed to worker processes
+in chunks. `import_chunk` validates and plans a chunk (`plan_chunk`), then
+stores it in one transaction with one bulk insert per table
+(`write_chunk`). Every trip gets an idempotency key built from the import
+source and the row's `external_id` (or row number), so re-running an
+import skips rows that were already written.
+"""
+import contextlib
+import csv
+import json
+import os
+from itertools import chain
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from core.models import DailyLog, DutyInterval, LogEntry, Trip, TripSegment
+from .distance_matrix import cached_route_miles
+from .fixed_point import hours_decimal
+from .driver_timeline import build_intervals
+from .fleet_rollups import apply_rollup_delta, log_totals
+from .hos_calculator import HOSCalculator
+from .trip_persistence import build_daily_log, build_log_entry, build_segment, trip_calculator_data
+from . import locations, openroute_quota
+
+
+LOCATION_FIELDS = ("current_location", "pickup_location", "dropoff_location")
+# CSV spells each location as <prefix>_name, <prefix>_lon, <prefix>_lat
+CSV_LOCATION_PREFIXES = {"current_location": "current", "pickup_location": "pickup", "dropoff_location": "dropoff"}
+BULK_BATCH_SIZE = 2000
+
+Row = Tuple[int, Any]
+
+
+def _csv_payload(row: Dict[str, str]) -> Dict[str, Any]:
+    location_columns = {
+        f"{prefix}_{part}" for prefix in CSV_LOCATION_PREFIXES.values() for part in ("name", "lon", "lat")
+    }
+    payload = {key: value for key, value in row.items() if value not in ("", None) and key not in location_columns}
+    for field, prefix in CSV_LOCATION_PREFIXES.items():
+        name, lon, lat = (row.get(f"{prefix}_{part}") for part in ("name", "lon", "lat"))
+        if name or lon or lat:
+            payload[field] = {"name": name or "", "coords": [lon, lat]}
+    return payload
+
+
+def read_rows(path: str, fmt: Optional[str] = None) -> Iterator[Row]:
+    """
+    (row number, payload) for each trip in a CSV or JSON Lines file. A JSON
+    line that doesn't parse is passed on as its raw text, to be reported as
+    an invalid row.
+    """
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "jsonl")
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            for number, row in enumerate(csv.DictReader(f), start=1):
+                yield number, _csv_payload(row)
+            return
+        for number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield number, json.loads(line)
+            except ValueError:
+                yield number, line
+
+
+def import_key(source: str, row_id: Any) -> str:
+    return f"import:{source[:40]}:{row_id}"
+
+
+def route_miles(coordinates: Sequence[Tuple[float, float]], offline: bool) -> float:
+    """Trip miles from OpenRouteService, or (offline, or if routing fails) from cached and estimated legs."""
+    if not offline:
+        from .distance_calculator import DistanceCalculation
+
+        miles = DistanceCalculation().calculate_openroute_distance(coordinates, priority=openroute_quota.BATCH)
+        if miles:
+            return float(miles)
+    return cached_route_miles(coordinates)[0]
+
+
+def init_worker():
+    # Workers started with `spawn` import Django from scratch; forked ones
+    # already have it. Either way each opens its own database connection.
+    import django
+    django.setup()
+
+
+def plan_chunk(rows: List[Row], source: str, offline: bool) -> List[Dict[str, Any]]:
+    """
+    Validate and plan a chunk of rows. Each row yields either {"row", "errors"}
+    or {"row", "key", "driver_id", "miles", "trip_data", "coordinates", "result"}.
+    """
+    from core.serializers import TripImportRowSerializer
+
+    planned = []
+    # One instance for the chunk, like a `many=True` child, so DRF builds the
+    # fields once rather than per row
+    validator = TripImportRowSerializer()
+    # HOSCalculator prints debug lines for every trip
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for number, payload in rows:
+            if not isinstance(payload, dict):
+                planned.append({"row": number, "errors": {"non_field_errors": ["Row is not a JSON object"]}})
+                continue
+            try:
+                data = validator.run_validation(payload)
+            except ValidationError as e:
+                planned.append({"row": number, "errors": json.loads(json.dumps(e.detail))})
+                continue
+
+            coordinates = [tuple(data[field]["coords"]) for field in LOCATION_FIELDS]
+            miles = data.get("distance_miles") or route_miles(coordinates, offline)
+            if miles <= 0:
+                planned.append({"row": number, "errors": {"distance_miles": ["Route distance is zero"]}})
+                continue
+
+            trip_data = trip_calculator_data(data)
+            result = HOSCalculator({
+                **trip_data,
+                "start_time": data.get("start_time") or timezone.now(),
+                "trip_miles": float(miles),
+            }).calculate()
+            planned.append({
+                "row": number,
+                "key": import_key(source, data.get("external_id") or number),
+                "driver_id": data.get("driver_id"),
+                "miles": float(miles),
+                "trip_data": trip_data,
+                "coordinates": {trip_data[field]: data[field]["coords"] for field in LOCATION_FIELDS},
+                "result": result,
+            })
+    return planned
+
+
+def _build_trip(plan: Dict[str, Any], location_ids: Dict[str, int]) -> Trip:
+    trip_data, summary = plan["trip_data"], plan["result"]["summary"]
+    return Trip(
+        user_id=plan["driver_id"],
+        current_location_id=location_ids[trip_data["current_location"]],
+        pickup_location_id=location_ids[trip_data["pickup_location"]],
+        dropoff_location_id=location_ids[trip_data["dropoff_location"]],
+        current_cycle_used=trip_data["current_cycle_used"],
+        rule_set=trip_data["rule_set"],
+        adverse_conditions=trip_data["adverse_conditions"],
+        home_terminal_time_zone=trip_data["home_time_zone"],
+        total_distance=plan["miles"],
+        total_duration=hours_decimal(summary["driving_seconds"]),
+        fuel_stops=summary["fuel_stops"],
+        required_rest_stops=summary["required_rest_stops"],
+        idempotency_key=plan["key"],
+    )
+
+
+def write_chunk(planned: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Store a planned chunk in one transaction and return {"imported",
+    "skipped", "failures"}. Rows whose key is already stored are skipped.
+    """
+    failures = [plan for plan in planned if "errors" in plan]
+    plans = [plan for plan in planned if "errors" not in plan]
+
+    with transaction.atomic():
+        seen = set(
+            Trip.objects.filter(idempotency_key__in=[plan["key"] for plan in plans])
+            .values_list("idempotency_key", flat=True)
+        )
+        driver_ids = {plan["driver_id"] for plan in plans if plan["driver_id"]}
+        drivers = set(User.objects.filter(pk__in=driver_ids).values_list("pk", flat=True)) if driver_ids else set()
+
+        new, skipped = [], 0
+        for plan in plans:
+            if plan["key"] in seen:
+                skipped += 1
+            elif plan["driver_id"] and plan["driver_id"] not in drivers:
+                failures.append({"row": plan["row"], "errors": {"driver_id": [f"Unknown driver {plan['driver_id']}"]}})
+            else:
+                seen.add(plan["key"])
+                new.append(plan)
+
+        # Every place name in the chunk in one lookup
+        names, coordinates = set(), {}
+        for plan in new:
+            coordinates.update(plan["coordinates"])
+            names.update(locations.plan_location_names(plan["result"]["segments"], plan["result"]["daily_logs"]))
+        location_ids = locations.intern(names | coordinates.keys(), coordinates)
+
+        trips = Trip.objects.bulk_create(
+            [_build_trip(plan, location_ids) for plan in new], batch_size=BULK_BATCH_SIZE
+        )
+        pairs = list(zip(trips, new))
+        TripSegment.objects.bulk_create(
+            [build_segment(trip, segment, location_ids) for trip, plan in pairs for segment in plan["result"]["segments"]],
+            batch_size=BULK_BATCH_SIZE,
+        )
+        logs = [
+            (build_daily_log(trip, log), log["entries"])
+            for trip, plan in pairs for log in plan["result"]["daily_logs"]
+        ]
+        DailyLog.objects.bulk_create([log for log, _ in logs], batch_size=BULK_BATCH_SIZE)
+        LogEntry.objects.bulk_create(
+            [build_log_entry(log, entry, location_ids) for log, entries in logs for entry in entries],
+            batch_size=BULK_BATCH_SIZE,
+        )
+        DutyInterval.objects.bulk_create(
+            list(chain.from_iterable(build_intervals(trip, plan["result"]["segments"], location_ids) for trip, plan in pairs)),
+            batch_size=BULK_BATCH_SIZE,
+        )
+
+        by_driver = {}
+        for plan in new:
+            by_driver.setdefault(plan["driver_id"], []).extend(plan["result"]["daily_logs"])
+        # Same lock order in every worker writing rollups concurrently
+        for driver_id in sorted(by_driver, key=lambda pk: pk or 0):
+            apply_rollup_delta(driver_id, {}, log_totals(by_driver[driver_id]))
+
+    return {"imported": len(new), "skipped": skipped, "failures": sorted(failures, key=lambda f: f["row"])}
+
+
+def import_chunk(rows: List[Row], source: str, offline: bool) -> Dict[str, Any]:
+    """Plan and store a chunk; `write_chunk`'s counts plus the number of rows read."""
+    planned = plan_chunk(rows, source, offline)
+    return {**write_chunk(planned), "rows": len(planned)}
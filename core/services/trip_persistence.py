@@ -0,0 +1,138 @@
+"""
+Storing planned trips.
+
+`trip_calculator_data` turns a validated trip payload into HOSCalculator
+input, and `save_trip_results` / `save_replan_results` write a plan's
+segments, daily logs, log entries and duty intervals for a trip. The
+`build_*` helpers make the unsaved rows, so bulk writers such as
+trip_import can insert them their own way.
+"""
+from core.models import DailyLog, LogEntry, Trip, TripSegment
+from . import locations
+from .driver_timeline import sync_trip_intervals
+from .fixed_point import hours_decimal, miles_decimal
+from .fleet_rollups import apply_rollup_delta, log_totals, stored_log_totals
+from .hos_rules import DEFAULT_RULE_SET
+from .timezones import default_home_terminal_time_zone, timezone_at_or_default
+from .trip_cache import invalidate_trip
+
+
+def trip_calculator_data(trip_data):
+    """HOSCalculator input (everything but miles and start time) for a validated TripCreateSerializer payload"""
+    current_loc = trip_data['current_location']
+    pickup_loc = trip_data['pickup_location']
+    dropoff_loc = trip_data['dropoff_location']
+    cycle_used = trip_data.get('current_cycle_used', 0)
+    home_time_zone = trip_data.get('home_terminal_time_zone') or default_home_terminal_time_zone()
+    return {
+        'rule_set': trip_data.get('rule_set', DEFAULT_RULE_SET),
+        'adverse_conditions': trip_data.get('adverse_conditions', False),
+        'home_time_zone': home_time_zone,
+        'pickup_time_zone': timezone_at_or_default(pickup_loc['coords'], home_time_zone),
+        'dropoff_time_zone': timezone_at_or_default(dropoff_loc['coords'], home_time_zone),
+        'current_cycle_used': float(cycle_used) if cycle_used is not None else 0.0,
+        'current_location': str(current_loc.get('name', '')),
+        'pickup_location': str(pickup_loc.get('name', '')),
+        'dropoff_location': str(dropoff_loc.get('name', ''))
+    }
+
+
+def save_trip_results(trip: Trip, result: dict):
+    summary = result['summary']
+    trip.total_duration = hours_decimal(summary['driving_seconds'])
+    trip.fuel_stops = summary['fuel_stops']
+    trip.required_rest_stops = summary['required_rest_stops']
+    trip.save()
+    
+    # One lookup for every place name in the plan, usually served from the cache
+    location_ids = locations.intern(locations.plan_location_names(result['segments'], result['daily_logs']))
+    _save_segments(trip, result['segments'], location_ids)
+    _save_daily_logs(trip, result['daily_logs'], location_ids)
+    apply_rollup_delta(trip.user_id, {}, log_totals(result['daily_logs']))
+    
+    sync_trip_intervals(trip, result['segments'], location_ids)
+    invalidate_trip(trip.pk)
+
+
+def build_segment(trip: Trip, segment_data: dict, location_ids: dict) -> TripSegment:
+    return TripSegment(
+        trip=trip,
+        segment_type=segment_data['segment_type'],
+        sequence_number=segment_data['sequence_number'],
+        start_time=segment_data['start_time'],
+        end_time=segment_data['end_time'],
+        duration_hours=hours_decimal(segment_data['duration_seconds']),
+        distance_miles=miles_decimal(segment_data.get('distance_tenths', 0)),
+        location_id=location_ids[segment_data['location']],
+        time_zone=segment_data.get('time_zone', '')
+    )
+
+
+def build_daily_log(trip: Trip, log_data: dict) -> DailyLog:
+    return DailyLog(
+        trip=trip,
+        log_date=log_data['log_date'],
+        day_number=log_data['day_number'],
+        total_miles=miles_decimal(log_data['distance_tenths']),
+        off_duty_hours=hours_decimal(log_data['off_duty_seconds']),
+        sleeper_berth_hours=hours_decimal(log_data['sleeper_berth_seconds']),
+        driving_hours=hours_decimal(log_data['driving_seconds']),
+        on_duty_hours=hours_decimal(log_data['on_duty_seconds']),
+        fuel_stops=log_data.get('fuel_stops', 0)
+    )
+
+
+def build_log_entry(daily_log: DailyLog, entry_data: dict, location_ids: dict) -> LogEntry:
+    return LogEntry(
+        daily_log=daily_log,
+        duty_status=entry_data['duty_status'],
+        start_hour=hours_decimal(entry_data['start_second']),
+        end_hour=hours_decimal(entry_data['end_second']),
+        location_id=location_ids[entry_data['location']]
+    )
+
+
+def _save_segments(trip: Trip, segments: list, location_ids: dict):
+    for segment_data in segments:
+        build_segment(trip, segment_data, location_ids).save(force_insert=True)
+
+
+def _save_daily_logs(trip: Trip, daily_logs: list, location_ids: dict):
+    for log_data in daily_logs:
+        entries_data = log_data.pop('entries', [])
+        
+        daily_log = build_daily_log(trip, log_data)
+        daily_log.save(force_insert=True)
+        
+        for entry_data in entries_data:
+            build_log_entry(daily_log, entry_data, location_ids).save(force_insert=True)
+
+
+def save_replan_results(trip: Trip, checkpoint: dict, result: dict):
+    """Rewrite only the segments and daily logs from the checkpoint onwards."""
+    TripSegment.objects.filter(trip=trip, sequence_number__gte=checkpoint['sequence']).delete()
+    truncated = checkpoint['truncated']
+    if truncated:
+        TripSegment.objects.filter(trip=trip, sequence_number=truncated['sequence_number']).update(
+            end_time=truncated['end_time'],
+            duration_hours=hours_decimal(truncated['duration_seconds']),
+            distance_miles=miles_decimal(truncated['distance_tenths'])
+        )
+    location_ids = locations.intern(locations.plan_location_names(result['segments'], result['daily_logs']))
+    _save_segments(trip, result['segments'], location_ids)
+    
+    replaced_days = stored_log_totals(trip.pk, checkpoint['first_day_number'])
+    DailyLog.objects.filter(trip=trip, day_number__gte=checkpoint['first_day_number']).delete()
+    _save_daily_logs(trip, result['daily_logs'], location_ids)
+    apply_rollup_delta(trip.user_id, replaced_days, log_totals(result['daily_logs']))
+    
+    segments = checkpoint['kept_segments'] + result['segments']
+    trip.total_distance = miles_decimal(checkpoint['distance_tenths'] + result['summary']['distance_tenths'])
+    trip.total_duration = hours_decimal(sum(s['duration_seconds'] for s in segments if s['segment_type'] == 'driving'))
+    trip.fuel_stops = len([s for s in segments if s['segment_type'] == 'fuel'])
+    trip.required_rest_stops = len([s for s in segments if s['segment_type'] == 'sleeper_berth'])
+    trip.save()
+    
+    sync_trip_intervals(trip, result['segments'], location_ids, since=checkpoint['current_time'])
+    # Segments were bulk-deleted and updated above, which sends no signals
+    invalidate_trip(trip.pk)
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Any, Dict
+from zoneinfo import ZoneInfo
+
+from django.db.models import Max
+
+from core.models import DailyLog, Trip
+from .fixed_point import ONE_SECOND
+from .hos_calculator import HOSCalculator
+from .hos_rules import compile_rule_set
+
+
+class ReplanError(ValueError):
+    pass
+
+
+_SEGMENT_COLUMNS = (
+    "segment_type", "sequence_number", "start_time", "end_time",
+    "distance_miles", "location__name", "time_zone",
+)
+
+
+def build_checkpoint(trip: Trip, at: datetime) -> Dict[str, Any]:
+    """
+    Split a trip's persisted segments at `at` and rebuild the planner state.
+
+    Segments that ended before `at` are kept as driven; a segment in progress
+    at `at` is cut short there (pro-rating its miles), at the nearest whole
+    second. Everything after is dropped, to be re-planned from the checkpoint.
+    """
+    if trip.stops.exists():
+        raise ReplanError("Multi-stop trips cannot be re-planned yet")
+
+    at = at.astimezone(dt_timezone.utc)
+    kept, truncated = [], None
+    for row in trip.segments.order_by("sequence_number").values(*_SEGMENT_COLUMNS):
+        # Back to planner units; the span is exact where the stored hours are rounded
+        miles = row.pop("distance_miles") or 0
+        row["location"] = row.pop("location__name")
+        segment = {
+            **row,
+            "duration_seconds": round((row["end_time"] - row["start_time"]) / ONE_SECOND),
+            "distance_tenths": int(miles * 10),
+        }
+        if segment["end_time"] <= at:
+            kept.append(segment)
+        elif segment["start_time"] < at:
+            seconds = round((at - segment["start_time"]) / ONE_SECOND)
+            at = segment["start_time"] + timedelta(seconds=seconds)
+            segment["end_time"] = at
+            segment["distance_tenths"] = round(segment["distance_tenths"] * seconds / segment["duration_seconds"])
+            segment["duration_seconds"] = seconds
+            kept.append(segment)
+            truncated = segment
+            break
+        else:
+            break
+
+    if not kept or kept[0]["segment_type"] != "pickup" or (kept[0] is truncated):
+        raise ReplanError("Trip has not left its pickup yet; create a new trip instead")
+    if kept[-1]["segment_type"] == "dropoff":
+        raise ReplanError("Trip is already complete")
+
+    # Log days are on the home terminal's clock
+    home_tz = ZoneInfo(trip.home_terminal_time_zone)
+    checkpoint_day = at.astimezone(home_tz).date()
+    last_day = (
+        DailyLog.objects.filter(trip=trip, log_date__lt=checkpoint_day)
+        .aggregate(last=Max("day_number"))["last"]
+    )
+
+    return {
+        **HOSCalculator.checkpoint_state(kept, compile_rule_set(trip.rule_set, trip.adverse_conditions)),
+        "current_time": at,
+        "sequence": kept[-1]["sequence_number"] + 1,
+        "kept_segments": kept,
+        "truncated": truncated,
+        # Segments already driven on the checkpoint's day, whose log is rebuilt,
+        # including one carried over from the day before
+        "day_segments": [s for s in kept if s["end_time"].astimezone(home_tz).date() >= checkpoint_day],
+        "first_day_number": (last_day or 0) + 1,
+        "first_log_date": checkpoint_day,
+    }
@@ -0,0 +1,134 @@
+"""
+What-if plan totals for a single pickup-to-dropoff route.
+
+From any point on, the rest of a plan depends only on the planner's state
+there: distance left, the driving / window / since-break counters, distance
+since fuel. It doesn't depend on the clock. So
+`plan_totals` memoizes each state's remaining totals, per rule set, and any
+scenario or lane that reaches a state already planned reuses that suffix
+instead of stepping through it again. Like `transit_summary`, only totals
+are kept: no segments or daily logs are built.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, NamedTuple, Tuple
+
+from .fixed_point import SECONDS_PER_HOUR, hours_float, to_seconds, to_units
+from .hos_calculator import HOSCalculator
+from .hos_rules import CompiledRuleSet, compile_rule_set
+
+# (units remaining, driving, window, since break, units since fuel)
+State = Tuple[int, int, int, int, int]
+
+# Memoized states per rule set; the table is cleared when it grows past this
+MAX_STATES = 50000
+
+
+class PlanTotals(NamedTuple):
+    trip_seconds: int
+    driving_seconds: int
+    # On duty, not driving: fuel, pickup and dropoff stops
+    on_duty_seconds: int
+    fuel_stops: int
+    rest_stops: int
+
+
+# (rule set, adverse conditions) -> {state: totals from that state to the end of the dropoff}
+_suffixes: Dict[Tuple[str, bool], Dict[State, PlanTotals]] = {}
+
+
+def clear():
+    _suffixes.clear()
+
+
+def plan_totals(rules: CompiledRuleSet, state: State) -> PlanTotals:
+    """
+    Totals for driving on from `state` to the dropoff, the dropoff included,
+    taking HOSCalculator's planning steps (`HOSCalculator.next_step`).
+    """
+    memo = _suffixes.setdefault((rules.rule_set.name, rules.adverse_conditions), {})
+    if len(memo) > MAX_STATES:
+        memo.clear()
+
+    next_step = HOSCalculator.next_step
+    stop_seconds = HOSCalculator.STOP_SECONDS
+
+    # Steps taken from states not planned before, each as a PlanTotals delta
+    path = []
+    while True:
+        tail = memo.get(state)
+        if tail is not None:
+            break
+        units_remaining = state[0]
+        if units_remaining <= 0:
+            tail = PlanTotals(stop_seconds, 0, stop_seconds, 0, 0)
+            break
+
+        transition, duration, units, *counters = next_step(rules, *state)
+        segment_type = transition.segment_type
+        if segment_type == "driving":
+            step = (duration, duration, 0, 0, 0)
+        elif segment_type == "fuel":
+            step = (duration, 0, duration, 1, 0)
+        else:
+            step = (duration, 0, 0, 0, int(transition is rules.rest))
+        path.append((state, step))
+        state = (units_remaining - units, *counters)
+
+    for visited, step in reversed(path):
+        tail = PlanTotals(*(a + b for a, b in zip(step, tail)))
+        memo[visited] = tail
+    return tail
+
+
+def departure_state(
+    rules: CompiledRuleSet, miles: float, driving_seconds: int = 0, window_seconds: int = 0,
+    since_break_seconds: int = 0, units_since_fuel: int = 0,
+) -> State:
+    """Planner state once the pickup is loaded, from the driver's counters before it."""
+    stop_seconds = HOSCalculator.STOP_SECONDS
+    (dk, da), (wk, wa), (bk, ba) = rules.transitions["pickup"].effects
+    return (
+        to_units(float(miles)),
+        driving_seconds * dk + stop_seconds * da,
+        window_seconds * wk + stop_seconds * wa,
+        since_break_seconds * bk + stop_seconds * ba,
+        units_since_fuel,
+    )
+
+
+def simulate_scenario(miles: float, scenario: Dict[str, Any], start_time: datetime) -> Dict[str, Any]:
+    """
+    Summary of the pickup-to-dropoff plan for one validated
+    TripScenarioSerializer payload. The driver first waits off duty for
+    `delay_hours`, which counts like any off-duty wait: long enough, it is
+    a full reset.
+    """
+    rules = compile_rule_set(scenario["rule_set"], scenario["adverse_conditions"])
+    counters = [to_seconds(scenario[key]) for key in ("driving_hours", "window_hours", "since_break_hours")]
+    delay = to_seconds(scenario["delay_hours"])
+    if delay:
+        for i, (keep, add) in enumerate(rules.wait_effects(delay)):
+            counters[i] = counters[i] * keep + delay * add
+
+    totals = plan_totals(rules, departure_state(
+        rules, miles, *counters, units_since_fuel=to_units(scenario["miles_since_fuel"])
+    ))
+    trip_seconds = HOSCalculator.STOP_SECONDS + totals.trip_seconds
+    departure = start_time + timedelta(seconds=delay)
+    # On-duty hours the trip adds to the cycle; the planner doesn't schedule cycle restarts
+    cycle_hours = float(scenario["current_cycle_used"]) + (
+        HOSCalculator.STOP_SECONDS + totals.driving_seconds + totals.on_duty_seconds
+    ) / SECONDS_PER_HOUR
+    return {
+        "name": scenario["name"],
+        "rule_set": scenario["rule_set"],
+        "adverse_conditions": scenario["adverse_conditions"],
+        "departure": departure,
+        "estimated_arrival": departure + timedelta(seconds=trip_seconds),
+        "trip_hours": hours_float(trip_seconds),
+        "driving_hours": hours_float(totals.driving_seconds),
+        "fuel_stops": totals.fuel_stops,
+        "required_rest_stops": totals.rest_stops,
+        "cycle_hours_used": round(cycle_hours, 2),
+        "cycle_exceeded": cycle_hours > rules.rule_set.cycle_hours,
+    }
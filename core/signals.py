@@ -0,0 +1,24 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import Trip
+from .services.fleet_rollups import apply_rollup_delta, stored_log_totals
+from .services.trip_cache import invalidate_trip
+
+
+@receiver(post_save, sender=Trip)
+@receiver(post_delete, sender=Trip)
+def invalidate_cached_trip(sender, instance, using, **kwargs):
+    invalidate_trip(instance.pk, using)
+
+
+# Child rows (segments, daily logs, log entries, stops) aren't hooked: a trip
+# writes hundreds of them, and a receiver per row would queue as many
+# callbacks. Code that writes them calls `invalidate_trip` once per trip
+# itself (see save_trip_results and TripChildAdmin).
+
+
+@receiver(pre_delete, sender=Trip)
+def remove_trip_from_rollups(sender, instance, **kwargs):
+    # Before the cascade deletes the trip's daily logs
+    apply_rollup_delta(instance.user_id, stored_log_totals(instance.pk), {})
@@ -1,3 +1,1614 @@
-from django.test import TestCase
+import contextlib
+import io
+import json
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+from zoneinfo import ZoneInfo
 
-# Create your tests here.
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from . import benchmarks
+from .admin import EstimatedCountPaginator
+from .models import (
+    DailyLog, DutyInterval, FleetRollup, Location, LogEntry, PositionPing, RateLimitBucket, Trip, TripAlert,
+    TripPlanFlight, TripProgress, TripSegment,
+)
+from .serializers import TripCreateSerializer, TripScenarioSerializer
+from .services.distance_calculator import DistanceCalculation
+from .services import hos_monitor, locations, openroute_quota, positions, trip_cache, trip_simulator
+from .services.distance_matrix import EARTH_RADIUS_MILES, cached_route_miles, lane_matrix
+from .services.fixed_point import ONE_SECOND, hours_float, to_units, units_to_tenths
+from .services.fleet_rollups import ROLLUP_FIELDS, rebuild_rows
+from .services.hos_calculator import HOSCalculator
+from .services.hos_rules import RULE_SETS, compile_rule_set
+from .services.lane_pricing import LANE_COLUMNS, transit_summary
+from .services.timezones import TimeZoneIndex, build_index, timezone_at
+from .services.trip_import import import_key
+from .services.trip_cache import get_trip_json
+
+
+class BenchmarkSuiteTests(TestCase):
+    def test_compare_flags_slowdowns_over_threshold(self):
+        baseline = {"a": {"median": 1.0}, "b": {"median": 1.0}, "c": {"median": 1.0, "queries": 10}}
+        current = {"a": {"median": 1.05}, "b": {"median": 1.5}, "c": {"median": 1.0, "queries": 12}}
+
+        rows = {row["name"]: row for row in benchmarks.compare_results(baseline, current, threshold=0.10)}
+
+        self.assertFalse(rows["a"]["regression"])
+        self.assertTrue(rows["b"]["regression"])
+        self.assertTrue(rows["c"]["regression"])
+
+    def test_every_benchmark_runs(self):
+        results = benchmarks.run_benchmarks(rounds=1, warmup=0)
+
+        self.assertEqual(set(results), set(benchmarks.BENCHMARKS))
+        self.assertIn("queries", results["save_trip_results[short]"])
+
+
+class FastTripSerializerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def render_with_drf(self, data):
+        from rest_framework.renderers import JSONRenderer
+        return JSONRenderer().render(data)
+
+    def test_fast_path_is_byte_identical_to_trip_response_serializer(self):
+        from .serializers import TripResponseSerializer, fast_trip_response_data, render_trip_json
+
+        benchmarks.create_planned_trip(benchmarks.TRIP_LENGTHS["multiweek"], cycle_used=12.5)
+        benchmarks.create_planned_trip(benchmarks.TRIP_LENGTHS["short"])
+        names = ["São Paulo\u2028", "Zürich", "東京"]
+        ids = locations.intern(names)
+        Trip.objects.create(
+            current_location_id=ids[names[0]], pickup_location_id=ids[names[1]], dropoff_location_id=ids[names[2]],
+        )
+        trips = Trip.objects.all().order_by('-created_at')
+
+        expected = self.render_with_drf(TripResponseSerializer(trips, many=True).data)
+        self.assertEqual(render_trip_json(fast_trip_response_data(trips)), expected)
+
+        for trip in trips:
+            expected = self.render_with_drf(TripResponseSerializer(trip).data)
+            actual = render_trip_json(fast_trip_response_data(Trip.objects.filter(pk=trip.pk))[0])
+            self.assertEqual(actual, expected)
+
+    def test_fast_path_uses_four_queries(self):
+        from .serializers import fast_trip_response_data
+
+        trip = benchmarks.create_planned_trip(benchmarks.TRIP_LENGTHS["multiweek"])
+        with self.assertNumQueries(4):
+            fast_trip_response_data(Trip.objects.filter(pk=trip.pk))
+
+    def test_get_trip_endpoint_matches_serializer(self):
+        from .serializers import TripResponseSerializer
+
+        trip = benchmarks.create_planned_trip(benchmarks.TRIP_LENGTHS["long"])
+        response = self.client.get(f"/api/trips/{trip.pk}/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(response.content, self.render_with_drf(TripResponseSerializer(trip).data))
+        self.assertEqual(self.client.get("/api/trips/999999/").status_code, 404)
+
+
+class DriverTimelineTests(TestCase):
+    def setUp(self):
+        self.driver = User.objects.create_user("driver")
+        self.trip = benchmarks.create_planned_trip(benchmarks.TRIP_LENGTHS["long"], user=self.driver)
+
+    def test_save_trip_results_writes_one_interval_per_segment(self):
+        segments = list(self.trip.segments.order_by("sequence_number"))
+        intervals = list(DutyInterval.objects.filter(trip=self.trip))
+
+        self.assertEqual(len(intervals), len(segments))
+        self.assertEqual(intervals[0].start, segments[0].start_time)
+        self.assertEqual(intervals[-1].end, segments[-1].end_time)
+        self.assertFalse(DutyInterval.objects.filter(trip__user__isnull=True).exists())
+
+    def test_timeline_returns_intervals_overlapping_window(self):
+        window_start = benchmarks.START_TIME + timedelta(hours=20)
+        window_end = window_start + timedelta(hours=12)
+
+        response = self.client.get(
+            f"/api/drivers/{self.driver.pk}/timeline/",
+            {"start": window_start.isoformat(), "end": window_end.isoformat()},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        intervals = response.json()["intervals"]
+        expected = [
+            i for i in DutyInterval.objects.filter(driver=self.driver)
+            if i.start < window_end and i.end > window_start
+        ]
+        self.assertEqual(len(intervals), len(expected))
+        self.assertEqual(intervals[0]["start"], expected[0].start.isoformat().replace("+00:00", "Z"))
+
+    def test_timeline_rejects_bad_window(self):
+        url = f"/api/drivers/{self.driver.pk}/timeline/"
+        self.assertEqual(self.client.get(url, {"start": "yesterday"}).status_code, 400)
+        self.assertEqual(
+            self.client.get(url, {"start": "2025-01-02T00:00:00Z", "end": "2025-01-01T00:00:00Z"}).status_code,
+            400,
+        )
+
+
+class RequestCoalescingTests(TestCase):
+    def test_plan_key_ignores_float_formatting(self):
+        from .services.request_coalescing import trip_plan_key
+
+        payload = TripCreateSerializer(data=benchmarks.trip_payload(10))
+        payload.is_valid(raise_exception=True)
+        same = benchmarks.trip_payload(10.0)
+        same["pickup_location"]["coords"] = [-87.34640000001, 41.5934]
+        same = TripCreateSerializer(data=same)
+        same.is_valid(raise_exception=True)
+        other = TripCreateSerializer(data=benchmarks.trip_payload(11))
+        other.is_valid(raise_exception=True)
+
+        self.assertEqual(trip_plan_key(payload.validated_data), trip_plan_key(same.validated_data))
+        self.assertNotEqual(trip_plan_key(payload.validated_data), trip_plan_key(other.validated_data))
+
+    def test_single_flight_runs_once_for_concurrent_callers(self):
+        from .services.request_coalescing import SingleFlight
+
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return "plan"
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            leader = pool.submit(flight.do, "key", slow)
+            started.wait(5)
+            followers = [pool.submit(flight.do, "key", slow) for _ in range(3)]
+            time.sleep(0.05)
+            release.set()
+            results = [leader.result()] + [f.result() for f in followers]
+
+        self.assertEqual(calls, [1])
+        self.assertEqual(results, ["plan"] * 4)
+
+    def test_shared_route_shares_only_flights_in_progress(self):
+        from .services import request_coalescing
+
+        key = "a" * 64
+        in_progress = TripPlanFlight.objects.create(key=key)
+        leader_start = datetime.now(dt_timezone.utc) - timedelta(seconds=1)
+
+        def leader_finishes(seconds):
+            TripPlanFlight.objects.filter(pk=in_progress.pk).update(
+                distance_miles=1234.5, start_time=leader_start, completed_at=leader_start
+            )
+
+        compute = mock.Mock(return_value=1234.5)
+        with mock.patch.object(request_coalescing.time, "sleep", side_effect=leader_finishes):
+            waited = request_coalescing.shared_route(key, compute)
+        later = request_coalescing.shared_route(key, compute)
+
+        self.assertEqual(waited, (1234.5, leader_start))
+        compute.assert_called_once()
+        self.assertEqual(later[0], 1234.5)
+        self.assertGreater(later[1], leader_start)
+
+    def test_idempotency_key_returns_existing_trip(self):
+        with benchmarks.stub_openroute(800.0), contextlib.redirect_stdout(io.StringIO()):
+            first = self.client.post(
+                "/api/trips/", benchmarks.trip_payload(), content_type="application/json",
+                HTTP_IDEMPOTENCY_KEY="retry-1",
+            )
+            retry = self.client.post(
+                "/api/trips/", benchmarks.trip_payload(), content_type="application/json",
+                HTTP_IDEMPOTENCY_KEY="retry-1",
+            )
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(first.json()["id"], retry.json()["id"])
+        self.assertEqual(Trip.objects.count(), 1)
+
+    def test_reused_idempotency_key_is_refused(self):
+        with benchmarks.stub_openroute(800.0), contextlib.redirect_stdout(io.StringIO()):
+            first = self.client.post(
+                "/api/trips/", benchmarks.trip_payload(), content_type="application/json",
+                HTTP_IDEMPOTENCY_KEY="retry-1",
+            )
+            other_body = self.client.post(
+                "/api/trips/", benchmarks.trip_payload(cycle_used=20), content_type="application/json",
+                HTTP_IDEMPOTENCY_KEY="retry-1",
+            )
+            self.client.force_login(User.objects.create_user("other"))
+            other_caller = self.client.post(
+                "/api/trips/", benchmarks.trip_payload(), content_type="application/json",
+                HTTP_IDEMPOTENCY_KEY="retry-1",
+            )
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(other_body.status_code, 422)
+        self.assertEqual(other_caller.status_code, 422)
+        self.assertNotIn("id", other_caller.json())
+        self.assertEqual(Trip.objects.count(), 1)
+
+
+class EldSheetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.trip = benchmarks.create_planned_trip(benchmarks.TRIP_LENGTHS["long"])
+
+    def test_sheet_renders_svg_with_etag(self):
+        response = self.client.get(f"/api/trips/{self.trip.pk}/logs/1/sheet.svg")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/svg+xml")
+        self.assertTrue(response.content.startswith(b"<svg"))
+        self.assertIn(b"<polyline", response.content)
+
+        revalidate = self.client.get(
+            f"/api/trips/{self.trip.pk}/logs/1/sheet.svg", HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(revalidate.status_code, 304)
+        self.assertEqual(self.client.get(f"/api/trips/{self.trip.pk}/logs/99/sheet.svg").status_code, 404)
+
+    def test_index_urls_are_versioned_and_immutable(self):
+        index = self.client.get(f"/api/trips/{self.trip.pk}/logs/sheets/").json()
+
+        self.assertEqual(len(index["sheets"]), self.trip.daily_logs.count())
+        response = self.client.get(index["sheets"][0]["svg"])
+        self.assertIn("immutable", response["Cache-Control"])
+        all_days = self.client.get(index["all_days_svg"])
+        self.assertEqual(all_days.status_code, 200)
+        self.assertEqual(all_days.content.count(b"<polyline"), len(index["sheets"]))
+
+    def test_overnight_sleeper_is_drawn_on_both_sheets(self):
+        from .services import eld_renderer
+        from .services.trip_persistence import save_trip_results
+
+        evening = datetime(2025, 1, 6, 20, 0, tzinfo=dt_timezone.utc)
+        segments = []
+        for segment_type, hours, tenths, location in [
+            ("pickup", 1, 0, "Gary, IN"), ("driving", 1, 550, "On Route"),
+            ("sleeper_berth", 10, 0, "Rest Area"), ("dropoff", 1, 0, "Joliet, IL"),
+        ]:
+            start = segments[-1]["end_time"] if segments else evening
+            segments.append({
+                "segment_type": segment_type, "sequence_number": len(segments) + 1,
+                "start_time": start, "end_time": start + timedelta(hours=hours),
+                "duration_seconds": hours * 3600, "distance_tenths": tenths, "location": location,
+                "time_zone": "UTC",
+            })
+        with contextlib.redirect_stdout(io.StringIO()):
+            calculator = HOSCalculator({**benchmarks.trip_data(55), "home_time_zone": "UTC"})
+        trip = Trip.objects.create(**benchmarks.trip_location_ids(), total_distance=55, home_terminal_time_zone="UTC")
+        save_trip_results(trip, {
+            "segments": segments,
+            "summary": {"driving_seconds": 3600, "fuel_stops": 0, "required_rest_stops": 1},
+            "daily_logs": calculator._generate_daily_logs(segments),
+        })
+
+        (first, first_entries), (second, second_entries) = eld_renderer.load_daily_logs(trip.pk)
+        self.assertEqual(first_entries[-1][:3], ("sleeper_berth", Decimal("22.00"), Decimal("24.00")))
+        self.assertEqual(second_entries[0][:3], ("sleeper_berth", Decimal("0.00"), Decimal("8.00")))
+        self.assertEqual((first["sleeper_berth_hours"], second["sleeper_berth_hours"]), (2, 8))
+        self.assertEqual(first["off_duty_hours"] + first["on_duty_hours"] + first["driving_hours"] + 2, 24)
+
+        sleeper_y = eld_renderer._row_y("sleeper_berth")
+        self.assertIn(f"{eld_renderer._x(22.0)},{sleeper_y} {eld_renderer._x(24.0)},{sleeper_y}",
+                      eld_renderer.render_sheet_svg(first, first_entries))
+        self.assertIn(f"{eld_renderer._x(0.0)},{sleeper_y} {eld_renderer._x(8.0)},{sleeper_y}",
+                      eld_renderer.render_sheet_svg(second, second_entries))
+
+    def test_sheet_cache_key_follows_content(self):
+        from .services import eld_renderer
+
+        (log, entries), = eld_renderer.load_daily_logs(self.trip.pk, 1)
+        first = eld_renderer.sheet_hash(log, entries)
+        LogEntry.objects.filter(daily_log__trip=self.trip, daily_log__day_number=1).update(
+            location=Location.objects.create(name="Moved")
+        )
+        (log, entries), = eld_renderer.load_daily_logs(self.trip.pk, 1)
+
+        self.assertNotEqual(eld_renderer.sheet_hash(log, entries), first)
+        self.assertIn("Moved", eld_renderer.render_sheet_svg(log, entries))
+
+
+class ReplanTripTests(TestCase):
+    def setUp(self):
+        self.driver = User.objects.create_user("replan-driver")
+        self.trip = benchmarks.create_planned_trip(benchmarks.TRIP_LENGTHS["long"], user=self.driver)
+
+    def replan(self, checkpoint_time, miles=1000.0):
+        payload = {
+            "current_location": {"name": "Denver, CO", "coords": [-104.99, 39.74]},
+            "dropoff_location": {"name": "Phoenix, AZ", "coords": [-112.07, 33.45]},
+            "checkpoint_time": checkpoint_time.isoformat(),
+        }
+        with benchmarks.stub_openroute(miles), contextlib.redirect_stdout(io.StringIO()):
+            return self.client.post(f"/api/trips/{self.trip.pk}/replan/", payload, content_type="application/json")
+
+    def test_replan_keeps_history_and_rewrites_the_rest(self):
+        checkpoint = benchmarks.START_TIME + timedelta(hours=30, minutes=10)
+        kept_segment_ids = set(self.trip.segments.filter(end_time__lte=checkpoint).values_list("id", flat=True))
+        kept_log_ids = set(self.trip.daily_logs.filter(log_date__lt=checkpoint.date()).values_list("id", flat=True))
+
+        response = self.replan(checkpoint)
+
+        self.assertEqual(response.status_code, 200, response.content)
+        segments = list(self.trip.segments.order_by("sequence_number"))
+        self.assertTrue(kept_segment_ids <= {s.id for s in segments})
+        self.assertTrue(kept_log_ids <= set(self.trip.daily_logs.values_list("id", flat=True)))
+        self.assertEqual([s.sequence_number for s in segments], list(range(1, len(segments) + 1)))
+        for previous, segment in zip(segments, segments[1:]):
+            self.assertEqual(previous.end_time, segment.start_time)
+        self.assertEqual(segments[-1].segment_type, "dropoff")
+        self.assertEqual(segments[-1].location.name, "Phoenix, AZ")
+
+        day_numbers = list(self.trip.daily_logs.order_by("day_number").values_list("day_number", flat=True))
+        self.assertEqual(day_numbers, list(range(1, len(day_numbers) + 1)))
+        # Each day's line is continuous and ends at midnight when the trip goes on
+        for log in self.trip.daily_logs.order_by("day_number")[:len(day_numbers) - 1]:
+            entries = list(log.entries.order_by("start_hour"))
+            for previous, entry in zip(entries, entries[1:]):
+                self.assertEqual(previous.end_hour, entry.start_hour)
+            self.assertEqual(entries[-1].end_hour, 24)
+            if log.day_number > 1:
+                self.assertEqual(entries[0].start_hour, 0)
+
+        driven = sum(s.distance_miles for s in segments if s.end_time <= checkpoint)
+        self.trip.refresh_from_db()
+        self.assertAlmostEqual(float(self.trip.total_distance), float(driven) + 1000.0, delta=1)
+        self.assertEqual(
+            DutyInterval.objects.filter(trip=self.trip).latest("end").end, segments[-1].end_time
+        )
+
+    def test_replan_rejects_trip_that_has_not_left_pickup(self):
+        response = self.replan(benchmarks.START_TIME + timedelta(minutes=30))
+        self.assertEqual(response.status_code, 400)
+
+
+class FleetRollupTests(TestCase):
+    def setUp(self):
+        self.drivers = [User.objects.create_user(f"fleet-driver-{i}") for i in range(2)]
+        self.trips = [
+            benchmarks.create_planned_trip(benchmarks.TRIP_LENGTHS["long"], user=self.drivers[0]),
+            benchmarks.create_planned_trip(benchmarks.TRIP_LENGTHS["medium"], user=self.drivers[0]),
+            benchmarks.create_planned_trip(benchmarks.TRIP_LENGTHS["multiweek"], user=self.drivers[1]),
+            benchmarks.create_planned_trip(benchmarks.TRIP_LENGTHS["short"]),
+        ]
+
+    def rollups(self, rows):
+        return {
+            (row.log_date, row.driver_id): tuple(getattr(row, field) for field in ROLLUP_FIELDS)
+            for row in rows if any(getattr(row, field) for field in ROLLUP_FIELDS)
+        }
+
+    def assertRollupsMatchLogs(self):
+        self.assertEqual(self.rollups(FleetRollup.objects.all()), self.rollups(rebuild_rows()))
+
+    def test_saved_trips_roll_up_per_driver_day(self):
+        self.assertRollupsMatchLogs()
+        day_one = FleetRollup.objects.get(driver=self.drivers[0], log_date=benchmarks.START_TIME.date())
+        self.assertEqual(day_one.log_count, 2)
+        self.assertEqual(
+            sum(r.fuel_stops for r in FleetRollup.objects.filter(driver=self.drivers[1])),
+            self.trips[2].fuel_stops,
+        )
+
+    def test_replan_and_delete_keep_rollups_in_sync(self):
+        payload = {
+            "current_location": {"name": "Denver, CO", "coords": [-104.99, 39.74]},
+            "dropoff_location": {"name": "Phoenix, AZ", "coords": [-112.07, 33.45]},
+            "checkpoint_time": (benchmarks.START_TIME + timedelta(hours=30, minutes=10)).isoformat(),
+        }
+        with benchmarks.stub_openroute(1000.0), contextlib.redirect_stdout(io.StringIO()):
+            response = self.client.post(f"/api/trips/{self.trips[0].pk}/replan/", payload, content_type="application/json")
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertRollupsMatchLogs()
+
+        self.trips[2].delete()
+        self.assertRollupsMatchLogs()
+        self.assertFalse(self.rollups(FleetRollup.objects.filter(driver=self.drivers[1])))
+
+    def test_rebuild_command_restores_rollups(self):
+        expected = self.rollups(FleetRollup.objects.all())
+        FleetRollup.objects.all().delete()
+        DailyLog.objects.filter(trip=self.trips[3]).update(total_miles=0)
+
+        call_command("rebuild_fleet_rollups", batch_size=3, stdout=io.StringIO())
+
+        self.assertRollupsMatchLogs()
+        self.assertNotEqual(self.rollups(FleetRollup.objects.all()), expected)
+
+    def test_analytics_endpoint_filters_and_groups(self):
+        start = benchmarks.START_TIME.date()
+        response = self.client.get("/api/analytics/fleet/", {
+            "start": start.isoformat(), "end": (start + timedelta(days=60)).isoformat(), "group_by": "driver",
+        })
+
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()
+        by_driver = {row["driver_id"]: row for row in data["rows"]}
+        self.assertEqual(set(by_driver), {self.drivers[0].pk, self.drivers[1].pk, None})
+        self.assertAlmostEqual(
+            by_driver[self.drivers[0].pk]["total_miles"],
+            float(self.trips[0].total_distance + self.trips[1].total_distance), delta=1,
+        )
+        self.assertAlmostEqual(data["totals"]["total_miles"], sum(r["total_miles"] for r in data["rows"]))
+
+        one_day = self.client.get("/api/analytics/fleet/", {
+            "start": start.isoformat(), "end": start.isoformat(), "driver": self.drivers[0].pk,
+        }).json()
+        self.assertEqual([row["log_date"] for row in one_day["rows"]], [start.isoformat()])
+        self.assertEqual(one_day["rows"][0]["log_count"], 2)
+
+        bad = self.client.get("/api/analytics/fleet/", {"start": "2025-02-01", "end": "2025-01-01"})
+        self.assertEqual(bad.status_code, 400)
+
+
+class TripImportTests(TestCase):
+    HEADER = (
+        "external_id,current_name,current_lon,current_lat,pickup_name,pickup_lon,pickup_lat,"
+        "dropoff_name,dropoff_lon,dropoff_lat,current_cycle_used,start_time,distance_miles,driver_id"
+    )
+
+    def setUp(self):
+        self.driver = User.objects.create_user("import-driver")
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def write(self, name, lines):
+        path = os.path.join(self.dir.name, name)
+        with open(path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        return path
+
+    def csv_row(self, external_id, miles="", driver=""):
+        return (
+            f'{external_id},"Chicago, IL",-87.63,41.88,"Gary, IN",-87.35,41.59,"Dallas, TX",-96.8,32.78,'
+            f"10,{benchmarks.START_TIME.isoformat()},{miles},{driver}"
+        )
+
+    def run_import(self, path, **options):
+        out = io.StringIO()
+        call_command("import_trips", path, offline=True, workers=0, stdout=out, **options)
+        return out.getvalue()
+
+    def test_csv_import_writes_trips_logs_and_rollups(self):
+        path = self.write("trips.csv", [
+            self.HEADER,
+            self.csv_row("A", miles=900, driver=self.driver.pk),
+            self.csv_row("B"),
+            self.csv_row("C", miles=-5),
+            self.csv_row("D", driver=999999),
+        ])
+        self.run_import(path, chunk_size=2)
+
+        trip = Trip.objects.get(idempotency_key=import_key("trips.csv", "A"))
+        self.assertEqual((trip.user, trip.total_distance), (self.driver, 900))
+        self.assertEqual(trip.segments.first().start_time, benchmarks.START_TIME)
+        self.assertTrue(Trip.objects.filter(idempotency_key=import_key("trips.csv", "B")).exists())
+        self.assertEqual(Trip.objects.count(), 2)
+        for model in (TripSegment, DailyLog, LogEntry, DutyInterval):
+            self.assertTrue(model.objects.filter(trip=trip).exists() if model is not LogEntry
+                            else model.objects.filter(daily_log__trip=trip).exists())
+        self.assertEqual(
+            {(r.log_date, r.driver_id, r.log_count) for r in FleetRollup.objects.all() if r.log_count},
+            {(r.log_date, r.driver_id, r.log_count) for r in rebuild_rows()},
+        )
+
+        with open(f"{path}.errors.jsonl") as f:
+            failures = [json.loads(line) for line in f]
+        self.assertEqual([failure["row"] for failure in failures], [3, 4])
+        self.assertIn("distance_miles", failures[0]["errors"])
+        self.assertIn("driver_id", failures[1]["errors"])
+
+    def test_rerun_and_resume_skip_imported_rows(self):
+        payload = {
+            "current_location": {"name": "Denver, CO", "coords": [-104.99, 39.74]},
+            "pickup_location": {"name": "Pueblo, CO", "coords": [-104.61, 38.25]},
+            "dropoff_location": {"name": "Phoenix, AZ", "coords": [-112.07, 33.45]},
+            "current_cycle_used": 5,
+            "distance_miles": 820,
+        }
+        path = self.write("trips.jsonl", [json.dumps(payload), "{not json", json.dumps(payload)])
+        self.run_import(path)
+        self.assertEqual(Trip.objects.count(), 2)
+        with open(f"{path}.checkpoint.json") as f:
+            self.assertEqual(json.load(f)["rows_done"], 3)
+
+        # A checkpoint covering every row reads nothing; a restart finds the keys already stored
+        self.assertNotIn(" rows: ", self.run_import(path))
+        output = self.run_import(path, restart=True)
+        self.assertIn("2 already present", output)
+        self.assertEqual(Trip.objects.count(), 2)
+
+
+class PositionTests(TestCase):
+    MILES_PER_DEGREE = EARTH_RADIUS_MILES * math.pi / 180
+
+    def setUp(self):
+        self.driver = User.objects.create_user("gps-driver")
+        self.trip = benchmarks.create_planned_trip(benchmarks.TRIP_LENGTHS["long"], user=self.driver)
+        positions.latest_positions.clear()
+        hos_monitor._plans.clear()
+        self.addCleanup(positions.latest_positions.clear)
+
+    def ping(self, hours, miles, speed=55.0):
+        """A fix `hours` after the trip starts, `miles` north of the pickup"""
+        recorded_at = (benchmarks.START_TIME + timedelta(hours=hours)).timestamp()
+        return (self.driver.pk, recorded_at, -87.35, 41.59 + miles / self.MILES_PER_DEGREE, speed)
+
+    def post(self, body, content_type="application/x-ndjson"):
+        return self.client.post("/api/positions/", body, content_type=content_type)
+
+    def ndjson(self, pings):
+        return "\n".join(
+            json.dumps({"driver": d, "recorded_at": t, "coords": [lon, lat], "speed_mph": v})
+            for d, t, lon, lat, v in pings
+        )
+
+    def test_ndjson_batch_is_stored_and_matched_to_the_trip(self):
+        body = self.ndjson([self.ping(0.5, 0), self.ping(2, 55)]) + "\n".join([
+            "",
+            "not json",
+            json.dumps({"driver": self.driver.pk, "recorded_at": "2025-01-06T10:00:00", "coords": [200, 0]}),
+            json.dumps({"driver": 999999, "recorded_at": "2025-01-06T10:00:00Z", "coords": [-87, 41]}),
+        ])
+
+        response = self.post(body)
+
+        self.assertEqual(response.status_code, 200, response.content)
+        result = response.json()
+        self.assertEqual((result["accepted"], result["rejected"]), (2, 3))
+        self.assertEqual([e.get("line") for e in result["errors"]], [3, 4, None])
+        self.assertEqual(result["errors"][-1]["driver"], 999999)
+        self.assertEqual(
+            list(PositionPing.objects.values_list("trip_id", flat=True)), [self.trip.pk, self.trip.pk]
+        )
+
+        response = self.client.get(f"/api/drivers/{self.driver.pk}/position/")
+        self.assertEqual(response.status_code, 200)
+        position = response.json()
+        self.assertEqual((position["trip_id"], position["speed_mph"]), (self.trip.pk, 55.0))
+        self.assertAlmostEqual(position["coords"][1], self.ping(2, 55)[3])
+        self.assertAlmostEqual(position["progress"]["driven_miles"], 55, delta=0.01)
+        self.assertEqual(position["progress"]["planned_miles"], 55.0)
+        self.assertEqual(position["progress"]["behind_seconds"], 0)
+
+    def test_bad_speeds_and_epochs_are_rejected_per_line(self):
+        pings, errors = positions.parse_ndjson("\n".join([
+            json.dumps({"driver": 1, "coords": [0, 0], "recorded_at": 0, "speed_mph": "x"}),
+            json.dumps({"driver": 1, "coords": [0, 0], "recorded_at": -1e15}),
+            json.dumps({"driver": 1, "coords": [0, 0], "recorded_at": 1e15}),
+            json.dumps({"driver": 1, "coords": [0, 0], "recorded_at": "1970-01-01T00:00:00Z", "speed_mph": "nan"}),
+            json.dumps({"driver": 1, "coords": [0, 0], "recorded_at": 1736150400, "speed_mph": "61.5"}),
+        ]).encode())
+
+        self.assertEqual(pings, [(1, 1736150400.0, 0.0, 0.0, 61.5)])
+        self.assertEqual([e["line"] for e in errors], [1, 2, 3, 4])
+        self.assertIn("Invalid ping", errors[0]["error"])
+        self.assertEqual(errors[1]["error"], "recorded_at is before 2000")
+        self.assertEqual(errors[2]["error"], "recorded_at is in the future")
+
+        response = self.post(json.dumps({"driver": self.driver.pk, "coords": [0, 0], "recorded_at": -1e15}))
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()["rejected"], 1)
+
+    def test_batch_retries_when_another_worker_starts_tracking_the_trip(self):
+        create = TripProgress.objects.bulk_create
+        attempts = []
+
+        def racing_create(rows, *args, **kwargs):
+            if rows and not attempts:
+                attempts.append(1)
+                raise IntegrityError("UNIQUE constraint failed: core_tripprogress.trip_id")
+            return create(rows, *args, **kwargs)
+
+        with mock.patch.object(TripProgress.objects, "bulk_create", side_effect=racing_create):
+            result = positions.ingest_pings([self.ping(0.5, 0), self.ping(2, 55)])
+
+        self.assertEqual((attempts, result["accepted"]), ([1], 2))
+        self.assertEqual(PositionPing.objects.count(), 2)
+        self.assertAlmostEqual(float(TripProgress.objects.get(trip=self.trip).driven_miles), 55, delta=0.01)
+
+    def test_binary_batch_matches_ndjson(self):
+        pings = [self.ping(0.5, 0, speed=None), self.ping(1.5, 27.5), self.ping(30, 1000)]
+        body = positions.pack_pings(pings)
+        self.assertEqual(len(body), 3 * positions.PING_RECORD.size)
+
+        response = self.post(body, content_type="application/octet-stream")
+
+        self.assertEqual(response.json()["accepted"], 3)
+        parsed, errors = positions.parse_ndjson(self.ndjson(pings).encode())
+        stored = PositionPing.objects.order_by("recorded_at")
+        for ping, row in zip(parsed, stored):
+            self.assertEqual(row.recorded_at.timestamp(), ping[1])
+            self.assertAlmostEqual(row.latitude, ping[3], places=6)
+            self.assertEqual(row.speed_mph, ping[4])
+        # A day and a half in, the driver is still on the trip
+        self.assertEqual(stored[2].trip_id, self.trip.pk)
+        self.assertEqual(self.post(body[:-1], content_type="application/octet-stream").status_code, 400)
+        self.assertEqual(self.post(body, content_type="application/json").status_code, 415)
+
+    def test_progress_tracks_the_plan_and_ignores_jitter_and_jumps(self):
+        # Half the planned speed through the first driving hours, then a bad fix
+        pings = [self.ping(1 + i / 4, 27.5 * i / 4) for i in range(13)]
+        pings.append(self.ping(4.01, 500))
+        self.post(self.ndjson(pings))
+        progress = TripProgress.objects.get(trip=self.trip)
+        self.assertAlmostEqual(float(progress.driven_miles), 82.5, delta=0.01)
+        self.assertEqual(str(progress.planned_miles), "165.5")
+        self.assertEqual(progress.segment_sequence, 2)
+        # The plan passed 82.5 miles at 10:30
+        self.assertEqual(progress.behind_seconds, round(4.01 * 3600 - 2.5 * 3600))
+
+        # Parked at the rest stop the plan also stops at: GPS noise moves nothing
+        self.post(self.ndjson([self.ping(5, 82.5), self.ping(5.1, 82.51)]))
+        progress.refresh_from_db()
+        self.assertAlmostEqual(float(progress.driven_miles), 82.5, delta=0.01)
+
+        # Out-of-order pings are stored without moving progress back
+        self.post(self.ndjson([self.ping(4.5, 60)]))
+        progress.refresh_from_db()
+        self.assertEqual(progress.recorded_at, benchmarks.START_TIME + timedelta(hours=5.1))
+        self.assertEqual(PositionPing.objects.count(), 17)
+
+    def test_latest_position_keeps_newest_fix_and_reloads_when_stale(self):
+        self.post(self.ndjson([self.ping(2, 55), self.ping(1, 0)]))
+        self.assertEqual(len(positions.latest_positions), 1)
+        self.assertAlmostEqual(positions.latest_position(self.driver.pk)["coords"][1], self.ping(2, 55)[3])
+
+        # Another worker stored a newer fix; this one reads it once its entry is stale
+        PositionPing.objects.create(
+            driver=self.driver, recorded_at=benchmarks.START_TIME + timedelta(hours=3),
+            longitude=-90, latitude=40,
+        )
+        self.assertEqual(positions.latest_position(self.driver.pk)["coords"], [-87.35, self.ping(2, 55)[3]])
+        with mock.patch.object(positions, "STALE_AFTER", -1):
+            position = positions.latest_position(self.driver.pk)
+        self.assertEqual((position["coords"], position["speed_mph"]), ([-90, 40], None))
+
+        other = User.objects.create_user("parked")
+        self.assertEqual(self.client.get(f"/api/drivers/{other.pk}/position/").status_code, 404)
+
+    def test_prune_positions_deletes_old_pings(self):
+        now = datetime.now(dt_timezone.utc)
+        for days in (0, 10, 40, 50):
+            PositionPing.objects.create(
+                driver=self.driver, recorded_at=now - timedelta(days=days), longitude=0, latitude=0
+            )
+        call_command("prune_positions", days=30, batch_size=1, stdout=io.StringIO())
+        self.assertEqual(PositionPing.objects.count(), 2)
+
+
+class HosMonitorTests(TestCase):
+    def setUp(self):
+        self.driver = User.objects.create_user("monitored")
+        self.trip = benchmarks.create_planned_trip(benchmarks.TRIP_LENGTHS["long"], user=self.driver)
+        hos_monitor._plans.clear()
+        self.plan = hos_monitor.load_plans([self.trip.pk])[self.trip.pk]
+
+    def track(self, minutes, position):
+        """Post a ping a minute for `minutes` (since the trip start); `position(t)` gives (miles, mph)"""
+        lines = []
+        for minute in minutes:
+            at = benchmarks.START_TIME.timestamp() + minute * 60
+            miles, mph = position(at)
+            lines.append(json.dumps({
+                "driver": self.driver.pk, "recorded_at": at, "speed_mph": mph,
+                "coords": [-87.35, 41.59 + miles / PositionTests.MILES_PER_DEGREE],
+            }))
+        response = self.client.post("/api/positions/", "\n".join(lines), content_type="application/x-ndjson")
+        self.assertEqual(response.json()["accepted"], len(lines))
+
+    def steady(self, mph):
+        """Leave the pickup on time and drive at `mph` without stopping"""
+        def position(at):
+            hours = max(at - self.plan.start - 3600, 0) / 3600
+            return hours * mph, mph if hours > 0 else 0.0
+        return position
+
+    def on_plan(self, at):
+        tenths, sequence = self.plan.planned(at)
+        moving = self.plan.types[self.plan.sequence.index(sequence)] == "driving"
+        return tenths / 10, 55.0 if moving else 0.0
+
+    def alerts(self, *exclude):
+        return list(TripAlert.objects.exclude(kind__in=exclude).values_list("kind", "value_seconds"))
+
+    def test_following_the_plan_raises_no_alerts(self):
+        self.track(range(30, 60 * 60), self.on_plan)
+
+        self.assertEqual(self.alerts(), [])
+        progress = TripProgress.objects.get(trip=self.trip)
+        self.assertEqual((progress.behind_seconds, progress.duty_status), (0, "off_duty"))
+        self.assertEqual(progress.estimated_arrival.timestamp(), self.plan.end)
+        self.assertEqual(progress.driving_seconds, self.plan.counters_at(progress.status_since.timestamp())["driving_seconds"])
+
+    def test_driving_through_rests_raises_each_limit_once(self):
+        # Minutes since the 08:00 start: on the road from 09:00 until 22:01
+        self.track(range(30, 14 * 60 + 2), self.steady(55))
+
+        self.assertEqual(
+            [kind for kind, _value in self.alerts("eta_drift")],
+            ["rest_early", "missed_break", "driving_limit", "window_limit"],
+        )
+        # Raised at the first ping past each limit
+        self.assertEqual({value for kind, value in self.alerts("eta_drift", "rest_early")}, {60})
+        progress = TripProgress.objects.get(trip=self.trip)
+        self.assertEqual(progress.driving_seconds, 13 * 3600)
+
+        # A 10-hour stop starts a new stretch
+        parked = float(progress.driven_miles)
+        self.track(range(14 * 60 + 2, 24 * 60 + 5), lambda at: (parked, 0.0))
+        self.track(range(24 * 60 + 5, 24 * 60 + 12), lambda at: (parked + 1, 55.0))
+        progress.refresh_from_db()
+        self.assertEqual((progress.driving_seconds, progress.alerts_raised), (6 * 60, 0))
+
+    def test_slow_truck_raises_eta_drift_per_step(self):
+        # Five and a half hours behind by 20:00
+        self.track(range(30, 12 * 60), self.steady(27.5))
+
+        drift = [value for kind, value in self.alerts() if kind == "eta_drift"]
+        self.assertEqual(len(drift), 10)
+        self.assertTrue(all(step * hos_monitor.ETA_DRIFT_STEP <= value < (step + 0.1) * hos_monitor.ETA_DRIFT_STEP
+                            for step, value in enumerate(drift, start=1)))
+        progress = TripProgress.objects.get(trip=self.trip)
+        self.assertEqual(progress.estimated_arrival.timestamp(), self.plan.end + progress.behind_seconds)
+        self.assertIn("rest_early", [kind for kind, _value in self.alerts()])
+
+    def test_duty_status_events_decide_what_a_stop_counts_as(self):
+        url = f"/api/drivers/{self.driver.pk}/duty-status/"
+        self.assertEqual(self.client.post(url, {"duty_status": "driving"}).status_code, 409)
+        self.track(range(30, 5 * 60), self.steady(55))
+
+        def change(duty_status, hours):
+            at = benchmarks.START_TIME + timedelta(hours=hours)
+            response = self.client.post(url, {"duty_status": duty_status, "at": at.isoformat()})
+            self.assertEqual(response.status_code, 200, response.content)
+            return response.json()["progress"]
+
+        # 40 minutes unloading on duty is no break, 40 minutes off duty is
+        change("on_duty_not_driving", 5)
+        progress = change("driving", 5 + 2 / 3)
+        self.assertEqual((progress["since_break_seconds"], progress["window_seconds"]), (4 * 3600 - 60, 5 * 3600 + 2400))
+        change("off_duty", 6)
+        progress = change("driving", 6 + 2 / 3)
+        self.assertEqual((progress["since_break_seconds"], progress["driving_seconds"]), (0, 4 * 3600 + 1140))
+        self.assertEqual(progress["duty_status"], "driving")
+
+        self.assertEqual(self.client.post(url, {"duty_status": "napping"}).status_code, 400)
+
+    def test_alert_feed(self):
+        self.track(range(30, 22 * 60), self.steady(55))
+        ids = list(TripAlert.objects.values_list("id", flat=True))
+
+        feed = self.client.get("/api/alerts/", {"after": ids[1], "trip": self.trip.pk}).json()
+        self.assertEqual([alert["id"] for alert in feed["alerts"]], ids[2:])
+        self.assertEqual(feed["last_id"], ids[-1])
+        self.assertEqual(self.client.get("/api/alerts/", {"after": ids[-1]}).json()["alerts"], [])
+        self.assertEqual(len(self.client.get("/api/alerts/").json()["alerts"]), len(ids))
+        self.assertEqual(self.client.get("/api/alerts/", {"after": "x"}).status_code, 400)
+
+
+class LocationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(locations.clear)
+
+    def test_repeated_names_share_one_row(self):
+        benchmarks.create_planned_trip(benchmarks.TRIP_LENGTHS["long"])
+        benchmarks.create_planned_trip(benchmarks.TRIP_LENGTHS["medium"])
+
+        names = set(Location.objects.values_list("name", flat=True))
+        self.assertEqual(len(names), Location.objects.count())
+        self.assertLessEqual({"Chicago, IL", "Gary, IN", "Los Angeles, CA", "On Route", "Fuel Station"}, names)
+        used = set(TripSegment.objects.values_list("location__name", flat=True))
+        used |= set(LogEntry.objects.values_list("location__name", flat=True))
+        self.assertEqual(used | {"Chicago, IL"}, names)
+
+    def test_committed_names_are_resolved_without_queries(self):
+        from .services.trip_persistence import save_trip_results
+
+        with self.captureOnCommitCallbacks(execute=True):
+            benchmarks.create_planned_trip(benchmarks.TRIP_LENGTHS["long"])
+        trip = Trip.objects.create(**benchmarks.trip_location_ids())
+        result = benchmarks.plan_trip(benchmarks.TRIP_LENGTHS["long"])
+
+        with CaptureQueriesContext(connection) as queries:
+            save_trip_results(trip, result)
+        self.assertFalse([query["sql"] for query in queries if "core_location" in query["sql"]])
+
+    def test_names_are_cached_only_once_committed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ids = locations.intern(["Joliet, IL"], {"Joliet, IL": [-88.08, 41.53]})
+            self.assertNotIn("Joliet, IL", locations._ids)
+        self.assertEqual(locations._ids["Joliet, IL"], ids["Joliet, IL"])
+        self.assertEqual(locations.names_for([ids["Joliet, IL"]]), {ids["Joliet, IL"]: "Joliet, IL"})
+
+    def test_same_name_is_routed_by_each_request_coords(self):
+        illinois = benchmarks.trip_payload()
+        illinois["dropoff_location"] = {"name": "Springfield", "coords": [-89.65, 39.78]}
+        missouri = benchmarks.trip_payload()
+        missouri["dropoff_location"] = {"name": "Springfield", "coords": [-93.29, 37.21]}
+        no_coords = benchmarks.trip_payload()
+        no_coords["dropoff_location"] = {"name": "Springfield"}
+
+        with benchmarks.stub_openroute(200.0) as route, contextlib.redirect_stdout(io.StringIO()):
+            responses = [
+                self.client.post("/api/trips/", payload, content_type="application/json")
+                for payload in (illinois, missouri, no_coords)
+            ]
+
+        self.assertEqual([r.status_code for r in responses], [201, 201, 400])
+        self.assertIn("coords", responses[2].data["dropoff_location"])
+        self.assertEqual([call.args[0][-1] for call in route.call_args_list], [(-89.65, 39.78), (-93.29, 37.21)])
+        self.assertEqual(Location.objects.filter(name="Springfield").count(), 1)
+
+
+class AdminTests(TestCase):
+    LISTS = ("location", "trip", "tripsegment", "tripstop", "dailylog", "logentry", "dutyinterval")
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser("admin"))
+        self.driver = User.objects.create_user("admin-driver")
+        benchmarks.create_planned_trip(benchmarks.TRIP_LENGTHS["medium"], user=self.driver)
+
+    def changelist(self, model, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f"/admin/core/{model}/", params)
+        self.assertEqual(response.status_code, 200)
+        return response, [query["sql"] for query in queries]
+
+    def test_changelists_run_a_fixed_number_of_queries(self):
+        counts = {model: len(self.changelist(model)[1]) for model in self.LISTS}
+        for _ in range(3):
+            benchmarks.create_planned_trip(benchmarks.TRIP_LENGTHS["medium"], user=self.driver)
+        self.assertEqual({model: len(self.changelist(model)[1]) for model in self.LISTS}, counts)
+
+    def test_large_lists_are_counted_from_an_estimate(self):
+        with mock.patch.object(EstimatedCountPaginator, "EXACT_BELOW", 1):
+            response, queries = self.changelist("logentry")
+            self.assertFalse([sql for sql in queries if "COUNT(" in sql and "core_logentry" in sql])
+            self.assertEqual(response.context["cl"].result_count, LogEntry.objects.count())
+
+            # Filtered lists get a bounded exact count
+            response, queries = self.changelist("logentry", duty_status__exact="driving")
+            self.assertEqual(response.context["cl"].result_count, LogEntry.objects.filter(duty_status="driving").count())
+            self.assertTrue(all("LIMIT" in sql for sql in queries if "COUNT(" in sql))
+
+    def test_search_matches_indexed_prefixes(self):
+        self.assertEqual(self.changelist("trip", q="Gary")[0].context["cl"].result_count, 1)
+        self.assertEqual(self.changelist("trip", q="ary")[0].context["cl"].result_count, 0)
+        self.assertEqual(self.changelist("trip", q="admin-dr")[0].context["cl"].result_count, 1)
+        response, _queries = self.changelist("tripsegment", q="Gary", segment_type__exact="fuel")
+        self.assertEqual(response.context["cl"].result_count, 1)
+
+
+class FixedPointPlannerTests(TestCase):
+    ZONES = ["UTC", "America/Chicago", "America/Los_Angeles"]
+
+    def random_trip(self, rng):
+        # Start times with microseconds, odd mileages and stop windows mid-minute
+        start_time = benchmarks.START_TIME + timedelta(seconds=rng.uniform(0, 86400))
+        trip_data = {
+            **benchmarks.trip_data(round(rng.uniform(0.1, 12000), rng.choice([0, 1, 3])), rng.uniform(0, 70)),
+            "start_time": start_time,
+            "rule_set": rng.choice(list(RULE_SETS)),
+            "adverse_conditions": rng.random() < 0.3,
+            "home_time_zone": rng.choice(self.ZONES),
+        }
+        if rng.random() < 0.3:
+            trip_data.pop("trip_miles")
+            trip_data["stops"] = [
+                {
+                    "location": f"Stop {i}",
+                    "stop_type": "pickup" if i == 0 else "dropoff",
+                    "leg_miles": round(rng.uniform(0.1, 900), 2),
+                    "window_start": start_time + timedelta(seconds=rng.uniform(0, 200000)) if rng.random() < 0.5 else None,
+                    "time_zone": rng.choice(self.ZONES),
+                }
+                for i in range(rng.randint(1, 5))
+            ]
+        return trip_data
+
+    def test_segments_add_up_exactly_to_the_trip(self):
+        rng = random.Random(41)
+        for case in range(300):
+            trip_data = self.random_trip(rng)
+            with self.subTest(case=case), contextlib.redirect_stdout(io.StringIO()):
+                result = HOSCalculator(trip_data).calculate()
+                segments, summary = result["segments"], result["summary"]
+
+                span = segments[-1]["end_time"] - segments[0]["start_time"]
+                self.assertEqual(sum(s["duration_seconds"] for s in segments) * ONE_SECOND, span)
+                self.assertEqual(summary["trip_seconds"] * ONE_SECOND, span)
+                for segment, following in zip(segments, segments[1:]):
+                    self.assertEqual(segment["end_time"], following["start_time"])
+                for segment in segments:
+                    self.assertEqual(segment["end_time"] - segment["start_time"], segment["duration_seconds"] * ONE_SECOND)
+
+                legs = trip_data.get("stops") or [{"leg_miles": trip_data["trip_miles"]}]
+                tenths = units_to_tenths(sum(to_units(leg["leg_miles"]) for leg in legs))
+                self.assertEqual(sum(s["distance_tenths"] for s in segments), tenths)
+                self.assertEqual(summary["distance_tenths"], tenths)
+                self.assertEqual(sum(log["distance_tenths"] for log in result["daily_logs"]), tenths)
+                self.assertEqual(sum(log["driving_seconds"] for log in result["daily_logs"]), summary["driving_seconds"])
+
+    def test_saved_rows_round_once(self):
+        trip = benchmarks.create_planned_trip(benchmarks.TRIP_LENGTHS["multiweek"])
+        trip.refresh_from_db()
+        segments = list(trip.segments.all())
+
+        self.assertEqual(sum(s.distance_miles for s in segments), trip.total_distance)
+        self.assertEqual(sum(log.total_miles for log in trip.daily_logs.all()), trip.total_distance)
+        for segment in segments:
+            # Hours are rounded to 0.01 (18 seconds either way) from the exact span
+            seconds = (segment.end_time - segment.start_time) / ONE_SECOND
+            self.assertLessEqual(abs(segment.duration_hours * 3600 - int(seconds)), 18)
+
+
+class RuleSetTests(TestCase):
+    def plan(self, miles, **trip_data):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return HOSCalculator({**benchmarks.trip_data(miles), **trip_data}).calculate()
+
+    def test_every_rule_set_plans_the_full_distance(self):
+        for name in RULE_SETS:
+            with self.subTest(rule_set=name):
+                result = self.plan(3000, rule_set=name)
+                driven = sum(s["distance_tenths"] for s in result["segments"] if s["segment_type"] == "driving")
+                self.assertEqual(driven, 30000)
+                self.assertEqual(result["segments"][-1]["segment_type"], "dropoff")
+
+    def test_rests_follow_the_rule_set(self):
+        def rests(result):
+            return [
+                (s["segment_type"], s["duration_seconds"] / 3600) for s in result["segments"]
+                if s["segment_type"] in ("sleeper_berth", "off_duty", "rest_break")
+            ]
+
+        self.assertEqual(set(rests(self.plan(3000, rule_set="passenger"))), {("sleeper_berth", 8.0)})
+        self.assertNotIn("rest_break", {s for s, _ in rests(self.plan(3000, rule_set="property_short_haul"))})
+
+    def test_adverse_conditions_extend_the_driving_limit(self):
+        def first_stretch(result):
+            hours = 0
+            for s in result["segments"]:
+                if s["segment_type"] == "sleeper_berth":
+                    return hours
+                if s["segment_type"] == "driving":
+                    hours += s["duration_seconds"] / 3600
+
+        self.assertEqual(first_stretch(self.plan(3000)), 11.0)
+        self.assertEqual(first_stretch(self.plan(3000, adverse_conditions=True)), 13.0)
+
+    def test_compiled_rule_sets_are_shared(self):
+        self.assertIs(compile_rule_set("passenger", False), compile_rule_set("passenger", False))
+        with self.assertRaises(ValueError):
+            compile_rule_set("unknown")
+
+    def test_create_trip_rejects_unknown_rule_set(self):
+        payload = {**benchmarks.trip_payload(), "rule_set": "unknown"}
+        response = self.client.post("/api/trips/", payload, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+
+class MultiStopTripTests(TestCase):
+    # Stops due west of the origin along one road, requested out of order
+    LONGITUDES = [-90.0, -88.0, -91.0, -89.0, -92.0]
+
+    def setUp(self):
+        cache.clear()
+
+    def payload(self, **overrides):
+        return {
+            "current_location": {"name": "Origin", "coords": [-87.0, 40.0]},
+            "stops": [
+                {"name": f"Stop {lon}", "coords": [lon, 40.0], "stop_type": "dropoff"}
+                for lon in self.LONGITUDES
+            ],
+            "start_time": benchmarks.START_TIME.isoformat(),
+            **overrides,
+        }
+
+    def post(self, payload):
+        def line_matrix(coordinates, sources, destinations, priority):
+            return [
+                [round(abs(coordinates[i][0] - coordinates[j][0]) * 53, 1) for j in destinations]
+                for i in sources
+            ]
+
+        with mock.patch.object(
+            DistanceCalculation, "calculate_openroute_matrix", side_effect=line_matrix
+        ) as matrix, contextlib.redirect_stdout(io.StringIO()):
+            response = self.client.post("/api/trips/multi-stop/", payload, content_type="application/json")
+        return response, matrix.call_count
+
+    def test_stops_are_reordered_to_cut_miles(self):
+        response, matrix_calls = self.post(self.payload())
+
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(matrix_calls, 1)
+        self.assertEqual([s["name"] for s in response.data["stops"]], [
+            "Stop -88.0", "Stop -89.0", "Stop -90.0", "Stop -91.0", "Stop -92.0"
+        ])
+        self.assertTrue(response.data["stop_order"]["optimized"])
+        self.assertAlmostEqual(response.data["stop_order"]["planned_miles"], 5 * 53, delta=0.5)
+        self.assertLess(response.data["stop_order"]["planned_miles"], response.data["stop_order"]["requested_order_miles"])
+
+        trip = Trip.objects.get(pk=response.data["id"])
+        stop_segments = list(trip.segments.filter(segment_type="dropoff").values_list("location__name", flat=True))
+        self.assertEqual(stop_segments, [s["name"] for s in response.data["stops"]])
+        driven = sum(s.distance_miles for s in trip.segments.filter(segment_type="driving"))
+        self.assertAlmostEqual(float(driven), 5 * 53, delta=1)
+        # Every stop is west of the Indiana line, on Central time
+        self.assertEqual({s["time_zone"] for s in response.data["stops"]}, {"America/Chicago"})
+        self.assertTrue(all(s["local_planned_arrival"].endswith("-06:00") for s in response.data["stops"]))
+
+    def test_matrix_is_reused_from_the_routing_cache(self):
+        self.post(self.payload())
+        response, matrix_calls = self.post(self.payload(optimize_stops=False))
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(matrix_calls, 0)
+        self.assertEqual([s["requested_position"] for s in response.data["stops"]], [1, 2, 3, 4, 5])
+
+    def test_time_windows_order_stops_and_wait_for_opening(self):
+        payload = self.payload()
+        # The farthest stop must be served first, and opens after the truck can get there
+        payload["stops"][4]["window_start"] = (benchmarks.START_TIME + timedelta(hours=5)).isoformat()
+        payload["stops"][4]["window_end"] = (benchmarks.START_TIME + timedelta(hours=7)).isoformat()
+
+        response, _ = self.post(payload)
+
+        self.assertEqual(response.status_code, 201, response.content)
+        first = response.data["stops"][0]
+        self.assertEqual(first["name"], "Stop -92.0")
+        self.assertEqual(response.data["stop_order"]["late_hours"], 0)
+        segment_types = [s["segment_type"] for s in response.data["segments"]]
+        first_stop = segment_types.index("dropoff")
+        self.assertEqual(set(segment_types[:first_stop - 1]), {"driving"})
+        self.assertEqual(segment_types[first_stop - 1], "wait")
+        self.assertEqual(first["planned_arrival"], payload["stops"][4]["window_start"].replace("+00:00", "Z"))
+
+    def test_far_off_window_waits_in_day_long_segments(self):
+        payload = self.payload(optimize_stops=False)
+        window_start = benchmarks.START_TIME + timedelta(days=10)
+        payload["stops"][0]["window_start"] = window_start.isoformat()
+
+        response, _ = self.post(payload)
+
+        self.assertEqual(response.status_code, 201, response.content)
+        trip = Trip.objects.get(pk=response.data["id"])
+        waits = list(trip.segments.filter(segment_type="wait").order_by("sequence_number"))
+        self.assertEqual(len(waits), 10)
+        self.assertTrue(all(w.duration_hours <= 24 for w in waits))
+        self.assertEqual(waits[-1].end_time, window_start)
+        self.assertEqual(response.data["stops"][0]["planned_arrival"], window_start.isoformat().replace("+00:00", "Z"))
+
+    def test_multi_stop_trips_cannot_be_replanned(self):
+        response, _ = self.post(self.payload())
+        with benchmarks.stub_openroute(100), contextlib.redirect_stdout(io.StringIO()):
+            replan = self.client.post(f"/api/trips/{response.data['id']}/replan/", {
+                "current_location": {"name": "Here", "coords": [-89.0, 40.0]},
+                "dropoff_location": {"name": "There", "coords": [-92.0, 40.0]},
+                "checkpoint_time": (benchmarks.START_TIME + timedelta(hours=3)).isoformat(),
+            }, content_type="application/json")
+        self.assertEqual(replan.status_code, 400)
+
+
+class TimeZoneTests(TestCase):
+    def plan(self, start_time, **trip_data):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return HOSCalculator({**benchmarks.trip_data(250), "start_time": start_time, **trip_data}).calculate()
+
+    def test_lookup_known_cities(self):
+        cities = {
+            (-87.6298, 41.8781): "America/Chicago",
+            (-86.1581, 39.7684): "America/New_York",
+            (-104.9903, 39.7392): "America/Denver",
+            (-112.0740, 33.4484): "America/Phoenix",
+            (-118.2437, 34.0522): "America/Los_Angeles",
+            (-74.0060, 40.7128): "America/New_York",
+        }
+        for (lon, lat), zone in cities.items():
+            with self.subTest(zone=zone, coords=(lon, lat)):
+                self.assertEqual(timezone_at(lon, lat), zone)
+        self.assertIsNone(timezone_at(-0.1276, 51.5072))
+
+    def test_index_splits_only_boundary_cells(self):
+        west = {"type": "Polygon", "coordinates": [[[0, 0], [1.5, 0], [1.5, 2], [0, 2], [0, 0]]]}
+        east = {"type": "Polygon", "coordinates": [[[1.5, 0], [3, 0], [3, 2], [1.5, 2], [1.5, 0]]]}
+        index = build_index([
+            {"properties": {"tzid": "Etc/GMT+1"}, "geometry": west},
+            {"properties": {"tzid": "Etc/GMT+2"}, "geometry": east},
+        ], cell_size=1.0)
+
+        self.assertEqual(index["cells"]["0,0"], "Etc/GMT+1")
+        self.assertIsInstance(index["cells"]["1,0"], list)
+        lookup = TimeZoneIndex(index).lookup
+        self.assertEqual(lookup(1.2, 0.5), "Etc/GMT+1")
+        self.assertEqual(lookup(1.8, 0.5), "Etc/GMT+2")
+        self.assertIsNone(lookup(5.0, 0.5))
+
+    def test_daily_logs_follow_home_terminal_clock(self):
+        # 03:00 UTC is still the evening before in Chicago
+        start_time = datetime(2025, 1, 6, 3, 0, tzinfo=dt_timezone.utc)
+
+        utc = self.plan(start_time)
+        chicago = self.plan(start_time, home_time_zone="America/Chicago")
+
+        self.assertEqual([log["log_date"].isoformat() for log in utc["daily_logs"]], ["2025-01-06"])
+        self.assertEqual(
+            [log["log_date"].isoformat() for log in chicago["daily_logs"]], ["2025-01-05", "2025-01-06"]
+        )
+        self.assertEqual(chicago["daily_logs"][0]["entries"][0]["start_second"], 21 * 3600)
+        self.assertEqual([s["start_time"] for s in chicago["segments"]], [s["start_time"] for s in utc["segments"]])
+
+    def test_create_trip_annotates_stops_with_local_time(self):
+        payload = {**benchmarks.trip_payload(), "home_terminal_time_zone": "America/Chicago"}
+        with benchmarks.stub_openroute(2000.0), contextlib.redirect_stdout(io.StringIO()):
+            response = self.client.post("/api/trips/", payload, content_type="application/json")
+
+        self.assertEqual(response.status_code, 201, response.content)
+        data = response.json()
+        self.assertEqual(data["home_terminal_time_zone"], "America/Chicago")
+        pickup, dropoff = data["segments"][0], data["segments"][-1]
+        self.assertEqual(pickup["time_zone"], "America/Chicago")
+        self.assertEqual(dropoff["time_zone"], "America/Los_Angeles")
+        for segment in (pickup, dropoff):
+            start_time = datetime.fromisoformat(segment["start_time"].replace("Z", "+00:00"))
+            self.assertEqual(
+                segment["local_start_time"],
+                start_time.astimezone(ZoneInfo(segment["time_zone"])).isoformat(),
+            )
+
+    def test_create_trip_rejects_unknown_time_zone(self):
+        payload = {**benchmarks.trip_payload(), "home_terminal_time_zone": "Mars/Olympus_Mons"}
+        response = self.client.post("/api/trips/", payload, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("home_terminal_time_zone", response.json())
+
+
+class LaneQuoteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_transit_summary_matches_full_plan(self):
+        for name in RULE_SETS:
+            for miles in (0, 12.7, 999.9, 1000.1, 2345.6, 9001.3):
+                with self.subTest(rule_set=name, miles=miles), contextlib.redirect_stdout(io.StringIO()):
+                    summary = HOSCalculator({**benchmarks.trip_data(miles), "rule_set": name}).calculate()["summary"]
+                    self.assertEqual(transit_summary(miles, name), {
+                        "driving_hours": hours_float(summary["driving_seconds"]),
+                        "transit_hours": hours_float(summary["trip_seconds"]),
+                        "fuel_stops": summary["fuel_stops"],
+                        "rest_stops": summary["required_rest_stops"],
+                    })
+
+    def test_lane_matrix_is_fetched_in_chunks_and_cached(self):
+        origins = [loc["coords"] for loc in benchmarks.lane_locations(3)]
+        destinations = [loc["coords"] for loc in benchmarks.lane_locations(6)[3:]]
+
+        with mock.patch("core.services.distance_matrix.MATRIX_CHUNK", 2), \
+                benchmarks.stub_openroute_matrix() as fetch:
+            matrix, estimated = lane_matrix(origins, destinations)
+            self.assertEqual(fetch.call_count, 4)
+            self.assertEqual(lane_matrix(origins, destinations), (matrix, estimated))
+            self.assertEqual(fetch.call_count, 4)
+
+        self.assertEqual(len(matrix), 3)
+        self.assertEqual(len(matrix[0]), 3)
+        self.assertFalse(any(any(row) for row in estimated))
+
+    def test_quote_grid_is_columnar_json_or_csv(self):
+        payload = {"origins": benchmarks.lane_locations(2), "destinations": benchmarks.lane_locations(5)[2:]}
+        with benchmarks.stub_openroute_matrix():
+            response = self.client.post("/api/lanes/quote/", payload, content_type="application/json")
+            csv_response = self.client.post(
+                "/api/lanes/quote/", {**payload, "format": "csv"}, content_type="application/json"
+            )
+
+        self.assertEqual(response.status_code, 200, response.content)
+        lanes = response.json()["lanes"]
+        self.assertEqual(lanes["origin"], [0, 0, 0, 1, 1, 1])
+        self.assertEqual(lanes["destination"], [0, 1, 2, 0, 1, 2])
+        self.assertEqual(len(lanes["transit_hours"]), 6)
+        self.assertTrue(all(hours > 2 for hours in lanes["transit_hours"]))
+
+        self.assertEqual(csv_response["Content-Type"], "text/csv")
+        rows = csv_response.content.decode().splitlines()
+        self.assertEqual(rows[0], ",".join(LANE_COLUMNS))
+        self.assertEqual(len(rows), 7)
+        self.assertTrue(rows[1].startswith("City 0,City 2,"))
+
+
+class SimulationTests(TestCase):
+    def setUp(self):
+        trip_simulator.clear()
+
+    def scenario(self, **values):
+        serializer = TripScenarioSerializer(data=values)
+        serializer.is_valid(raise_exception=True)
+        return {"name": "test", **serializer.validated_data}
+
+    def test_fresh_scenario_matches_full_plan(self):
+        for name in RULE_SETS:
+            for miles in (12.7, 999.9, 2345.6, 9001.3):
+                with self.subTest(rule_set=name, miles=miles), contextlib.redirect_stdout(io.StringIO()):
+                    summary = HOSCalculator({**benchmarks.trip_data(miles), "rule_set": name}).calculate()["summary"]
+                    result = trip_simulator.simulate_scenario(
+                        miles, self.scenario(rule_set=name), benchmarks.START_TIME
+                    )
+                    self.assertEqual(result["estimated_arrival"], summary["estimated_arrival"])
+                    self.assertEqual(result["trip_hours"], hours_float(summary["trip_seconds"]))
+                    self.assertEqual(result["driving_hours"], hours_float(summary["driving_seconds"]))
+                    self.assertEqual(result["fuel_stops"], summary["fuel_stops"])
+                    self.assertEqual(result["required_rest_stops"], summary["required_rest_stops"])
+
+    def test_plan_totals_match_the_planner(self):
+        stop = HOSCalculator.STOP_SECONDS
+        on_duty = {"fuel", "pickup", "dropoff"}
+        for name in RULE_SETS:
+            for adverse in (False, True):
+                rules = compile_rule_set(name, adverse)
+                for miles in (0.4, 612.5, 1999.9, 4321.0):
+                    with self.subTest(rule_set=name, adverse=adverse, miles=miles), \
+                            contextlib.redirect_stdout(io.StringIO()):
+                        segments = HOSCalculator({
+                            **benchmarks.trip_data(miles), "rule_set": name, "adverse_conditions": adverse
+                        }).calculate()["segments"]
+                        totals = trip_simulator.plan_totals(rules, trip_simulator.departure_state(rules, miles))
+
+                        def total(*types):
+                            return sum(s["duration_seconds"] for s in segments if s["segment_type"] in types)
+
+                        self.assertEqual(totals, trip_simulator.PlanTotals(
+                            trip_seconds=total(*HOSCalculator.SEGMENT_DUTY_STATUS) - stop,
+                            driving_seconds=total("driving"),
+                            on_duty_seconds=total(*on_duty) - stop,
+                            fuel_stops=sum(s["segment_type"] == "fuel" for s in segments),
+                            rest_stops=sum(s["segment_type"] == "sleeper_berth" for s in segments),
+                        ))
+
+    def test_counters_match_replan_from_the_same_state(self):
+        rng = random.Random(7)
+        stop = HOSCalculator.STOP_SECONDS
+        for _ in range(40):
+            name = rng.choice(list(RULE_SETS))
+            miles = round(rng.uniform(50, 3000), 1)
+            driving, window, since_break = (rng.randrange(0, 9 * 3600) for _ in range(3))
+            fuel = rng.randrange(0, 900)
+            with self.subTest(rule_set=name, miles=miles), contextlib.redirect_stdout(io.StringIO()):
+                calculator = HOSCalculator({**benchmarks.trip_data(miles), "rule_set": name})
+                summary = calculator.replan({
+                    "current_time": benchmarks.START_TIME + timedelta(seconds=stop),
+                    "sequence": 2,
+                    "driving_seconds": driving,
+                    "window_seconds": window + stop,
+                    "since_break_seconds": since_break,
+                    "units_since_fuel": to_units(fuel),
+                })["summary"]
+                result = trip_simulator.simulate_scenario(miles, self.scenario(
+                    rule_set=name, driving_hours=driving / 3600, window_hours=window / 3600,
+                    since_break_hours=since_break / 3600, miles_since_fuel=fuel,
+                ), benchmarks.START_TIME)
+                self.assertEqual(result["estimated_arrival"], summary["estimated_arrival"])
+                self.assertEqual(result["driving_hours"], hours_float(summary["driving_seconds"]))
+                self.assertEqual(result["fuel_stops"], summary["fuel_stops"])
+
+    def test_reset_delay_starts_fresh_and_reuses_the_plan(self):
+        fresh = trip_simulator.simulate_scenario(1800, self.scenario(), benchmarks.START_TIME)
+        states = sum(len(memo) for memo in trip_simulator._suffixes.values())
+
+        after_reset = trip_simulator.simulate_scenario(
+            1800, self.scenario(delay_hours=10, driving_hours=9, window_hours=12), benchmarks.START_TIME
+        )
+        self.assertEqual(sum(len(memo) for memo in trip_simulator._suffixes.values()), states)
+        self.assertEqual(after_reset["departure"], benchmarks.START_TIME + timedelta(hours=10))
+        self.assertEqual(after_reset["estimated_arrival"], fresh["estimated_arrival"] + timedelta(hours=10))
+
+        tired = trip_simulator.simulate_scenario(
+            1800, self.scenario(driving_hours=9, window_hours=12), benchmarks.START_TIME
+        )
+        self.assertGreater(tired["estimated_arrival"], fresh["estimated_arrival"])
+
+    def test_endpoint_compares_scenarios_without_saving(self):
+        payload = {
+            **benchmarks.trip_payload(),
+            "start_time": benchmarks.START_TIME.isoformat(),
+            "scenarios": [
+                {"name": "Leave now", "driving_hours": 6, "window_hours": 8, "current_cycle_used": 65},
+                {"name": "After reset", "delay_hours": 10, "driving_hours": 6, "window_hours": 8},
+                {"rule_set": "passenger"},
+            ],
+        }
+        response = self.client.post("/api/trips/simulate/", payload, content_type="application/json")
+
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()
+        self.assertGreater(data["trip_miles"], 1500)
+        self.assertEqual([s["name"] for s in data["scenarios"]], ["Leave now", "After reset", "Scenario 3"])
+        self.assertTrue(data["scenarios"][0]["cycle_exceeded"])
+        self.assertFalse(data["scenarios"][1]["cycle_exceeded"])
+        self.assertFalse(Trip.objects.exists())
+
+        self.assertEqual(self.client.post(
+            "/api/trips/simulate/", {"scenarios": [{}]}, content_type="application/json"
+        ).status_code, 400)
+        self.assertEqual(self.client.post(
+            "/api/trips/simulate/", {"trip_miles": 100, "scenarios": [{}] * 101}, content_type="application/json"
+        ).status_code, 400)
+
+
+class TripCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # The on-commit callbacks run below cache location ids the test rollback removes
+        self.addCleanup(locations.clear)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.trip = benchmarks.create_planned_trip(benchmarks.TRIP_LENGTHS["medium"])
+
+    def test_repeat_reads_are_served_from_cache(self):
+        first = self.client.get(f"/api/trips/{self.trip.pk}/")
+        with self.assertNumQueries(0):
+            second = self.client.get(f"/api/trips/{self.trip.pk}/")
+        self.assertEqual(first.content, second.content)
+
+    def test_writes_invalidate_on_commit(self):
+        self.client.get(f"/api/trips/{self.trip.pk}/")
+        segment = self.trip.segments.get(sequence_number=1)
+        segment.location = Location.objects.create(name="Hammond, IN")
+
+        with mock.patch("core.services.trip_cache._bump", wraps=trip_cache._bump) as bump, \
+                self.captureOnCommitCallbacks(execute=True):
+            segment.save()
+            self.trip.save()
+            # Not visible until the transaction commits
+            self.assertNotIn(b"Hammond, IN", self.client.get(f"/api/trips/{self.trip.pk}/").content)
+        bump.assert_called_once_with({self.trip.pk})
+
+        self.assertIn(b"Hammond, IN", self.client.get(f"/api/trips/{self.trip.pk}/").content)
+
+    def test_saving_a_plan_queues_one_flush_per_trip_write(self):
+        with self.captureOnCommitCallbacks() as callbacks, contextlib.redirect_stdout(io.StringIO()):
+            trip = benchmarks.create_planned_trip(benchmarks.TRIP_LENGTHS["medium"])
+        flushes = [c for c in callbacks if getattr(c, "func", None) is trip_cache._flush]
+
+        self.assertGreater(trip.segments.count() + LogEntry.objects.filter(daily_log__trip=trip).count(), 20)
+        # Trip.objects.create, the trip's save in save_trip_results and its explicit invalidation
+        self.assertEqual(len(flushes), 3)
+
+    def test_admin_edits_to_child_rows_invalidate(self):
+        self.client.get(f"/api/trips/{self.trip.pk}/")
+        entry = LogEntry.objects.filter(daily_log__trip=self.trip).first()
+        entry.location = Location.objects.create(name="Hammond, IN")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            admin.site._registry[LogEntry].save_model(None, entry, None, True)
+
+        self.assertIn(b"Hammond, IN", self.client.get(f"/api/trips/{self.trip.pk}/").content)
+
+    def test_rolled_back_invalidation_does_not_block_the_next(self):
+        self.client.get(f"/api/trips/{self.trip.pk}/")
+        with contextlib.suppress(RuntimeError), transaction.atomic():
+            trip_cache.invalidate_trip(self.trip.pk)
+            raise RuntimeError
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            trip_cache.invalidate_trip(self.trip.pk)
+        self.assertTrue(callbacks)
+        self.assertIsNone(cache.get(f"trip-response:{self.trip.pk}"))
+
+    def test_missing_trip_is_not_cached(self):
+        self.assertEqual(self.client.get("/api/trips/999999/").status_code, 404)
+        self.assertIsNone(cache.get("trip-response:999999"))
+
+    def test_stale_entry_is_recomputed_by_one_reader(self):
+        get_trip_json(1, lambda: b"v1")
+        entry = cache.get("trip-response:1")
+        cache.set("trip-response:1", (entry[0], time.time() - 1, entry[2]))
+        cache.add("trip-response-lock:1", True)
+
+        # Another reader holds the lock: serve the stale copy without rendering
+        self.assertEqual(get_trip_json(1, lambda: self.fail("rendered while locked")), b"v1")
+        cache.delete("trip-response-lock:1")
+        self.assertEqual(get_trip_json(1, lambda: b"v2"), b"v2")
+
+    def test_concurrent_misses_render_once(self):
+        renders = []
+
+        def render():
+            renders.append(1)
+            time.sleep(0.1)
+            return b"body"
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            bodies = list(pool.map(lambda _: get_trip_json(2, render), range(8)))
+
+        self.assertEqual(bodies, [b"body"] * 8)
+        self.assertEqual(len(renders), 1)
+
+
+class FakeClock:
+    # 2027-01-15 08:00 UTC
+    def __init__(self, now=1800000000.0):
+        self.now = now
+        self.slept = 0.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+        self.slept += seconds
+
+
+@override_settings(OPENROUTE_QUOTAS={"directions": (60, 100), "matrix": (6, 10), "geocode": (10, 1000)})
+class RateLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.clock = FakeClock()
+        patcher = mock.patch.object(openroute_quota, "time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def drain(self, endpoint, calls):
+        for _ in range(calls):
+            openroute_quota.acquire(endpoint)
+
+    def bucket(self, name):
+        return RateLimitBucket.objects.get(name=name)
+
+    def test_calls_past_the_quota_are_shed(self):
+        self.drain("matrix", 6)
+        with self.assertRaises(openroute_quota.QuotaExceeded) as raised:
+            openroute_quota.acquire("matrix")
+        # One token every 10 s is too long for routing to wait
+        self.assertAlmostEqual(raised.exception.retry_after, 10)
+        self.assertEqual(self.clock.slept, 0)
+        minute = self.bucket("matrix:minute")
+        self.assertEqual((minute.granted, minute.shed), (6, 1))
+        self.assertEqual(self.bucket("matrix:day").tokens, 4)
+
+    def test_lower_priorities_leave_a_reserve_for_routing(self):
+        granted = 0
+        with self.assertRaises(openroute_quota.QuotaExceeded):
+            while True:
+                openroute_quota.acquire("geocode", openroute_quota.AUTOCOMPLETE)
+                granted += 1
+        self.assertEqual(granted, 7)
+        self.drain("geocode", 3)
+        self.assertEqual(self.clock.slept, 0)
+
+    def test_routing_waits_for_the_minute_bucket_to_refill(self):
+        self.drain("directions", 60)
+        openroute_quota.acquire("directions")
+        self.assertAlmostEqual(self.clock.slept, 1)
+        self.assertEqual(self.bucket("directions:minute").shed, 0)
+
+    def test_day_quota_resets_at_midnight_utc(self):
+        self.clock.now += openroute_quota.MINUTE
+        self.drain("matrix", 6)
+        self.clock.now += 10 * openroute_quota.MINUTE
+        self.drain("matrix", 4)
+        with self.assertRaises(openroute_quota.QuotaExceeded) as raised:
+            openroute_quota.acquire("matrix")
+        self.assertAlmostEqual(raised.exception.retry_after, 16 * 3600 - 11 * 60)
+        # The minute token taken before the day bucket refused is given back
+        minute = self.bucket("matrix:minute")
+        self.assertEqual((minute.tokens, minute.granted), (2, 10))
+
+        self.clock.now += raised.exception.retry_after
+        openroute_quota.acquire("matrix")
+        self.assertEqual(self.bucket("matrix:day").tokens, 9)
+
+    def test_lane_matrix_stops_fetching_once_shed(self):
+        origins = [loc["coords"] for loc in benchmarks.lane_locations(2)]
+        destinations = [loc["coords"] for loc in benchmarks.lane_locations(4)[2:]]
+        self.drain("matrix", 6)
+        with mock.patch("core.services.distance_matrix.MATRIX_CHUNK", 1), mock.patch("requests.post") as post:
+            matrix, estimated = lane_matrix(origins, destinations, priority=openroute_quota.BATCH)
+        post.assert_not_called()
+        self.assertTrue(all(all(row) for row in estimated))
+        self.assertEqual(self.bucket("matrix:minute").shed, 1)
+
+    def test_upstream_429_empties_the_minute_bucket(self):
+        with mock.patch("requests.post", return_value=mock.Mock(status_code=429)) as post, \
+                contextlib.redirect_stdout(io.StringIO()):
+            self.assertIsNone(DistanceCalculation().calculate_openroute_distance([(-87.6, 41.9), (-87.3, 41.6)]))
+            # The next call waits for a token rather than hitting OpenRouteService at once
+            DistanceCalculation().calculate_openroute_distance([(-87.6, 41.9), (-87.3, 41.6)])
+        self.assertEqual(post.call_count, 2)
+        self.assertAlmostEqual(self.clock.slept, 1)
+        self.assertEqual(self.bucket("directions:minute").upstream_throttled, 2)
+
+    def test_autocomplete_is_shed_with_retry_after(self):
+        self.drain("geocode", 7)
+        with mock.patch("requests.get") as get:
+            response = self.client.get("/api/geocode/autocomplete/", {"q": "Chicago"})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "6")
+        get.assert_not_called()
+
+    def test_shed_trip_routing_falls_back_to_estimated_miles(self):
+        payload = benchmarks.trip_payload()
+        self.drain("directions", 60)
+        self.clock.now += openroute_quota.MINUTE
+        self.drain("directions", 40)
+        with mock.patch("requests.post") as post, contextlib.redirect_stdout(io.StringIO()), \
+                self.assertLogs("core.views", "WARNING") as logs:
+            response = self.client.post("/api/trips/", payload, content_type="application/json")
+        post.assert_not_called()
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertIn("Routing unavailable", logs.output[0])
+        coordinates = [payload[field]["coords"] for field in ("current_location", "pickup_location", "dropoff_location")]
+        self.assertAlmostEqual(float(response.json()["total_distance"]), cached_route_miles(coordinates)[0])
+        self.assertEqual(self.bucket("directions:day").shed, 1)
+
+    def test_quota_endpoint_reports_usage(self):
+        self.drain("directions", 15)
+        self.drain("matrix", 6)
+        with self.assertRaises(openroute_quota.QuotaExceeded):
+            openroute_quota.acquire("matrix", openroute_quota.BATCH)
+        response = self.client.get("/api/routing/quota/")
+
+        self.assertEqual(response.status_code, 200)
+        buckets = {(b["endpoint"], b["period"]): b for b in response.json()["buckets"]}
+        self.assertEqual(len(buckets), 6)
+        self.assertEqual(buckets["directions", "minute"]["remaining"], 45)
+        self.assertEqual(buckets["directions", "day"]["utilization"], 0.15)
+        self.assertEqual(buckets["matrix", "minute"]["shed"], 1)
+        self.assertEqual(buckets["geocode", "day"]["granted"], 0)
+
+
+class StartupTests(TestCase):
+    def test_api_profile_defers_routing_and_drops_unused_apps(self):
+        modules = benchmarks.import_profile("truck_tracker.settings_api")["modules"]
+
+        self.assertIn("core.views", modules)
+        for name in (
+            "core.services.distance_calculator",
+            "core.services.lane_pricing",
+            "core.services.stop_optimizer",
+            "django.contrib.sessions.backends.base",
+            "django.contrib.staticfiles.finders",
+            "django.contrib.auth.forms",
+        ):
+            self.assertNotIn(name, modules)
+
+    @override_settings(REST_FRAMEWORK={
+        "DEFAULT_AUTHENTICATION_CLASSES": ["rest_framework.authentication.TokenAuthentication"],
+    })
+    def test_api_profile_saves_trips_against_the_token_user(self):
+        from rest_framework.authtoken.models import Token
+
+        driver = User.objects.create_user("driver")
+        token = Token.objects.create(user=driver)
+        with benchmarks.stub_openroute(800.0), contextlib.redirect_stdout(io.StringIO()):
+            response = self.client.post(
+                "/api/trips/", benchmarks.trip_payload(), content_type="application/json",
+                HTTP_AUTHORIZATION=f"Token {token.key}",
+            )
+
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(Trip.objects.get(pk=response.json()["id"]).user, driver)
@@ -4,8 +4,24 @@ from . import views
 urlpatterns = [
     # Main assessment endpoint
     path('api/trips/', views.create_trip, name='create_trip'),
+    path('api/trips/multi-stop/', views.create_multi_stop_trip, name='create_multi_stop_trip'),
     path('api/trips/list/', views.trip_list, name='trip_list'),
+    path('api/trips/simulate/', views.simulate_trip, name='simulate_trip'),
     path('api/trips/<int:trip_id>/', views.get_trip, name='get_trip'),
+    path('api/trips/<int:trip_id>/stops/', views.trip_stops, name='trip_stops'),
+    path('api/trips/<int:trip_id>/replan/', views.replan_trip, name='replan_trip'),
+    path('api/trips/<int:trip_id>/logs/sheets/', views.eld_sheet_index, name='eld_sheet_index'),
+    path('api/trips/<int:trip_id>/logs/sheets.svg', views.eld_sheets, name='eld_sheets'),
+    path('api/trips/<int:trip_id>/logs/<int:day_number>/sheet.svg', views.eld_sheet, {'fmt': 'svg'}, name='eld_sheet'),
+    path('api/trips/<int:trip_id>/logs/<int:day_number>/sheet.png', views.eld_sheet, {'fmt': 'png'}, name='eld_sheet_png'),
+    path('api/lanes/quote/', views.lane_quotes, name='lane_quotes'),
+    path('api/drivers/<int:driver_id>/timeline/', views.driver_timeline, name='driver_timeline'),
+    path('api/drivers/<int:driver_id>/position/', views.driver_position, name='driver_position'),
+    path('api/drivers/<int:driver_id>/duty-status/', views.driver_duty_status, name='driver_duty_status'),
+    path('api/positions/', views.ingest_positions, name='ingest_positions'),
+    path('api/alerts/', views.alert_feed, name='alert_feed'),
+    path('api/analytics/fleet/', views.fleet_analytics, name='fleet_analytics'),
     path('api/geocode/autocomplete/', views.geocode_autocomplete, name='geocode_autocomplete'),
+    path('api/routing/quota/', views.routing_quota, name='routing_quota'),
 
 ]
@@ -2,18 +2,103 @@ from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
 from django.utils import timezone
-from django.db import transaction
+from django.utils.dateparse import parse_datetime
+from datetime import timedelta
+from django.db import transaction, IntegrityError
 from decimal import Decimal
 from django.conf import settings
-import requests
-from django.http import JsonResponse
+import copy
+import logging
+import math
+from django.http import JsonResponse, HttpResponse, HttpResponseNotModified
+from django.urls import reverse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
 
 
 
-from .models import Trip, TripSegment, DailyLog, LogEntry
-from .serializers import TripCreateSerializer, TripResponseSerializer
+from .models import Trip, TripStop, TripProgress
+from .serializers import (
+    TripCreateSerializer, TripReplanSerializer, TripResponseSerializer, DutyIntervalSerializer,
+    MultiStopTripCreateSerializer, TripStopSerializer, LaneQuoteSerializer, TripSimulationSerializer,
+    FleetAnalyticsQuerySerializer,
+    DutyStatusEventSerializer, AlertFeedQuerySerializer, fast_trip_response_data, render_trip_json
+)
 from .services.hos_calculator import HOSCalculator
-from .services.distance_calculator import DistanceCalculation
+from .services.hos_rules import compile_rule_set
+from .services.driver_timeline import intervals_overlapping
+from .services import hos_monitor, locations, openroute_quota, positions
+from .services.fleet_rollups import fleet_totals
+from .services.request_coalescing import SingleFlight, request_fingerprint, shared_route, trip_plan_key
+from .services import eld_renderer
+from .services.trip_cache import get_trip_json
+from .services.trip_persistence import save_replan_results, save_trip_results, trip_calculator_data
+from .services.trip_replanner import ReplanError, build_checkpoint
+from .services.trip_simulator import simulate_scenario
+from .services.timezones import timezone_at_or_default
+
+# Routing, geocoding and lane pricing pull in `requests` and are imported in
+# the views that use them, so API workers don't pay for them at boot.
+
+logger = logging.getLogger(__name__)
+
+
+# Identical concurrent trip requests in this process share one plan
+_trip_plans = SingleFlight()
+
+
+def _plan_trip(plan_key, coordinates, calculator_data):
+    def route_distance():
+        from .services.distance_calculator import DistanceCalculation
+        
+        distance_calculator = DistanceCalculation()
+    
+        distance_miles = distance_calculator.calculate_openroute_distance(coordinates)
+        print(f"DEBUG: distance_miles = {distance_miles}, type = {type(distance_miles)}")
+
+        
+        if distance_miles is None or distance_miles <= 0:
+            from .services.distance_matrix import cached_route_miles
+            
+            # Routing failed or the quota is spent: cached legs, else great-circle estimates
+            distance_miles = cached_route_miles(coordinates)[0]
+            logger.warning(f"Routing unavailable, estimated distance: {distance_miles} miles")
+        
+        print(f"Calculated distance: {distance_miles} miles")
+        return distance_miles
+    
+    distance_miles, start_time = shared_route(plan_key, route_distance)
+    if distance_miles <= 0:
+        return distance_miles, None
+    
+    calculator = HOSCalculator({
+        **calculator_data,
+        'start_time': start_time,
+        'trip_miles': float(distance_miles),
+    })
+    return distance_miles, calculator.calculate()
+
+
+def _idempotency(request):
+    """The request's Idempotency-Key (or None) and the fingerprint a replay must match"""
+    idempotency_key = request.headers.get('Idempotency-Key', '').strip() or None
+    if idempotency_key is None:
+        return None, ''
+    user_id = request.user.pk if request.user.is_authenticated else None
+    return idempotency_key, request_fingerprint(user_id, request.data)
+
+
+def _replay_trip(idempotency_key, fingerprint, render):
+    """Response for a request whose Idempotency-Key already created a trip, or None if it's new"""
+    existing = Trip.objects.filter(idempotency_key=idempotency_key).first()
+    if existing is None:
+        return None
+    if existing.idempotency_fingerprint != fingerprint:
+        return Response(
+            {'error': 'Idempotency-Key was already used for a different request'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    return Response(render(existing), status=status.HTTP_200_OK)
 
 
 @api_view(['POST'])
@@ -23,93 +108,360 @@ def create_trip(request):
     if not serializer.is_valid():
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    # Retries carrying the same Idempotency-Key get the trip created the first time
+    idempotency_key, fingerprint = _idempotency(request)
+    if idempotency_key:
+        replay = _replay_trip(idempotency_key, fingerprint, lambda trip: TripResponseSerializer(trip).data)
+        if replay:
+            return replay
+    
     try:
+        trip_data = serializer.validated_data
+        print("Trip Data:", trip_data)
+        
+
+        current_loc = trip_data.get('current_location', {})
+        pickup_loc = trip_data.get('pickup_location', {})
+        dropoff_loc = trip_data.get('dropoff_location', {})
+        cycle_used = trip_data.get('current_cycle_used', 0)
+
+        if not current_loc or not pickup_loc or not dropoff_loc:
+            return Response(
+                {'error': 'Missing location data'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        current_coords = current_loc.get('coords')
+        pickup_coords = pickup_loc.get('coords')
+        dropoff_coords = dropoff_loc.get('coords')
+        
+        if not all([current_coords, pickup_coords, dropoff_coords]):
+            return Response(
+                {'error': 'Missing coordinate data'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        coordinates = [
+            tuple(current_coords),
+            tuple(pickup_coords),
+            tuple(dropoff_coords)
+        ]
+        
+        calculator_data = trip_calculator_data(trip_data)
+        home_time_zone = calculator_data['home_time_zone']
+        
+        plan_key = trip_plan_key(trip_data)
+        distance_miles, result = _trip_plans.do(
+            plan_key, lambda: _plan_trip(plan_key, coordinates, calculator_data)
+        )
+
+        if distance_miles <= 0:
+            return Response(
+                {'error': 'Invalid route distance calculated'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # The plan may be shared with other requests and save_trip_results mutates it
+        result = copy.deepcopy(result)
+        
         with transaction.atomic():
-            trip_data = serializer.validated_data
-            print("Trip Data:", trip_data)
+            names = [calculator_data[field] for field in ('current_location', 'pickup_location', 'dropoff_location')]
+            location_ids = locations.intern(names, dict(zip(names, coordinates)))
+            trip = Trip.objects.create(
+                user=request.user if request.user.is_authenticated else None,
+                current_location_id=location_ids[names[0]],
+                pickup_location_id=location_ids[names[1]],
+                dropoff_location_id=location_ids[names[2]],
+                current_cycle_used=float(cycle_used) if cycle_used is not None else 0.0,
+                rule_set=calculator_data['rule_set'],
+                adverse_conditions=calculator_data['adverse_conditions'],
+                home_terminal_time_zone=home_time_zone,
+                total_distance=float(distance_miles),
+                idempotency_key=idempotency_key,
+                idempotency_fingerprint=fingerprint
+            )
             
+            save_trip_results(trip, result)
+        
+        return Response(
+            TripResponseSerializer(trip).data,
+            status=status.HTTP_201_CREATED
+        )
+    except IntegrityError as e:
+        # A concurrent retry with the same Idempotency-Key won the insert
+        replay = idempotency_key and _replay_trip(
+            idempotency_key, fingerprint, lambda trip: TripResponseSerializer(trip).data
+        )
+        if replay:
+            return replay
+        return Response(
+            {'error': f'Error calculating trip: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    except Exception as e:
+        return Response(
+            {'error': f'Error calculating trip: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
 
-            current_loc = trip_data.get('current_location', {})
-            pickup_loc = trip_data.get('pickup_location', {})
-            dropoff_loc = trip_data.get('dropoff_location', {})
-            cycle_used = trip_data.get('current_cycle_used', 0)
 
-            if not current_loc or not pickup_loc or not dropoff_loc:
-                return Response(
-                    {'error': 'Missing location data'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            current_coords = current_loc.get('coords')
-            pickup_coords = pickup_loc.get('coords')
-            dropoff_coords = dropoff_loc.get('coords')
-            
-            if not all([current_coords, pickup_coords, dropoff_coords]):
-                return Response(
-                    {'error': 'Missing coordinate data'},
-                    status=status.HTTP_400_BAD_REQUEST
+@api_view(['POST'])
+def create_multi_stop_trip(request):
+    """Plan a trip through several pickups and deliveries, optionally reordering them"""
+    from .services.distance_matrix import distance_matrix
+    from .services.stop_optimizer import evaluate_stop_order, optimize_stop_order
+    
+    serializer = MultiStopTripCreateSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    idempotency_key, fingerprint = _idempotency(request)
+    if idempotency_key:
+        replay = _replay_trip(idempotency_key, fingerprint, _multi_stop_response)
+        if replay:
+            return replay
+    
+    data = serializer.validated_data
+    current_loc = data['current_location']
+    stops = data['stops']
+    start_time = data.get('start_time') or timezone.now()
+    cycle_used = float(data['current_cycle_used'])
+    rules = compile_rule_set(data['rule_set'], data['adverse_conditions'])
+    home_time_zone = data['home_terminal_time_zone']
+    
+    try:
+        # One matrix for every leg the optimizer might consider
+        matrix = distance_matrix([current_loc['coords']] + [stop['coords'] for stop in stops])
+        
+        requested = evaluate_stop_order(matrix, stops, start_time, rules)
+        chosen = requested
+        if data['optimize_stops']:
+            optimized = optimize_stop_order(matrix, stops, start_time, rules)
+            if optimized.cost < requested.cost:
+                chosen = optimized
+        
+        legs, previous = [], 0
+        for index in chosen.order:
+            stop = stops[index]
+            legs.append({
+                'location': stop['name'],
+                'stop_type': stop['stop_type'],
+                'leg_miles': matrix[previous][index + 1],
+                'window_start': stop['window_start'],
+                'time_zone': timezone_at_or_default(stop['coords'], home_time_zone),
+            })
+            previous = index + 1
+        
+        calculator = HOSCalculator({
+            'start_time': start_time,
+            'stops': legs,
+            'current_cycle_used': cycle_used,
+            'rule_set': data['rule_set'],
+            'adverse_conditions': data['adverse_conditions'],
+            'home_time_zone': home_time_zone,
+            'current_location': str(current_loc['name']),
+            'pickup_location': legs[0]['location'],
+            'dropoff_location': legs[-1]['location']
+        })
+        result = calculator.calculate()
+        arrivals = [s['start_time'] for s in result['segments'] if s['segment_type'] in ('pickup', 'dropoff')]
+        
+        with transaction.atomic():
+            location_ids = locations.intern(
+                [str(current_loc['name'])] + [stop['name'] for stop in stops],
+                {str(current_loc['name']): current_loc['coords'], **{stop['name']: stop['coords'] for stop in stops}}
+            )
+            trip = Trip.objects.create(
+                user=request.user if request.user.is_authenticated else None,
+                current_location_id=location_ids[str(current_loc['name'])],
+                pickup_location_id=location_ids[legs[0]['location']],
+                dropoff_location_id=location_ids[legs[-1]['location']],
+                current_cycle_used=cycle_used,
+                rule_set=data['rule_set'],
+                adverse_conditions=data['adverse_conditions'],
+                home_terminal_time_zone=home_time_zone,
+                total_distance=round(chosen.miles, 1),
+                idempotency_key=idempotency_key,
+                idempotency_fingerprint=fingerprint
+            )
+            save_trip_results(trip, result)
+            TripStop.objects.bulk_create([
+                TripStop(
+                    trip=trip,
+                    sequence_number=sequence,
+                    requested_position=index + 1,
+                    stop_type=stops[index]['stop_type'],
+                    name=stops[index]['name'],
+                    longitude=stops[index]['coords'][0],
+                    latitude=stops[index]['coords'][1],
+                    window_start=stops[index]['window_start'],
+                    window_end=stops[index]['window_end'],
+                    time_zone=leg['time_zone'],
+                    leg_miles=Decimal(str(leg['leg_miles'])),
+                    planned_arrival=arrival
                 )
-            
-            coordinates = [
-                tuple(current_coords),
-                tuple(pickup_coords),
-                tuple(dropoff_coords)
-            ]
+                for sequence, (index, leg, arrival) in enumerate(zip(chosen.order, legs, arrivals), start=1)
+            ])
+        
+        return Response(
+            _multi_stop_response(trip, {
+                'optimized': chosen is not requested,
+                'requested_order_miles': round(requested.miles, 1),
+                'planned_miles': round(chosen.miles, 1),
+                'late_hours': round(chosen.lateness_hours, 2),
+            }),
+            status=status.HTTP_201_CREATED
+        )
+    except IntegrityError as e:
+        replay = idempotency_key and _replay_trip(idempotency_key, fingerprint, _multi_stop_response)
+        if replay:
+            return replay
+        return Response(
+            {'error': f'Error calculating trip: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    except Exception as e:
+        return Response(
+            {'error': f'Error calculating trip: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+def _multi_stop_response(trip, stop_order=None):
+    data = TripResponseSerializer(trip).data
+    data['stops'] = TripStopSerializer(trip.stops.all(), many=True).data
+    if stop_order is not None:
+        data['stop_order'] = stop_order
+    return data
 
-            distance_calculator = DistanceCalculation()
+
+@api_view(['GET'])
+def trip_stops(request, trip_id):
+    if not Trip.objects.filter(id=trip_id).exists():
+        return Response({'error': 'Trip not found'}, status=status.HTTP_404_NOT_FOUND)
+    stops = TripStop.objects.filter(trip_id=trip_id).order_by('sequence_number')
+    return Response(TripStopSerializer(stops, many=True).data)
+
+
+@api_view(['POST'])
+def lane_quotes(request):
+    """Miles and HOS-compliant transit time for every origin x destination lane"""
+    from .services.lane_pricing import lanes_csv, quote_lanes
+    
+    serializer = LaneQuoteSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    data = serializer.validated_data
+    grid = quote_lanes(data['origins'], data['destinations'], data['rule_set'], data['adverse_conditions'])
+    if data['format'] == 'csv':
+        response = HttpResponse(lanes_csv(grid), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="lane-quotes.csv"'
+        return response
+    return Response(grid)
+
+
+@api_view(['POST'])
+def simulate_trip(request):
+    """Plan summaries for one route under several scenarios, side by side; nothing is saved"""
+    serializer = TripSimulationSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    data = serializer.validated_data
+    miles, estimated = data.get('trip_miles'), False
+    if miles is None:
+        from .services.distance_matrix import cached_route_miles
         
-            distance_miles = distance_calculator.calculate_openroute_distance(coordinates)
-            print(f"DEBUG: distance_miles = {distance_miles}, type = {type(distance_miles)}")
+        # Cached legs or estimates only: comparing scenarios never waits on routing
+        miles, estimated = cached_route_miles(
+            [data[field]['coords'] for field in ('current_location', 'pickup_location', 'dropoff_location')]
+        )
+    start_time = data.get('start_time') or timezone.now()
+    return Response({
+        'trip_miles': miles,
+        'distance_estimated': estimated,
+        'scenarios': [simulate_scenario(miles, scenario, start_time) for scenario in data['scenarios']],
+    })
 
-            
-            if distance_miles is None or distance_miles <= 0:
-                print("All distance calculations failed, using default")
-                distance_miles = 500.0  # Safe fallback
-            
-            print(f"Calculated distance: {distance_miles} miles")
 
-            if distance_miles <= 0:
-                return Response(
-                    {'error': 'Invalid route distance calculated'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            trip = Trip.objects.create(
-                current_location=str(current_loc.get('name', '')),
-                pickup_location=str(pickup_loc.get('name', '')),
-                dropoff_location=str(dropoff_loc.get('name', '')),
-                current_cycle_used=float(cycle_used) if cycle_used is not None else 0.0,
-                total_distance=float(distance_miles)
-            )
+@api_view(['POST'])
+def replan_trip(request, trip_id):
+    """Re-route an existing trip from where the truck is now, keeping what was already driven"""
+    from .services.distance_calculator import DistanceCalculation
+    from .services.distance_matrix import cached_route_miles
+    
+    serializer = TripReplanSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    data = serializer.validated_data
+    current_loc = data['current_location']
+    dropoff_loc = data['dropoff_location']
+    
+    checkpoint_time = data.get('checkpoint_time') or timezone.now()
+    
+    try:
+        # Validate the checkpoint before paying for a routing call
+        build_checkpoint(Trip.objects.get(id=trip_id), checkpoint_time)
+        
+        coordinates = [tuple(current_loc['coords']), tuple(dropoff_loc['coords'])]
+        distance_calculator = DistanceCalculation()
+        distance_miles = distance_calculator.calculate_openroute_distance(coordinates)
+        if distance_miles is None or distance_miles <= 0:
+            logger.warning("Routing unavailable, using estimated distance")
+            distance_miles = cached_route_miles(coordinates)[0]
+        
+        with transaction.atomic():
+            trip = Trip.objects.select_for_update().get(id=trip_id)
+            checkpoint = build_checkpoint(trip, checkpoint_time)
             
-            calculator_data = {
-                'start_time': timezone.now(),
+            calculator = HOSCalculator({
                 'trip_miles': float(distance_miles),
-                'current_cycle_used': float(cycle_used) if cycle_used is not None else 0.0,
+                'current_cycle_used': float(trip.current_cycle_used),
+                'rule_set': trip.rule_set,
+                'adverse_conditions': trip.adverse_conditions,
+                'home_time_zone': trip.home_terminal_time_zone,
+                'dropoff_time_zone': timezone_at_or_default(dropoff_loc['coords'], trip.home_terminal_time_zone),
                 'current_location': str(current_loc.get('name', '')),
-                'pickup_location': str(pickup_loc.get('name', '')),
+                'pickup_location': locations.name_for(trip.pickup_location_id),
                 'dropoff_location': str(dropoff_loc.get('name', ''))
-            }
-            
-            calculator = HOSCalculator(calculator_data)
-            result = calculator.calculate()
-            
-            save_trip_results(trip, result)
+            })
+            result = calculator.replan(checkpoint)
             
-            return Response(
-                TripResponseSerializer(trip).data,
-                status=status.HTTP_201_CREATED
-            )
+            dropoff_name = str(dropoff_loc.get('name', ''))
+            trip.dropoff_location_id = locations.intern([dropoff_name], {dropoff_name: dropoff_loc['coords']})[dropoff_name]
+            save_replan_results(trip, checkpoint, result)
+        
+        return Response(TripResponseSerializer(trip).data)
+    except Trip.DoesNotExist:
+        return Response({'error': 'Trip not found'}, status=status.HTTP_404_NOT_FOUND)
+    except ReplanError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response(
-            {'error': f'Error calculating trip: {str(e)}'},
+            {'error': f'Error re-planning trip: {str(e)}'},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
 
+def _wants_json(request):
+    # The fast path only renders JSON; the browsable API keeps using the serializers
+    return request.accepted_renderer.format == 'json'
+
+
 @api_view(['GET'])
 def get_trip(request, trip_id):
     try:
+        if _wants_json(request):
+            def render():
+                data = fast_trip_response_data(Trip.objects.filter(id=trip_id))
+                return render_trip_json(data[0]) if data else None
+            
+            body = get_trip_json(trip_id, render)
+            if body is None:
+                raise Trip.DoesNotExist
+            return HttpResponse(body, content_type='application/json')
         trip = Trip.objects.get(id=trip_id)
         return Response(TripResponseSerializer(trip).data)
     except Trip.DoesNotExist:
@@ -122,53 +474,257 @@ def get_trip(request, trip_id):
 @api_view(['GET'])
 def trip_list(request):
     trips = Trip.objects.all().order_by('-created_at')
+    if _wants_json(request):
+        return HttpResponse(render_trip_json(fast_trip_response_data(trips)), content_type='application/json')
     return Response(TripResponseSerializer(trips, many=True).data)
 
 
-def save_trip_results(trip: Trip, result: dict):
-    summary = result['summary']
-    trip.total_duration = Decimal(str(summary['total_duration']))
-    trip.fuel_stops = summary['fuel_stops']
-    trip.required_rest_stops = summary['required_rest_stops']
-    trip.save()
-    
-    for segment_data in result['segments']:
-        TripSegment.objects.create(
-            trip=trip,
-            segment_type=segment_data['segment_type'],
-            sequence_number=segment_data['sequence_number'],
-            start_time=segment_data['start_time'],
-            end_time=segment_data['end_time'],
-            duration_hours=Decimal(str(segment_data['duration_hours'])),
-            distance_miles=Decimal(str(segment_data.get('distance_miles', 0))),
-            location=segment_data['location']
-        )
-    
-    for log_data in result['daily_logs']:
-        entries_data = log_data.pop('entries', [])
-        
-        daily_log = DailyLog.objects.create(
-            trip=trip,
-            log_date=log_data['log_date'],
-            day_number=log_data['day_number'],
-            total_miles=Decimal(str(log_data['total_miles'])),
-            off_duty_hours=Decimal(str(log_data['off_duty_hours'])),
-            sleeper_berth_hours=Decimal(str(log_data['sleeper_berth_hours'])),
-            driving_hours=Decimal(str(log_data['driving_hours'])),
-            on_duty_hours=Decimal(str(log_data['on_duty_hours']))
-        )
-        
-        for entry_data in entries_data:
-            LogEntry.objects.create(
-                daily_log=daily_log,
-                duty_status=entry_data['duty_status'],
-                start_hour=Decimal(str(entry_data['start_hour'])),
-                end_hour=Decimal(str(entry_data['end_hour'])),
-                location=entry_data['location']
-            )
+def _parse_window_param(value):
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        parsed = None
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+@api_view(['GET'])
+def driver_timeline(request, driver_id):
+    """Duty intervals for a driver overlapping ?start=&end= (ISO 8601, defaults to the last 8 days)"""
+    window_end = _parse_window_param(request.GET['end']) if 'end' in request.GET else timezone.now()
+    if window_end is None:
+        return Response({'error': 'Invalid end datetime'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    window_start = (
+        _parse_window_param(request.GET['start']) if 'start' in request.GET
+        else window_end - timedelta(days=8)
+    )
+    if window_start is None:
+        return Response({'error': 'Invalid start datetime'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if window_start >= window_end:
+        return Response(
+            {'error': 'start must be before end'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    intervals = intervals_overlapping(driver_id, window_start, window_end)
+    return Response({
+        'driver_id': driver_id,
+        'start': window_start,
+        'end': window_end,
+        'intervals': DutyIntervalSerializer(intervals, many=True).data
+    })
+
+
+@api_view(['GET'])
+def fleet_analytics(request):
+    """Fleet miles, hours and fuel stops per day and/or driver, from the rollup table"""
+    serializer = FleetAnalyticsQuerySerializer(data=request.GET)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    query = serializer.validated_data
+    result = fleet_totals(query['start'], query['end'], query.get('driver'), query['group_by'])
+    
+    def numbers(row):
+        return {
+            **row,
+            'total_miles': float(row['total_miles'] or 0),
+            'driving_hours': float(row['driving_hours'] or 0),
+            'on_duty_hours': float(row['on_duty_hours'] or 0),
+            'log_count': row['log_count'] or 0,
+            'fuel_stops': row['fuel_stops'] or 0,
+        }
+    
+    return Response({
+        'start': query['start'],
+        'end': query['end'],
+        'driver': query.get('driver'),
+        'group_by': query['group_by'],
+        'totals': numbers(result['totals']),
+        'rows': [numbers(row) for row in result['rows']],
+    })
+
+
+_PING_PARSERS = {
+    'application/x-ndjson': positions.parse_ndjson,
+    'application/octet-stream': positions.parse_binary,
+}
+
+
+@csrf_exempt
+@require_POST
+def ingest_positions(request):
+    """
+    Batched GPS pings, as NDJSON or packed PING_RECORD structs. A plain view:
+    the body is parsed straight from bytes, without DRF's parsers.
+    """
+    parse = _PING_PARSERS.get(request.content_type)
+    if parse is None:
+        return JsonResponse(
+            {'error': f"Content-Type must be one of {', '.join(_PING_PARSERS)}"}, status=415
+        )
+    try:
+        pings, errors = parse(request.body)
+    except positions.PingFormatError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if len(pings) + len(errors) > positions.MAX_BATCH:
+        return JsonResponse(
+            {'error': f'At most {positions.MAX_BATCH} pings per batch'}, status=413
+        )
+    
+    result = positions.ingest_pings(pings)
+    rejected = len(errors) + len(pings) - result['accepted']
+    errors.extend(
+        {'driver': driver_id, 'error': 'Unknown driver'} for driver_id in result['unknown_drivers']
+    )
+    return JsonResponse({
+        'accepted': result['accepted'],
+        'rejected': rejected,
+        'errors': errors,
+    })
+
+
+@api_view(['GET'])
+def driver_position(request, driver_id):
+    """A driver's latest GPS fix and, if it was taken on a trip, the trip's progress against its plan"""
+    position = positions.latest_position(driver_id)
+    if position is None:
+        return Response({'error': 'No positions for this driver'}, status=status.HTTP_404_NOT_FOUND)
+    
+    progress = None
+    if position['trip_id']:
+        progress = TripProgress.objects.filter(trip_id=position['trip_id']).values(*_PROGRESS_COLUMNS).first()
+    return Response({**position, 'progress': _progress_data(progress) if progress else None})
+
+
+_PROGRESS_COLUMNS = (
+    'trip_id', 'recorded_at', 'driven_miles', 'planned_miles', 'segment_sequence', 'behind_seconds',
+    'estimated_arrival', 'duty_status', 'driving_seconds', 'window_seconds', 'since_break_seconds',
+)
+
+
+def _progress_data(progress):
+    return {
+        **progress,
+        'driven_miles': float(progress['driven_miles']),
+        'planned_miles': float(progress['planned_miles']),
+    }
+
+
+@api_view(['POST'])
+def driver_duty_status(request, driver_id):
+    """A duty status change from the driver's ELD, applied to the HOS monitor of their current trip"""
+    serializer = DutyStatusEventSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    event = serializer.validated_data
+    try:
+        progress, alerts = positions.record_duty_status(
+            driver_id, event['duty_status'], event.get('at') or timezone.now()
+        )
+    except positions.TrackingError as e:
+        return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+    
+    data = {column: getattr(progress, column) for column in _PROGRESS_COLUMNS}
+    return Response({
+        'progress': _progress_data(data),
+        'alerts': [{'kind': alert.kind, 'message': alert.message} for alert in alerts],
+    })
+
+
+@api_view(['GET'])
+def alert_feed(request):
+    """Trip alerts after ?after=<id> (the latest ones without it), oldest first; poll with the returned last_id"""
+    serializer = AlertFeedQuerySerializer(data=request.GET)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    query = serializer.validated_data
+    alerts = hos_monitor.alerts_after(query.get('after'), query.get('trip'))
+    return Response({
+        'alerts': alerts,
+        'last_id': alerts[-1]['id'] if alerts else query.get('after'),
+    })
+
+
+def _sheet_response(request, body, content_type, content_hash):
+    etag = f'"{content_hash}"'
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type=content_type)
+    response['ETag'] = etag
+    if request.GET.get('v') == content_hash:
+        # Versioned URLs never change content
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        response['Cache-Control'] = 'public, no-cache'
+    return response
+
+
+@require_GET
+def eld_sheet(request, trip_id, day_number, fmt):
+    days = eld_renderer.load_daily_logs(trip_id, day_number)
+    if not days:
+        return JsonResponse({'error': 'Daily log not found'}, status=404)
+    
+    log, entries = days[0]
+    content_hash = eld_renderer.sheet_hash(log, entries)
+    if fmt == 'png':
+        if eld_renderer.cairosvg is None:
+            return JsonResponse({'error': 'PNG rendering is not available'}, status=501)
+        return _sheet_response(
+            request, eld_renderer.render_sheet_png(log, entries, content_hash), 'image/png', content_hash
+        )
+    return _sheet_response(
+        request, eld_renderer.render_sheet_svg(log, entries, content_hash), 'image/svg+xml', content_hash
+    )
+
+
+@require_GET
+def eld_sheets(request, trip_id):
+    """Every day of a trip stacked in one printable SVG"""
+    days = eld_renderer.load_daily_logs(trip_id)
+    if not days:
+        return JsonResponse({'error': 'Trip has no daily logs'}, status=404)
+    
+    content_hash = eld_renderer.combined_hash(days)
+    return _sheet_response(
+        request, eld_renderer.render_sheets_svg(days, content_hash), 'image/svg+xml', content_hash
+    )
+
+
+@api_view(['GET'])
+def eld_sheet_index(request, trip_id):
+    """Versioned sheet URLs for a trip, safe to cache indefinitely"""
+    days = eld_renderer.load_daily_logs(trip_id)
+    if not days:
+        return Response({'error': 'Trip has no daily logs'}, status=status.HTTP_404_NOT_FOUND)
+    
+    sheets = []
+    for log, entries in days:
+        content_hash = eld_renderer.sheet_hash(log, entries)
+        url = reverse('eld_sheet', args=[trip_id, log['day_number']])
+        sheets.append({
+            'day_number': log['day_number'],
+            'log_date': log['log_date'],
+            'svg': f'{url}?v={content_hash}'
+        })
+    all_url = reverse('eld_sheets', args=[trip_id])
+    return Response({
+        'trip_id': trip_id,
+        'sheets': sheets,
+        'all_days_svg': f'{all_url}?v={eld_renderer.combined_hash(days)}'
+    })
 
 
 def geocode_autocomplete(request):
+    import requests
+    
     query = request.GET.get('q', '').strip()
     
     if not query or len(query) < 3:
@@ -179,6 +735,14 @@ def geocode_autocomplete(request):
         openroute_key = getattr(settings, 'OPENROUTE_API_KEY', None)
         
         if openroute_key:
+            # Suggestions never wait for quota; trip routing gets it first
+            try:
+                openroute_quota.acquire('geocode', openroute_quota.AUTOCOMPLETE)
+            except openroute_quota.QuotaExceeded as e:
+                response = JsonResponse({'features': [], 'error': 'Geocoding is busy, try again shortly'}, status=429)
+                response['Retry-After'] = str(math.ceil(e.retry_after))
+                return response
+            
             url = "https://api.openrouteservice.org/geocode/search"
             
             headers = {
@@ -193,6 +757,8 @@ def geocode_autocomplete(request):
             }
             
             response = requests.get(url, headers=headers, params=params, timeout=10)
+            if response.status_code == 429:
+                openroute_quota.throttled('geocode')
             
             if response.status_code == 200:
                 data = response.json()
@@ -219,4 +785,10 @@ def geocode_autocomplete(request):
     except requests.exceptions.RequestException as e:
         return JsonResponse({'error': str(e)}, status=500)
     except Exception as e:
-        return JsonResponse({'error': 'Internal server error'}, status=500)
\ No newline at end of file
+        return JsonResponse({'error': 'Internal server error'}, status=500)
+
+
+@api_view(['GET'])
+def routing_quota(request):
+    """How much of the shared OpenRouteService quota is left, and how many calls were shed or throttled"""
+    return Response({'buckets': openroute_quota.quota_usage()})
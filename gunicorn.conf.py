@@ -0,0 +1,31 @@
+"""
+Gunicorn configuration.
+
+    DJANGO_SETTINGS_MODULE=truck_tracker.settings_api gunicorn -c gunicorn.conf.py
+
+The app is imported once in the master (`preload_app`) and workers are
+forked from it, so a new worker starts without importing Django, DRF or the
+project again and shares the master's memory copy-on-write.
+"""
+import gc
+import multiprocessing
+import os
+
+
+wsgi_app = "truck_tracker.wsgi:application"
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+preload_app = True
+
+
+def when_ready(server):
+    # Django imports the URLconf, and with it the views, on the first request;
+    # do it here so workers inherit it instead of each importing it again
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+
+    # Keep the collector in workers from walking (and so copying) the
+    # objects they inherited
+    gc.freeze()
@@ -50,6 +50,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'rest_framework',
+    'rest_framework.authtoken',
     'corsheaders',
     'core.apps.CoreConfig',
 
@@ -69,6 +70,15 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'truck_tracker.urls'
 
+REST_FRAMEWORK = {
+    # Tokens are what API-only workers (settings_api) accept; sessions and basic auth serve the browsable API
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+        'rest_framework.authentication.TokenAuthentication',
+    ],
+}
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -128,6 +138,9 @@ USE_I18N = True
 
 USE_TZ = True
 
+# Default IANA zone for a trip's daily logs (the driver's home terminal)
+HOME_TERMINAL_TIME_ZONE = 'UTC'
+
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
@@ -0,0 +1,36 @@
+"""
+API-only production settings for truck_tracker.
+
+Same environment as settings_production, minus everything the JSON API
+doesn't use: the admin, sessions, messages and static files apps and their
+middleware, and DRF's browsable API, form parsers and session/basic auth.
+Clients authenticate with a DRF token (`Authorization: Token <key>`), so
+trips are still saved against their driver.
+
+    DJANGO_SETTINGS_MODULE=truck_tracker.settings_api
+"""
+from .settings_production import *  # noqa: F401,F403
+
+
+INSTALLED_APPS = [
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'rest_framework',
+    'rest_framework.authtoken',
+    'corsheaders',
+    'core.apps.CoreConfig',
+]
+
+MIDDLEWARE = [
+    'corsheaders.middleware.CorsMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.middleware.common.CommonMiddleware',
+]
+
+TEMPLATES = []
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer'],
+    'DEFAULT_PARSER_CLASSES': ['rest_framework.parsers.JSONParser'],
+    'DEFAULT_AUTHENTICATION_CLASSES': ['rest_framework.authentication.TokenAuthentication'],
+}
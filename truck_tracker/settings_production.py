@@ -0,0 +1,118 @@
+"""
+Production settings for truck_tracker.
+
+Everything is read from the environment (or a .env file) via python-decouple:
+
+    DJANGO_SETTINGS_MODULE=truck_tracker.settings_production
+
+PostgreSQL is the default database. Set DB_ENGINE=sqlite for single-node
+deployments, which enables WAL mode and a busy timeout so concurrent
+`create_trip` writes wait for the lock instead of failing.
+"""
+from decouple import Csv, config
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, OPENROUTE_API_KEY as DEFAULT_OPENROUTE_API_KEY
+
+
+DEBUG = config('DEBUG', default=False, cast=bool)
+
+SECRET_KEY = config('SECRET_KEY')
+
+OPENROUTE_API_KEY = config('OPENROUTE_API_KEY', default=DEFAULT_OPENROUTE_API_KEY)
+
+ALLOWED_HOSTS = config('ALLOWED_HOSTS', cast=Csv())
+
+CORS_ALLOWED_ORIGINS = config(
+    'CORS_ALLOWED_ORIGINS',
+    default='https://car-tracker-frontend.vercel.app',
+    cast=Csv()
+)
+
+
+# Database
+
+DB_ENGINE = config('DB_ENGINE', default='postgresql')
+
+if DB_ENGINE == 'postgresql':
+    # With DB_POOL on, psycopg's pool owns the connections and Django requires
+    # CONN_MAX_AGE=0. Without it, keep persistent connections per worker.
+    DB_POOL = config('DB_POOL', default=True, cast=bool)
+
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config('DB_NAME', default='truck_tracker'),
+            'USER': config('DB_USER', default='truck_tracker'),
+            'PASSWORD': config('DB_PASSWORD', default=''),
+            'HOST': config('DB_HOST', default='localhost'),
+            'PORT': config('DB_PORT', default='5432'),
+            'CONN_MAX_AGE': 0 if DB_POOL else config('DB_CONN_MAX_AGE', default=600, cast=int),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+    }
+    if DB_POOL:
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+            'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+            'timeout': config('DB_POOL_TIMEOUT', default=10, cast=int),
+        }
+elif DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': config('DB_NAME', default=str(BASE_DIR / 'db.sqlite3')),
+            'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=600, cast=int),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # WAL lets readers run alongside the single writer
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                ),
+                # Take the write lock at BEGIN so writers queue on the busy
+                # timeout rather than failing on lock upgrade mid-transaction
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': config('DB_BUSY_TIMEOUT', default=20, cast=int),
+            },
+        }
+    }
+else:
+    from django.core.exceptions import ImproperlyConfigured
+    raise ImproperlyConfigured(f"Unsupported DB_ENGINE {DB_ENGINE!r}, expected 'postgresql' or 'sqlite'")
+
+
+# Cache
+
+# Trip responses, ELD sheets and routed legs are cached here. Locmem is per
+# process, so with several workers set REDIS_URL to share entries (and the
+# trip-cache invalidations) between them.
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+
+TRIP_CACHE_TIMEOUT = config('TRIP_CACHE_TIMEOUT', default=300, cast=int)
+
+HOME_TERMINAL_TIME_ZONE = config('HOME_TERMINAL_TIME_ZONE', default='UTC')
+
+
+# Security
+
+SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
+SESSION_COOKIE_SECURE = config('SESSION_COOKIE_SECURE', default=True, cast=bool)
+CSRF_COOKIE_SECURE = config('CSRF_COOKIE_SECURE', default=True, cast=bool)
+CSRF_TRUSTED_ORIGINS = config('CSRF_TRUSTED_ORIGINS', default='', cast=Csv())
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {'console': {'class': 'logging.StreamHandler'}},
+    'root': {'handlers': ['console'], 'level': config('LOG_LEVEL', default='INFO')},
+}
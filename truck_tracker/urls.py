@@ -1,4 +1,4 @@
-from django.contrib import admin
+from django.apps import apps
 from django.urls import path, include
 from django.http import JsonResponse
 
@@ -7,7 +7,11 @@ def api_health(request):
     return JsonResponse({'status': 'ok', 'message': 'HOS ELD API is running'})
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path('', include('core.urls')),
     path('health/', api_health, name='api_health'),
-]
\ No newline at end of file
+]
+
+# Left out of the API-only settings profile
+if apps.is_installed('django.contrib.admin'):
+    from django.contrib import admin
+    urlpatterns.insert(0, path('admin/', admin.site.urls))